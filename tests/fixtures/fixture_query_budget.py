@@ -0,0 +1,99 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.db import transaction
+from django.test.utils import CaptureQueriesContext
+
+from posts import counters, tags, timeline
+from posts.models import Comment, Follow, Group, Post
+
+BUDGET_SIZES = (3, 30)
+
+
+def seed_budget_data(django_user_model, size):
+    """Засевает базу: size авторов по size постов, подписки и комментарии.
+
+    Возвращает читателя и значения для аргументов url.
+    """
+    reader = django_user_model.objects.create_user(username='BudgetReader')
+    groups = [
+        Group.objects.create(
+            title=f'Группа {number}', slug=f'group-{number}',
+            description='Описание')
+        for number in range(3)
+    ]
+    authors = [
+        django_user_model.objects.create_user(username=f'BudgetAuthor{number}')
+        for number in range(size)
+    ]
+    Follow.objects.bulk_create(
+        Follow(user=reader, author=author) for author in authors)
+    Post.objects.bulk_create(
+        Post(author=author, group=groups[number % len(groups)],
+             text=f'Пост {author.username}-{number} #тег{number % 3}'
+                  f' @{reader.username}')
+        for author in authors for number in range(size))
+    post = Post.objects.filter(author=authors[0]).first()
+    Comment.objects.bulk_create(
+        Comment(post=post, author=author, text='Комментарий')
+        for author in authors)
+    own_post = Post.objects.create(author=reader, text='Свой пост')
+    counters.recount_users()
+    counters.recount_groups()
+    counters.recount_posts()
+    timeline.rebuild(reader.id)
+    tags.rebuild()
+    return reader, {
+        'username': authors[0].username,
+        'slug': groups[0].slug,
+        'tag': 'тег0',
+        'post_id': post.id,
+        'own_post_id': own_post.id,
+        'uidb64': 'MQ',
+        'token': 'set-password',
+    }
+
+
+def run_with_budget(client, url, budget):
+    """GET url и AssertionError со всем SQL, если бюджет превышен.
+
+    Время SQL проверяется, только если у бюджета задан time_ms: оно
+    зависит от машины и на общих CI-раннерах даёт ложные падения.
+    """
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    queries = context.captured_queries
+    spent_ms = sum(float(query['time']) for query in queries) * 1000
+    over_time = budget.time_ms is not None and spent_ms > budget.time_ms
+    if len(queries) > budget.queries or over_time:
+        sql = '\n'.join(
+            f'{number}. [{query["time"]}s] {query["sql"]}'
+            for number, query in enumerate(queries, 1))
+        raise AssertionError(
+            f'Страница `{url}` превысила бюджет: {len(queries)} запросов '
+            f'(можно {budget.queries}), {spent_ms:.1f} мс SQL '
+            f'(можно {budget.time_ms or "сколько угодно"}).\n{sql}'
+        )
+    return len(queries), spent_ms
+
+
+@pytest.fixture
+def queries_by_size(client, django_user_model):
+    """Число запросов страницы на каждом объёме из BUDGET_SIZES.
+
+    Данные каждого объёма засеваются в своей точке сохранения и
+    откатываются после замера. make_url(seed) строит адрес страницы.
+    """
+    def measure(make_url, budget):
+        counts = {}
+        for size in BUDGET_SIZES:
+            with transaction.atomic():
+                reader, seed = seed_budget_data(django_user_model, size)
+                if budget.login:
+                    client.force_login(reader)
+                counts[size], _ = run_with_budget(
+                    client, make_url(seed), budget)
+                transaction.set_rollback(True)
+        return counts
+    return measure
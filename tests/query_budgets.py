@@ -0,0 +1,53 @@
+"""Бюджеты SQL-запросов для каждого маршрута posts и users.
+
+Ключ - имя маршрута с пространством имён. Бюджет задаёт максимальное
+число запросов для GET-запроса к странице. Бюджеты проверяются на двух
+объёмах данных, и число запросов на них должно совпадать: оно не
+растёт вместе с числом постов, авторов и подписок.
+
+kwargs связывает аргументы url с ключами засеянных данных
+(см. tests/fixtures/fixture_query_budget.py), login - открывать
+страницу авторизованным читателем. time_ms - необязательный предел
+суммарного времени SQL в миллисекундах; по умолчанию не проверяется,
+потому что зависит от машины.
+"""
+from collections import namedtuple
+
+Budget = namedtuple('Budget', 'queries kwargs login time_ms')
+Budget.__new__.__defaults__ = (None, False, None)
+
+POST = {'post_id': 'post_id'}
+OWN_POST = {'post_id': 'own_post_id'}
+AUTHOR = {'username': 'username'}
+
+QUERY_BUDGETS = {
+    'posts:index': Budget(3),
+    'posts:group_list': Budget(3, {'slug': 'slug'}),
+    'posts:tag_list': Budget(4, {'name': 'tag'}),
+    'posts:profile': Budget(3, AUTHOR),
+    'posts:post_detail': Budget(4, POST),
+    'posts:post_create': Budget(3, login=True),
+    'posts:post_edit': Budget(5, OWN_POST, login=True),
+    'posts:add_comment': Budget(3, POST, login=True),
+    'posts:search': Budget(0),
+    'posts:autocomplete': Budget(0),
+    'posts:follow_index': Budget(5, login=True),
+    'posts:mentions': Budget(5, login=True),
+    'posts:profile_follow': Budget(4, AUTHOR, login=True),
+    'posts:profile_unfollow': Budget(8, AUTHOR, login=True),
+    'users:signup': Budget(0),
+    'users:login': Budget(0),
+    'users:logout': Budget(4, login=True),
+    'users:password_change/': Budget(2, login=True),
+    'users:password_change/done/': Budget(2, login=True),
+    'users:password_reset/': Budget(0),
+    'users:password_reset/done/': Budget(0),
+    'users:reset/<uid64>/<token>/': Budget(
+        1, {'uidb64': 'uidb64', 'token': 'token'}),
+    'users:reset/done/': Budget(0),
+}
+
+PARAMS_BUDGETS = {
+    ('posts:search', 'q=Пост'): Budget(2),
+    ('posts:autocomplete', 'q=budget'): Budget(2),
+}
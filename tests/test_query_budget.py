@@ -0,0 +1,58 @@
+import pytest
+from django.urls import reverse
+
+from posts import urls as posts_urls
+from users import urls as users_urls
+from tests.fixtures.fixture_query_budget import BUDGET_SIZES
+from tests.query_budgets import PARAMS_BUDGETS, QUERY_BUDGETS
+
+pytestmark = [pytest.mark.django_db]
+
+
+def route_names():
+    return sorted(
+        f'{module.app_name}:{pattern.name}'
+        for module in (posts_urls, users_urls)
+        for pattern in module.urlpatterns
+    )
+
+
+def test_every_route_has_budget():
+    missing = set(route_names()) - set(QUERY_BUDGETS)
+    assert not missing, (
+        f'Добавьте бюджет запросов в tests/query_budgets.py для {missing}'
+    )
+
+
+def assert_flat(counts, url):
+    """Число запросов не должно расти вместе с объёмом данных."""
+    small, large = (counts[size] for size in BUDGET_SIZES)
+    assert small == large, (
+        f'Страница `{url}` делает {small} запросов на объёме '
+        f'{BUDGET_SIZES[0]} и {large} на объёме {BUDGET_SIZES[-1]}: '
+        f'похоже на N+1'
+    )
+
+
+@pytest.mark.parametrize('route', sorted(QUERY_BUDGETS))
+def test_route_within_query_budget(route, queries_by_size):
+    budget = QUERY_BUDGETS[route]
+
+    def make_url(seed):
+        return reverse(route, kwargs={
+            name: seed[key] for name, key in (budget.kwargs or {}).items()})
+
+    assert_flat(queries_by_size(make_url, budget), route)
+
+
+@pytest.mark.parametrize('route, query', sorted(PARAMS_BUDGETS))
+def test_route_with_params_within_query_budget(
+        route, query, queries_by_size):
+    budget = PARAMS_BUDGETS[route, query]
+
+    def make_url(seed):
+        kwargs = {
+            name: seed[key] for name, key in (budget.kwargs or {}).items()}
+        return f'{reverse(route, kwargs=kwargs)}?{query}'
+
+    assert_flat(queries_by_size(make_url, budget), f'{route}?{query}')
@@ -0,0 +1,96 @@
+"""Заполнение кеша без давки (cache stampede).
+
+get_or_fill хранит рядом со значением время его вычисления и срок
+свежести и сочетает три приёма:
+
+* вероятностный ранний пересчёт (XFetch): чем ближе срок и чем дольше
+  считалось значение, тем вероятнее, что очередной запрос пересчитает
+  его заранее, пока остальные ещё получают кеш;
+* блокировку заполнения: пересчитывает только тот, кто первым взял
+  ключ блокировки через cache.add;
+* отдачу устаревшего значения (stale-while-revalidate): пока один
+  процесс пересчитывает, остальные получают прежнее значение. Для этого
+  запись живёт в кеше на CACHE_STALE_TIMEOUT дольше срока свежести.
+
+Версия (например, version_tag из posts.feed_cache) хранится внутри
+записи, а не в ключе: после инвалидации прежнее значение остаётся
+доступным как устаревшее, и пересчитывает его один процесс.
+"""
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+_MISSING = object()
+
+
+def lock_key(key):
+    return f'fill:lock:{key}'
+
+
+def acquire(key):
+    """Берёт блокировку заполнения key; False - её держит другой."""
+    return cache.add(lock_key(key), 1, settings.CACHE_FILL_LOCK_TIMEOUT)
+
+
+def release(key):
+    cache.delete(lock_key(key))
+
+
+def _fresh(entry, version, beta):
+    value, stored_version, delta, expires = entry
+    if stored_version != version:
+        return False
+    if expires is None:
+        return True
+    # XFetch: запас -log(rand) >= 0 растёт вместе с delta.
+    gap = -delta * beta * math.log(1 - random.random())
+    return time.time() + gap < expires
+
+
+def _fill(key, compute, timeout, version):
+    start = time.time()
+    value = compute()
+    delta = time.time() - start
+    expires = None if timeout is None else time.time() + timeout
+    stored = None if timeout is None else (
+        timeout + settings.CACHE_STALE_TIMEOUT)
+    cache.set(key, (value, version, delta, expires), stored)
+    return value
+
+
+def _wait(key):
+    """Ждёт, пока другой процесс заполнит пустой ключ."""
+    deadline = time.time() + settings.CACHE_FILL_LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if not cache.has_key(lock_key(key)):
+            break
+    return _MISSING
+
+
+def get_or_fill(key, compute, timeout, version=None, beta=1.0):
+    """Значение key из кеша или compute(), посчитанное одним процессом.
+
+    timeout - срок свежести в секундах (None - бессрочно), version -
+    любое сравнимое значение: запись другой версии считается устаревшей.
+    """
+    entry = cache.get(key)
+    if entry is not None and _fresh(entry, version, beta):
+        return entry[0]
+    if acquire(key):
+        try:
+            return _fill(key, compute, timeout, version)
+        finally:
+            release(key)
+    if entry is not None:
+        return entry[0]
+    value = _wait(key)
+    if value is _MISSING:
+        value = _fill(key, compute, timeout, version)
+    return value
@@ -0,0 +1,258 @@
+"""Кеш в общем для всех процессов файле, отображённом в память.
+
+Все воркеры gunicorn на одной машине открывают один и тот же файл
+(лучше всего в /dev/shm) и видят одни и те же записи, в том числе
+счётчики версий, которые увеличиваются атомарно.
+
+Файл - это таблица слотов фиксированного размера, разбитая на наборы
+по WAYS слотов (как наборы в кеше процессора). Ключ попадает в набор
+по хешу, а при переполнении набора вытесняется давно не читанная или
+просроченная запись. Каждый набор защищён своей блокировкой fcntl
+на один байт файла, поэтому процессы мешают друг другу только на
+одном наборе.
+
+Файл сразу занимает MAX_ENTRIES * SLOT_SIZE байт: с настройками ниже
+это 64 МБ. Значение больше SLOT_SIZE (вместе с ключом, после pickle)
+не кешируется: прежняя запись ключа удаляется, в лог пишется
+предупреждение, а oversized_drops считает такие отказы в процессе.
+Это касается и posts.middleware.PageCacheMiddleware: страница, которая
+не поместилась в слот, будет рендериться на каждом запросе, поэтому
+SLOT_SIZE должен быть больше самой тяжёлой кешируемой страницы.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.shared.SharedMemoryCache',
+            'LOCATION': '/dev/shm/yatube-cache',
+            'OPTIONS': {'MAX_ENTRIES': 1024, 'SLOT_SIZE': 65536},
+        }
+    }
+"""
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.base import BaseCache
+
+MAGIC = b'YTCACHE1'
+HEADER = struct.Struct('8sII')
+SLOT = struct.Struct('16sddI')
+WAYS = 8
+DEFAULT_SLOT_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+# fcntl-блокировки принадлежат процессу, а не потоку, поэтому потоки
+# одного процесса дополнительно разводятся обычной блокировкой.
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(path, threading.RLock())
+
+
+class SharedMemoryCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._slot_size = int(options.get('SLOT_SIZE', DEFAULT_SLOT_SIZE))
+        self._sets = max(1, -(-self._max_entries // WAYS))
+        self._slots = self._sets * WAYS
+        self._data_offset = HEADER.size + self._slots * SLOT.size
+        self._size = self._data_offset + self._slots * self._slot_size
+        self._lock = _thread_lock(location)
+        self._fd = None
+        self._map = None
+        self.oversized_drops = 0
+
+    def _open(self):
+        if self._map is not None:
+            return self._map
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked(fd, 0, 0):
+            header = os.pread(fd, HEADER.size, 0)
+            expected = HEADER.pack(MAGIC, self._slots, self._slot_size)
+            if header != expected:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, self._size)
+                os.pwrite(fd, expected, 0)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self._size)
+        return self._map
+
+    @contextmanager
+    def _locked(self, fd, start, length):
+        with self._lock:
+            fcntl.lockf(fd, fcntl.LOCK_EX, length, start)
+            try:
+                yield
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, length, start)
+
+    @contextmanager
+    def _set_for(self, key):
+        """Блокирует набор слотов ключа и отдаёт (хеш, номер набора)."""
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        set_index = int.from_bytes(digest[:8], 'little') % self._sets
+        data = self._open()
+        with self._locked(self._fd, set_index, 1):
+            yield data, digest, set_index
+
+    def _slot_offset(self, slot):
+        return HEADER.size + slot * SLOT.size
+
+    def _read_slot(self, data, slot):
+        return SLOT.unpack_from(data, self._slot_offset(slot))
+
+    def _write_slot(self, data, slot, digest, expires, used, length):
+        SLOT.pack_into(
+            data, self._slot_offset(slot), digest, expires, used, length)
+
+    def _find(self, data, digest, set_index, now):
+        """Слот живой записи с этим хешем или None."""
+        for slot in range(set_index * WAYS, (set_index + 1) * WAYS):
+            stored, expires, used, length = self._read_slot(data, slot)
+            if stored == digest and length:
+                if expires and expires <= now:
+                    self._write_slot(data, slot, b'', 0, 0, 0)
+                    return None
+                return slot
+        return None
+
+    def _victim(self, data, set_index, now):
+        """Свободный, просроченный или самый давно читанный слот набора."""
+        victim, oldest = None, None
+        for slot in range(set_index * WAYS, (set_index + 1) * WAYS):
+            stored, expires, used, length = self._read_slot(data, slot)
+            if not length or (expires and expires <= now):
+                return slot
+            if oldest is None or used < oldest:
+                victim, oldest = slot, used
+        return victim
+
+    def _load(self, data, slot, key):
+        length = self._read_slot(data, slot)[3]
+        start = self._data_offset + slot * self._slot_size
+        stored_key, value = pickle.loads(data[start:start + length])
+        if stored_key != key:
+            return None, False
+        return value, True
+
+    def _store(self, data, digest, set_index, key, value, expires, now):
+        payload = pickle.dumps((key, value), pickle.HIGHEST_PROTOCOL)
+        slot = self._find(data, digest, set_index, now)
+        if len(payload) > self._slot_size:
+            if slot is not None:
+                self._write_slot(data, slot, b'', 0, 0, 0)
+            self.oversized_drops += 1
+            logger.warning(
+                'Значение %s (%d байт) больше SLOT_SIZE=%d и не кешируется',
+                key, len(payload), self._slot_size)
+            return False
+        if slot is None:
+            slot = self._victim(data, set_index, now)
+        start = self._data_offset + slot * self._slot_size
+        data[start:start + len(payload)] = payload
+        self._write_slot(data, slot, digest, expires, now, len(payload))
+        return True
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout) or 0
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._set_for(key) as (data, digest, set_index):
+            slot = self._find(data, digest, set_index, now)
+            if slot is None:
+                return default
+            value, found = self._load(data, slot, key)
+            if not found:
+                return default
+            stored, expires, used, length = self._read_slot(data, slot)
+            self._write_slot(data, slot, stored, expires, now, length)
+            return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._set_for(key) as (data, digest, set_index):
+            self._store(data, digest, set_index, key, value,
+                        self._expires(timeout), now)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._set_for(key) as (data, digest, set_index):
+            if self._find(data, digest, set_index, now) is not None:
+                return False
+            return self._store(data, digest, set_index, key, value,
+                               self._expires(timeout), now)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._set_for(key) as (data, digest, set_index):
+            slot = self._find(data, digest, set_index, now)
+            if slot is None:
+                return False
+            stored, expires, used, length = self._read_slot(data, slot)
+            self._write_slot(
+                data, slot, stored, self._expires(timeout), used, length)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов: чтение и запись под блокировкой."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._set_for(key) as (data, digest, set_index):
+            slot = self._find(data, digest, set_index, now)
+            value, found = (None, False) if slot is None else self._load(
+                data, slot, key)
+            if not found:
+                raise ValueError("Key '%s' not found" % key)
+            value += delta
+            expires = self._read_slot(data, slot)[1]
+            self._store(data, digest, set_index, key, value, expires, now)
+            return value
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._set_for(key) as (data, digest, set_index):
+            slot = self._find(data, digest, set_index, time.time())
+            if slot is not None:
+                self._write_slot(data, slot, b'', 0, 0, 0)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._set_for(key) as (data, digest, set_index):
+            return self._find(
+                data, digest, set_index, time.time()) is not None
+
+    def clear(self):
+        data = self._open()
+        with self._locked(self._fd, 0, 0):
+            empty = bytes(SLOT.size * self._slots)
+            data[HEADER.size:self._data_offset] = empty
+
+    def close(self, **kwargs):
+        # Django закрывает кеши после каждого запроса; отображение
+        # держим открытым на всё время жизни процесса.
+        pass
@@ -0,0 +1,168 @@
+"""Двухуровневый кеш: LRU в памяти процесса перед общим кешем.
+
+Первый уровень (L1) - ограниченный по числу записей и по байтам
+словарь в памяти воркера, второй (L2) - любой кеш из CACHES, имя
+которого указано в LOCATION. Чтение сначала идёт в L1 и только
+при промахе - в L2; запись идёт в оба уровня.
+
+Свои изменения процесс видит сразу: set, delete и incr обновляют
+его L1. Изменения других процессов доходят через L2, а запись L1
+живёт не дольше L1_TIMEOUT секунд - это и есть граница устаревания.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.tiered.TieredCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {'MAX_ENTRIES': 1000, 'L1_TIMEOUT': 1,
+                        'L1_MAX_BYTES': 8 * 1024 * 1024},
+        },
+        'shared': {
+            'BACKEND': 'core.cache.shared.SharedMemoryCache',
+            'LOCATION': '/dev/shm/yatube-cache',
+        },
+    }
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.base import BaseCache
+
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 1))
+        self._max_bytes = int(options.get('L1_MAX_BYTES', 8 * 1024 * 1024))
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = dict.fromkeys(
+            ('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses'), 0)
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _l1_expires(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        expires = time.time() + self._l1_timeout
+        return expires if timeout is None else min(expires, timeout)
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.stats['l1_hits'] += 1
+                return pickle.loads(entry[1])
+            if entry is not None:
+                self._drop(key)
+            self.stats['l1_misses'] += 1
+            return _MISSING
+
+    def _l1_set(self, key, value, expires):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._drop(key)
+            if len(payload) > self._max_bytes:
+                return
+            self._entries[key] = (expires, payload)
+            self._bytes += len(payload)
+            while (len(self._entries) > self._max_entries
+                   or self._bytes > self._max_bytes):
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def _l1_delete(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def _from_shared(self, key, value):
+        if value is _MISSING:
+            self.stats['l2_misses'] += 1
+        else:
+            self.stats['l2_hits'] += 1
+            self._l1_set(key, value, self._l1_expires(DEFAULT_TIMEOUT))
+
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_key(key, version=version)
+        value = self._l1_get(l1_key)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING, version=version)
+            self._from_shared(l1_key, value)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        found, missing = {}, []
+        for key in keys:
+            value = self._l1_get(self.make_key(key, version=version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            for key in missing:
+                value = shared.get(key, _MISSING)
+                self._from_shared(self.make_key(key, version=version), value)
+                if value is not _MISSING:
+                    found[key] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._l1_set(self.make_key(key, version=version), value,
+                     self._l1_expires(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._l1_set(self.make_key(key, version=version), value,
+                         self._l1_expires(timeout))
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        l1_key = self.make_key(key, version=version)
+        try:
+            value = self.shared.incr(key, delta, version=version)
+        except ValueError:
+            self._l1_delete(l1_key)
+            raise
+        self._l1_set(l1_key, value, self._l1_expires(DEFAULT_TIMEOUT))
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_delete(self.make_key(key, version=version))
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(self.make_key(key, version=version))
+        self.shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        if self._l1_get(self.make_key(key, version=version)) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        self.shared.clear()
+
+    def l1_size(self):
+        """Число записей и байт в L1 этого процесса."""
+        with self._lock:
+            return len(self._entries), self._bytes
@@ -0,0 +1,67 @@
+"""Дырки в общих страницах (donut caching).
+
+Страница рендерится один раз для всех, а куски, зависящие от
+пользователя (шапка, кнопка подписки, форма комментария), помечаются
+тегом {% hole 'имя' аргументы %}. Пока запрос проходит через
+core.middleware.HoleMiddleware, тег оставляет в HTML метку, и готовую
+страницу можно закешировать как общую оболочку. Перед отдачей
+middleware заменяет метки на куски, отрендеренные для текущего
+пользователя. Без middleware тег рендерит кусок сразу.
+
+Кусок описывается шаблоном и функцией контекста, зарегистрированной
+через @hole. Функция получает request и аргументы тега - только
+значения, которые переживают JSON (id, строки), ведь метка хранится
+в кеше вместе со страницей.
+"""
+import base64
+import json
+import re
+
+from django.db import DatabaseError
+from django.template.loader import render_to_string
+
+MARKER = re.compile(rb'<!--hole:([A-Za-z0-9_=-]+)-->')
+
+_registry = {}
+
+
+def hole(name, template_name):
+    """Регистрирует функцию контекста для дырки name."""
+    def decorator(func):
+        _registry[name] = (template_name, func)
+        return func
+    return decorator
+
+
+def render_hole(request, name, args):
+    template_name, context = _registry[name]
+    return render_to_string(
+        template_name, context(request, *args), request=request)
+
+
+def marker(name, args):
+    payload = json.dumps([name, list(args)]).encode()
+    token = base64.urlsafe_b64encode(payload).decode()
+    return f'<!--hole:{token}-->'
+
+
+def fill(request, content):
+    """Заменяет метки в байтах content на куски для request."""
+    def replace(match):
+        name, args = json.loads(base64.urlsafe_b64decode(match.group(1)))
+        try:
+            return render_hole(request, name, args).encode()
+        except DatabaseError:
+            # База недоступна (core.resilience): страница важнее кнопок.
+            return b''
+    return MARKER.sub(replace, content)
+
+
+@hole('header', 'includes/header.html')
+def header(request):
+    return {}
+
+
+@hole('switchers', 'includes/switchers.html')
+def switchers(request):
+    return {}
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+from . import holes
+from . import resilience
+from .views import service_unavailable
+
+
+class HoleMiddleware:
+    """Заполняет дырки {% hole %} в HTML-ответах под текущего пользователя.
+
+    Должен стоять после CsrfViewMiddleware и перед кешем страниц:
+    кеш хранит оболочку с метками, а дырки заполняются на каждый запрос.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.donut = True
+        response = self.get_response(request)
+        if (not response.streaming
+                and response.get('Content-Type', '').startswith('text/html')):
+            response.content = holes.fill(request, response.content)
+            if response.has_header('Content-Length'):
+                response['Content-Length'] = str(len(response.content))
+        return response
+
+
+class DatabaseBreakerMiddleware:
+    """Бюджет времени SQL для запроса и автомат защиты базы.
+
+    Ставится последним: пока автомат разомкнут, view не вызывается,
+    запрос сразу получает 503, а кеш страниц выше отдаёт старую копию.
+    Бюджет ставится на соединение вокруг get_response, поэтому view
+    вызывает сам Django, со всеми process_view, process_exception и
+    ATOMIC_REQUESTS. Заодно соединения воркера получают
+    statement_timeout (см. resilience.limit_statements).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        connection_created.connect(
+            resilience.limit_statements, dispatch_uid='limit_statements')
+
+    def __call__(self, request):
+        state = resilience.state()
+        if state == resilience.OPEN:
+            return service_unavailable(request)
+        request.db_budget = resilience.TimeBudget(settings.DB_TIME_BUDGET)
+        with request.db_budget.installed():
+            response = self.get_response(request)
+        if state == resilience.HALF_OPEN and response.status_code < 500:
+            resilience.record_success()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.db_budget.seconds = resilience.budget_for(
+            request.resolver_match.view_name)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, resilience.BREAKER_ERRORS):
+            return None
+        resilience.record_failure()
+        request.db_budget.lift()
+        return service_unavailable(request)
@@ -0,0 +1,157 @@
+"""Работа при медленной или недоступной базе данных.
+
+* Бюджет времени SQL на view: DB_TIME_BUDGETS по имени url
+  (по умолчанию DB_TIME_BUDGET секунд). Запрос, начатый после того,
+  как бюджет исчерпан, не выполняется: view прерывается с
+  DatabaseBudgetExceeded. Зависший запрос в PostgreSQL обрывает
+  statement_timeout (DB_STATEMENT_TIMEOUT_MS), который limit_statements
+  ставит только соединениям веб-воркеров: миграции и пакетные команды
+  работают без него.
+* Автомат защиты (circuit breaker): недоступность базы
+  (OperationalError, InterfaceError) и превышения бюджета считаются в
+  кеше, общем для воркеров; ошибки данных вроде IntegrityError - нет.
+  После DB_BREAKER_THRESHOLD ошибок за DB_BREAKER_WINDOW секунд автомат
+  размыкается на DB_BREAKER_COOLDOWN секунд: view не вызываются и сразу
+  получают 503, а кеш страниц (posts.middleware) отдаёт последнюю
+  удачную копию. После паузы автомат полуоткрыт: первая же ошибка
+  размыкает его снова, первый удачный запрос замыкает. Удачные запросы
+  в замкнутом состоянии окно ошибок не сбрасывают.
+* FaultyDatabase - обёртка над соединением для тестов, которая
+  замедляет запросы или роняет их с OperationalError.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.db import InterfaceError
+from django.db import OperationalError
+from django.db import connection
+
+FAILURES_KEY = 'breaker:failures'
+OPEN_KEY = 'breaker:open'
+HALF_OPEN_KEY = 'breaker:half_open'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class DatabaseBudgetExceeded(DatabaseError):
+    pass
+
+
+# Ошибки, которые говорят о состоянии базы, а не о данных запроса.
+BREAKER_ERRORS = (OperationalError, InterfaceError, DatabaseBudgetExceeded)
+
+
+def is_open():
+    return cache.get(OPEN_KEY) is not None
+
+
+def state():
+    """CLOSED, OPEN или HALF_OPEN одним чтением кеша."""
+    keys = cache.get_many([OPEN_KEY, HALF_OPEN_KEY])
+    if OPEN_KEY in keys:
+        return OPEN
+    if HALF_OPEN_KEY in keys:
+        return HALF_OPEN
+    return CLOSED
+
+
+def record_failure():
+    try:
+        failures = cache.incr(FAILURES_KEY)
+    except ValueError:
+        cache.add(FAILURES_KEY, 1, settings.DB_BREAKER_WINDOW)
+        failures = 1
+    if failures >= settings.DB_BREAKER_THRESHOLD:
+        cache.set(OPEN_KEY, time.time(), settings.DB_BREAKER_COOLDOWN)
+        # Полуоткрытое состояние: после паузы хватит одной ошибки.
+        cache.set(HALF_OPEN_KEY, 1,
+                  settings.DB_BREAKER_COOLDOWN + settings.DB_BREAKER_WINDOW)
+        cache.set(FAILURES_KEY, settings.DB_BREAKER_THRESHOLD - 1,
+                  settings.DB_BREAKER_WINDOW)
+
+
+def record_success():
+    """Замыкает полуоткрытый автомат; вызывается только в HALF_OPEN."""
+    cache.delete_many([FAILURES_KEY, HALF_OPEN_KEY])
+
+
+def limit_statements(sender, connection, **kwargs):
+    """Обработчик connection_created: statement_timeout для PostgreSQL.
+
+    Подключается DatabaseBreakerMiddleware, то есть только там, где
+    обрабатываются запросы. Курсор DB-API идёт мимо execute_wrappers,
+    чтобы не тратить бюджет запроса и не ломаться в FaultyDatabase.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.connection.cursor() as cursor:
+        cursor.execute('SET statement_timeout = %s',
+                       [settings.DB_STATEMENT_TIMEOUT_MS])
+
+
+def budget_for(view_name):
+    return settings.DB_TIME_BUDGETS.get(view_name, settings.DB_TIME_BUDGET)
+
+
+class TimeBudget:
+    """execute_wrapper, который считает время SQL и следит за бюджетом."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.spent = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.spent >= self.seconds:
+            raise DatabaseBudgetExceeded(
+                f'SQL занял {self.spent:.3f} с при бюджете {self.seconds} с')
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.spent += time.monotonic() - start
+
+    def lift(self):
+        """Снимает ограничение, например чтобы отрисовать страницу 503."""
+        self.seconds = float('inf')
+
+    @contextmanager
+    def installed(self):
+        # Первым в списке: время считается вместе со всеми обёртками.
+        connection.execute_wrappers.insert(0, self)
+        try:
+            yield self
+        finally:
+            connection.execute_wrappers.remove(self)
+
+
+class FaultyDatabase:
+    """Ломает запросы к базе внутри with, для тестов автомата.
+
+    delay - задержка перед каждым запросом в секундах, fail - ронять
+    запросы с error (по умолчанию OperationalError, как при обрыве
+    соединения).
+    """
+
+    def __init__(self, delay=0, fail=False, error=OperationalError):
+        self.delay = delay
+        self.fail = fail
+        self.error = error
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise self.error('база недоступна (FaultyDatabase)')
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def installed(self):
+        with connection.execute_wrapper(self):
+            yield self
@@ -0,0 +1,42 @@
+"""{% thumbnail %} sorl, который сначала ищет готовую миниатюру в
+словаре страницы context['thumbnails'] (posts.thumbnails.PageThumbnails).
+
+Синтаксис тот же: достаточно заменить {% load thumbnail %} на
+{% load batch_thumbnail %}. Если словаря нет или миниатюры в нём не
+оказалось, тег работает как обычный, через get_thumbnail.
+"""
+from django import template
+from sorl.thumbnail.templatetags.thumbnail import ThumbnailNode
+
+register = template.Library()
+
+
+class BatchThumbnailNode(ThumbnailNode):
+    def _resolve_options(self, context):
+        options = {}
+        for key, expr in self.options:
+            noresolve = {'True': True, 'False': False, 'None': None}
+            value = noresolve.get(str(expr), expr.resolve(context))
+            if key == 'options':
+                options.update(value)
+            else:
+                options[key] = value
+        return options
+
+    def _render(self, context):
+        thumbnails = context.get('thumbnails')
+        file_ = self.file_.resolve(context)
+        if thumbnails is None or not file_ or not self.as_var:
+            return super()._render(context)
+        thumbnail = thumbnails.get(
+            file_, self.geometry.resolve(context),
+            self._resolve_options(context))
+        if thumbnail is None:
+            return super()._render(context)
+        with context.push(**{self.as_var: thumbnail}):
+            return self.nodelist_file.render(context)
+
+
+@register.tag
+def thumbnail(parser, token):
+    return BatchThumbnailNode(parser, token)
@@ -0,0 +1,60 @@
+"""{% fillcache %} - как {% cache %}, но через core.cache.fill.
+
+    {% load fill_cache %}
+    {% fillcache timeout name [vary_on ...] [version=значение] %}
+        ...
+    {% endfillcache %}
+
+Версия хранится в записи, а не в ключе, поэтому после её смены
+фрагмент пересчитывает один запрос, а остальные получают прежний.
+"""
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core.cache.fill import get_or_fill
+
+register = template.Library()
+
+
+class FillCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, name, vary_on, version):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.name = name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        if timeout is not None:
+            try:
+                timeout = int(timeout)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    f'"fillcache" tag got a non-integer timeout value: '
+                    f'{timeout!r}')
+        key = make_template_fragment_key(
+            self.name, [var.resolve(context) for var in self.vary_on])
+        version = self.version.resolve(context) if self.version else None
+        return get_or_fill(
+            key, lambda: self.nodelist.render(context), timeout, version)
+
+
+@register.tag('fillcache')
+def do_fillcache(parser, token):
+    nodelist = parser.parse(('endfillcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires at least 2 arguments.")
+    version = None
+    if tokens[-1].startswith('version='):
+        version = parser.compile_filter(tokens.pop()[len('version='):])
+    return FillCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+        version,
+    )
@@ -0,0 +1,67 @@
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import fill
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f'значение {self.calls}'
+
+
+class GetOrFillTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.compute = Counter()
+
+    def test_fresh_value_is_reused(self):
+        for _ in range(3):
+            value = fill.get_or_fill('key', self.compute, 60, version=1)
+        self.assertEqual(value, 'значение 1')
+        self.assertEqual(self.compute.calls, 1)
+
+    def test_new_version_is_recomputed_once(self):
+        fill.get_or_fill('key', self.compute, 60, version=1)
+        self.assertEqual(
+            fill.get_or_fill('key', self.compute, 60, version=2),
+            'значение 2')
+        fill.get_or_fill('key', self.compute, 60, version=2)
+        self.assertEqual(self.compute.calls, 2)
+
+    def test_stale_value_is_served_while_locked(self):
+        fill.get_or_fill('key', self.compute, 60, version=1)
+        self.assertTrue(fill.acquire('key'))
+        self.assertEqual(
+            fill.get_or_fill('key', self.compute, 60, version=2),
+            'значение 1')
+        self.assertEqual(self.compute.calls, 1)
+        fill.release('key')
+
+    def test_early_recompute_near_expiry(self):
+        """Долгое вычисление у самого срока пересчитывается заранее."""
+        cache.set('key', ('старое', None, 3600, fill.time.time() + 1), 60)
+        self.assertEqual(
+            fill.get_or_fill('key', self.compute, 60), 'значение 1')
+
+    @override_settings(CACHE_FILL_LOCK_TIMEOUT=0.1)
+    def test_miss_waits_for_lock_then_computes(self):
+        self.assertTrue(fill.acquire('key'))
+        self.assertEqual(
+            fill.get_or_fill('key', self.compute, 60), 'значение 1')
+
+    def test_template_tag(self):
+        template = Template(
+            '{% load fill_cache %}'
+            '{% fillcache 60 fragment name version=version %}'
+            '{{ value }}{% endfillcache %}')
+        render = [
+            template.render(Context({
+                'name': 'a', 'version': version, 'value': value}))
+            for version, value in ((1, 'первое'), (1, 'второе'),
+                                   (2, 'третье'))]
+        self.assertEqual(render, ['первое', 'первое', 'третье'])
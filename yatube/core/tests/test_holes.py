@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+
+from core import holes
+
+User = get_user_model()
+
+
+class HoleTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        self.request.user = User.objects.create_user(username='reader')
+        self.template = Template(
+            "{% load holes %}[{% hole 'header' %}]")
+
+    def test_inline_render_without_middleware(self):
+        content = self.template.render(Context({'request': self.request}))
+        self.assertIn('Пользователь: reader', content)
+        self.assertNotIn('<!--hole:', content)
+
+    def test_marker_is_filled_per_request(self):
+        self.request.donut = True
+        shell = self.template.render(Context({'request': self.request}))
+        self.assertNotIn('reader', shell)
+        self.assertIn('<!--hole:', shell)
+        filled = holes.fill(self.request, shell.encode()).decode()
+        self.assertIn('Пользователь: reader', filled)
+        self.assertNotIn('<!--hole:', filled)
+
+    def test_marker_matches_pattern(self):
+        marker = holes.marker('header', [1, 'слово']).encode()
+        self.assertIsNotNone(holes.MARKER.fullmatch(marker))
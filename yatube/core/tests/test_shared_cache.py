@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+import unittest
+from multiprocessing import get_context
+
+from django.test import SimpleTestCase
+
+from core.cache.shared import SharedMemoryCache
+
+
+def make_cache(path, **options):
+    options.setdefault('MAX_ENTRIES', 64)
+    return SharedMemoryCache(path, {'OPTIONS': options})
+
+
+def increment(path, times):
+    cache = make_cache(path)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SharedMemoryCacheTests(SimpleTestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.unlink, self.path)
+        self.cache = make_cache(self.path)
+
+    def test_basic_operations(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(
+            self.cache.get_many(['new', 'missing']), {'new': 'value'})
+        self.cache.clear()
+        self.assertFalse(self.cache.has_key('new'))
+
+    def test_incr_missing_key(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_other_instance_sees_writes(self):
+        """Второй экземпляр на том же файле - как другой воркер."""
+        self.cache.set('shared', 'value')
+        self.assertEqual(make_cache(self.path).get('shared'), 'value')
+
+    def test_expiry(self):
+        self.cache.set('short', 'value', 0.05)
+        self.cache.set('forever', 'value', None)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_oversized_value_is_not_stored(self):
+        cache = make_cache(self.path, SLOT_SIZE=256)
+        cache.set('big', 'small')
+        with self.assertLogs('core.cache.shared', 'WARNING'):
+            cache.set('big', 'x' * 1024)
+        self.assertIsNone(cache.get('big'))
+        self.assertEqual(cache.oversized_drops, 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = make_cache(self.path, MAX_ENTRIES=8)
+        for number in range(8):
+            cache.set(f'key_{number}', number)
+        for number in range(1, 8):
+            cache.get(f'key_{number}')
+        cache.set('extra', 'value')
+        self.assertIsNone(cache.get('key_0'))
+        self.assertEqual(cache.get('key_7'), 7)
+        self.assertEqual(cache.get('extra'), 'value')
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'нужен fork')
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0)
+        context = get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.path, 200))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 800)
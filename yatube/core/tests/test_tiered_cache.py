@@ -0,0 +1,75 @@
+import time
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from core.cache.tiered import TieredCache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-tests',
+    },
+}
+
+
+def make_cache(**options):
+    options.setdefault('L1_TIMEOUT', 60)
+    return TieredCache('shared', {'OPTIONS': options})
+
+
+@override_settings(CACHES=CACHES)
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.cache = make_cache()
+        self.shared = caches['shared']
+
+    def test_second_read_is_served_from_l1(self):
+        self.shared.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.stats, {
+            'l1_hits': 1, 'l1_misses': 1, 'l2_hits': 1, 'l2_misses': 0})
+
+    def test_own_writes_are_visible_at_once(self):
+        self.cache.set('counter', 1)
+        self.cache.get('counter')
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.get('counter'), 2)
+        self.cache.delete('counter')
+        self.assertIsNone(self.cache.get('counter'))
+
+    def test_other_process_writes_arrive_within_bound(self):
+        """Чужая запись видна не позже чем через L1_TIMEOUT."""
+        cache = make_cache(L1_TIMEOUT=0.05)
+        other = make_cache(L1_TIMEOUT=0.05)
+        cache.set('key', 'old')
+        cache.get('key')
+        other.set('key', 'new')
+        self.assertEqual(cache.get('key'), 'old')
+        time.sleep(0.1)
+        self.assertEqual(cache.get('key'), 'new')
+
+    def test_get_many_fills_l1(self):
+        self.shared.set_many({'first': 1, 'second': 2})
+        self.assertEqual(
+            self.cache.get_many(['first', 'second', 'missing']),
+            {'first': 1, 'second': 2})
+        self.assertEqual(self.cache.stats['l2_misses'], 1)
+        self.assertEqual(self.cache.get_many(['first', 'second']),
+                         {'first': 1, 'second': 2})
+        self.assertEqual(self.cache.stats['l1_hits'], 2)
+
+    def test_l1_is_bounded_by_entries_and_bytes(self):
+        cache = make_cache(MAX_ENTRIES=2)
+        for key in ('first', 'second', 'third'):
+            cache.set(key, key)
+        self.assertEqual(cache.l1_size()[0], 2)
+        cache = make_cache(L1_MAX_BYTES=100)
+        cache.set('big', 'x' * 200)
+        self.assertEqual(cache.l1_size(), (0, 0))
+        self.assertEqual(cache.get('big'), 'x' * 200)
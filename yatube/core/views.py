@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.shortcuts import render
 
 
@@ -15,3 +16,9 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def service_unavailable(request):
+    response = render(request, 'core/503.html', status=503)
+    response['Retry-After'] = settings.DB_BREAKER_COOLDOWN
+    return response
@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.contrib import admin
+
+from . import autocomplete
+from . import search
 from .models import Post
-from .models import Group, Follow
+from .models import Fingerprint, Group, Follow, Tag
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -16,7 +20,56 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Полнотекстовый индекс вместо ILIKE по search_fields.
+        if not search_term:
+            return queryset, False
+        ids = search.post_ids(search_term, settings.SEARCH_ADMIN_LIMIT)
+        return queryset.filter(id__in=ids), False
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug')
+    search_fields = ('title', 'slug')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Индекс автодополнения вместо ILIKE по search_fields.
+        if not search_term:
+            return queryset, False
+        slugs = [slug for slug, _ in autocomplete.groups(
+            search_term, settings.SEARCH_ADMIN_LIMIT)]
+        return queryset.filter(slug__in=slugs), False
+
+
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name')
+    search_fields = ('=name',)
+
+
+class DuplicateFilter(admin.SimpleListFilter):
+    title = 'копия'
+    parameter_name = 'duplicate'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Да'), ('no', 'Нет'))
+
+    def queryset(self, request, queryset):
+        if self.value() in ('yes', 'no'):
+            return queryset.filter(
+                duplicate_of__isnull=self.value() == 'no')
+        return queryset
+
+
+class FingerprintAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'author', 'post', 'comment', 'duplicate_of',
+                    'created')
+    list_filter = (DuplicateFilter, 'created')
+    raw_id_fields = ('author', 'post', 'comment', 'duplicate_of')
+    exclude = ('signature',)
+
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
 admin.site.register(Follow)
+admin.site.register(Tag, TagAdmin)
+admin.site.register(Fingerprint, FingerprintAdmin)
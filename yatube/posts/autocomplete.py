@@ -0,0 +1,291 @@
+"""Автодополнение авторов и групп.
+
+Подсказки ищутся по User.username и полному имени (get_full_name),
+по Group.title и Group.slug: строка или одно из её слов начинается
+с введённого, регистр не важен.
+
+* PostgreSQL: расширение pg_trgm и GIN-индексы gin_trgm_ops по lower()
+  полей. По ним идут и LIKE, и оператор похожести %, поэтому в выдачу
+  попадают и опечатки, а таблицы не перебираются.
+* Остальные базы: отсортированный список ключей в памяти процесса,
+  префикс ищется bisect за O(log n + limit). Сигналы User и Group
+  правят список на месте и пишут изменение в журнал в кеше под
+  очередным номером версии. Другие процессы при следующем запросе
+  применяют записи журнала после своей версии и пересобирают список
+  целиком, только если нужных записей в журнале уже нет.
+"""
+import threading
+from bisect import bisect_left
+from bisect import insort
+
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Group
+from .models import User
+
+USER = 'user'
+GROUP = 'group'
+# Поля пользователя, от которых зависит индекс.
+USER_FIELDS = {'username', 'first_name', 'last_name', 'is_active'}
+# Журнал изменений: сколько записей процесс готов догонять и сколько
+# секунд запись живёт в кеше. Отставший сильнее процесс собирает
+# индекс заново.
+CHANGE_LOG_LENGTH = 1000
+CHANGE_LOG_TIMEOUT = 60 * 60
+
+
+def _escape_like(text):
+    return (text.replace('\\', '\\\\').replace('%', '\\%')
+            .replace('_', '\\_'))
+
+
+def _full_name(first_name, last_name):
+    return f'{first_name} {last_name}'.strip()
+
+
+def _keys(*texts):
+    """Ключи записи: каждая строка целиком и каждое её слово."""
+    keys = set()
+    for text in texts:
+        text = text.lower().strip()
+        if text:
+            keys.add(text)
+            keys.update(text.split())
+    return keys
+
+
+class TrigramBackend:
+    create_sql = [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        f'CREATE INDEX {User._meta.db_table}_username_trgm'
+        f' ON {User._meta.db_table} USING gin (lower(username) gin_trgm_ops)',
+        f'CREATE INDEX {User._meta.db_table}_full_name_trgm'
+        f' ON {User._meta.db_table} USING gin'
+        f' (lower(first_name || \' \' || last_name) gin_trgm_ops)',
+        f'CREATE INDEX {Group._meta.db_table}_title_trgm'
+        f' ON {Group._meta.db_table} USING gin (lower(title) gin_trgm_ops)',
+        f'CREATE INDEX {Group._meta.db_table}_slug_trgm'
+        f' ON {Group._meta.db_table} USING gin (lower(slug) gin_trgm_ops)',
+    ]
+    drop_sql = [
+        f'DROP INDEX {User._meta.db_table}_username_trgm',
+        f'DROP INDEX {User._meta.db_table}_full_name_trgm',
+        f'DROP INDEX {Group._meta.db_table}_title_trgm',
+        f'DROP INDEX {Group._meta.db_table}_slug_trgm',
+    ]
+
+    def _lookup(self, sql, query, limit):
+        query = query.lower()
+        prefix = _escape_like(query) + '%'
+        word = '% ' + prefix
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {
+                'query': query, 'prefix': prefix, 'word': word,
+                'limit': limit})
+            return cursor.fetchall()
+
+    def users(self, query, limit):
+        # Сначала совпадения по началу, потом похожие по триграммам.
+        # Выражения те же, что в индексах, иначе индексы не подойдут.
+        name = 'lower(username)'
+        full_name = 'lower(first_name || \' \' || last_name)'
+        rows = self._lookup(
+            f'SELECT username, first_name, last_name'
+            f' FROM {User._meta.db_table}'
+            f' WHERE is_active AND ({name} LIKE %(prefix)s'
+            f'  OR {full_name} LIKE %(prefix)s'
+            f'  OR {full_name} LIKE %(word)s OR {name} %% %(query)s)'
+            f' ORDER BY {name} LIKE %(prefix)s DESC,'
+            f'  similarity({name}, %(query)s) DESC, {name}'
+            f' LIMIT %(limit)s', query, limit)
+        return [(username, _full_name(first_name, last_name))
+                for username, first_name, last_name in rows]
+
+    def groups(self, query, limit):
+        title, slug = 'lower(title)', 'lower(slug)'
+        return self._lookup(
+            f'SELECT slug, title FROM {Group._meta.db_table}'
+            f' WHERE {title} LIKE %(prefix)s OR {title} LIKE %(word)s'
+            f'  OR {slug} LIKE %(prefix)s OR {title} %% %(query)s'
+            f' ORDER BY ({title} LIKE %(prefix)s'
+            f'  OR {slug} LIKE %(prefix)s) DESC,'
+            f'  similarity({title}, %(query)s) DESC, {title}'
+            f' LIMIT %(limit)s', query, limit)
+
+    def changed(self, kind, instance):
+        pass
+
+    def removed(self, kind, pk):
+        pass
+
+
+class PrefixIndex:
+    """Отсортированный список (ключ, id) и подписи записей по id."""
+
+    def __init__(self):
+        self.entries = []
+        self.keys = {}
+        self.items = {}
+
+    def add(self, pk, item, keys):
+        self.remove(pk)
+        self.items[pk] = item
+        self.keys[pk] = keys
+        for key in keys:
+            insort(self.entries, (key, pk))
+
+    def remove(self, pk):
+        self.items.pop(pk, None)
+        for key in self.keys.pop(pk, ()):
+            position = bisect_left(self.entries, (key, pk))
+            del self.entries[position]
+
+    def load(self, rows):
+        """Заполняет индекс целиком из [(id, запись, ключи)]."""
+        self.__init__()
+        for pk, item, keys in rows:
+            self.items[pk] = item
+            self.keys[pk] = keys
+            self.entries.extend((key, pk) for key in keys)
+        self.entries.sort()
+
+    def find(self, prefix, limit):
+        found = []
+        seen = set()
+        position = bisect_left(self.entries, (prefix,))
+        while len(found) < limit and position < len(self.entries):
+            key, pk = self.entries[position]
+            if not key.startswith(prefix):
+                break
+            if pk not in seen:
+                seen.add(pk)
+                found.append(self.items[pk])
+            position += 1
+        return found
+
+
+class MemoryBackend:
+    create_sql = []
+    drop_sql = []
+    version_key = 'autocomplete:version'
+    change_key = 'autocomplete:change:%d'
+
+    def __init__(self):
+        self.indexes = {USER: PrefixIndex(), GROUP: PrefixIndex()}
+        self.version = None
+        self.lock = threading.Lock()
+
+    def _user(self, username, first_name, last_name):
+        full_name = _full_name(first_name, last_name)
+        return (username, full_name), _keys(username, full_name)
+
+    def _group(self, slug, title):
+        return (slug, title), _keys(title, slug)
+
+    def _rows(self, kind):
+        if kind == USER:
+            users = User.objects.filter(is_active=True).values_list(
+                'id', 'username', 'first_name', 'last_name')
+            for pk, *fields in users.iterator():
+                yield (pk, *self._user(*fields))
+            return
+        for pk, *fields in Group.objects.values_list(
+                'id', 'slug', 'title').iterator():
+            yield (pk, *self._group(*fields))
+
+    def _changes(self, version):
+        """Записи журнала после self.version до version или None."""
+        if self.version is None or not (
+                0 < version - self.version <= CHANGE_LOG_LENGTH):
+            return None
+        keys = [self.change_key % number
+                for number in range(self.version + 1, version + 1)]
+        found = cache.get_many(keys)
+        if len(found) < len(keys):
+            return None
+        return [found[key] for key in keys]
+
+    def _current(self):
+        version = cache.get_or_set(self.version_key, 1, None)
+        if version != self.version:
+            changes = self._changes(version)
+            if changes is None:
+                for kind, index in self.indexes.items():
+                    index.load(self._rows(kind))
+            else:
+                for change in changes:
+                    self._apply(*change)
+            self.version = version
+        return self.indexes
+
+    def _apply(self, kind, pk, entry):
+        if entry is None:
+            self.indexes[kind].remove(pk)
+        else:
+            self.indexes[kind].add(pk, *entry)
+
+    def _find(self, kind, query, limit):
+        with self.lock:
+            return self._current()[kind].find(query.lower().strip(), limit)
+
+    def users(self, query, limit):
+        return self._find(USER, query, limit)
+
+    def groups(self, query, limit):
+        return self._find(GROUP, query, limit)
+
+    def _record(self, kind, pk, entry):
+        """Применяет изменение у себя и пишет его в журнал."""
+        self._apply(kind, pk, entry)
+        try:
+            version = cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, 1, None)
+            version = 1
+        cache.set(self.change_key % version, (kind, pk, entry),
+                  CHANGE_LOG_TIMEOUT)
+        # Чужие изменения между нашими догонит следующий _current:
+        # повторно применить своё же изменение безопасно.
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+
+    def changed(self, kind, instance):
+        if kind == USER and not instance.is_active:
+            entry = None
+        elif kind == USER:
+            entry = self._user(
+                instance.username, instance.first_name, instance.last_name)
+        else:
+            entry = self._group(instance.slug, instance.title)
+        with self.lock:
+            self._record(kind, instance.pk, entry)
+
+    def removed(self, kind, pk):
+        with self.lock:
+            self._record(kind, pk, None)
+
+
+_memory = MemoryBackend()
+
+
+def backend(vendor=None):
+    vendor = vendor or connection.vendor
+    if vendor == 'postgresql':
+        return TrigramBackend()
+    return _memory
+
+
+def users(query, limit=10):
+    """[(username, полное имя)] по запросу."""
+    return backend().users(query, limit)
+
+
+def groups(query, limit=10):
+    """[(slug, название)] по запросу."""
+    return backend().groups(query, limit)
+
+
+def reset():
+    """Забывает индекс в памяти; следующий запрос соберёт его заново."""
+    _memory.version = None
@@ -0,0 +1,144 @@
+"""Условные GET-запросы (ETag и Last-Modified) для лент и постов.
+
+ETag строится из версий областей feed_cache и id пользователя,
+Last-Modified - из времени последнего bump этих областей. Если
+браузер прислал совпадающие If-None-Match или If-Modified-Since,
+view не вызывается: ответ 304 уходит без запросов ленты и рендера.
+Сами области страницы уходят в заголовок Surrogate-Key.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import Max
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import feed_cache
+from .models import Group
+from .models import Post
+from .models import Tag
+from .models import User
+
+
+def index_scopes():
+    return [feed_cache.INDEX], Post.objects.all(), None
+
+
+def group_scopes(slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return None
+    scopes = [feed_cache.group_scope(group.id)]
+    return scopes, Post.objects.filter(group_id=group.id), group
+
+
+def tag_scopes(name):
+    tag = Tag.objects.filter(name=name.lower()).first()
+    if tag is None:
+        return None
+    scopes = [feed_cache.tag_scope(tag.id)]
+    return scopes, Post.objects.filter(tag_entries__tag_id=tag.id), tag
+
+
+def profile_scopes(username):
+    author = User.objects.select_related('counters').filter(
+        username=username).first()
+    if author is None:
+        return None
+    # Кнопка подписки зависит от подписчиков автора.
+    scopes = [feed_cache.author_scope(author.id),
+              feed_cache.followers_scope(author.id)]
+    return scopes, Post.objects.filter(author_id=author.id), author
+
+
+def post_scopes(post_id):
+    # Комментарии view дочитывает сам: 304 их не ждёт.
+    post = Post.objects.select_related('author__counters', 'group').filter(
+        pk=post_id).first()
+    if post is None:
+        return None
+    # На странице поста есть число постов автора.
+    scopes = [feed_cache.post_scope(post.id),
+              feed_cache.author_scope(post.author_id)]
+    return scopes, Post.objects.filter(pk=post.id), post
+
+
+def looked_up(request, queryset, **lookup):
+    """Объект страницы, уже найденный conditional, или get_object_or_404.
+
+    Областям ETag нужен тот же объект, что и view, поэтому он читается
+    один раз за запрос.
+    """
+    found = getattr(request, '_conditional_state', None)
+    if found is not None and found[2] is not None:
+        return found[2]
+    return get_object_or_404(queryset, **lookup)
+
+
+def make_etag(user_id, scopes, versions):
+    tag = '|'.join(f'{scope}={version}'
+                   for scope, version in zip(scopes, versions))
+    tag = f'{user_id}|{tag}'
+    return hashlib.md5(tag.encode()).hexdigest()
+
+
+def _etag(request, found):
+    if found is None:
+        return None
+    scopes = found[0]
+    versions = feed_cache.versions(*scopes)
+    # Снимок версий до view нужен кешу страниц (posts.middleware).
+    request.surrogate_versions = scopes, versions
+    return make_etag(request.user.pk, scopes, versions)
+
+
+def _last_modified(found):
+    if found is None:
+        return None
+    scopes, posts, _ = found
+    return feed_cache.last_modified(
+        scopes,
+        lambda: posts.aggregate(Max('updated_at'))['updated_at__max'])
+
+
+def _patch_headers(request, response):
+    # Свежесть проверяется дёшево, поэтому браузер должен
+    # спрашивать каждый раз; страницы вошедших - только его.
+    patch_cache_control(response, max_age=0)
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True)
+    if hasattr(request, 'surrogate_versions'):
+        response['Surrogate-Key'] = ' '.join(request.surrogate_versions[0])
+
+
+def conditional(scopes_func):
+    """Проверяет свежесть по областям, которые вернула scopes_func.
+
+    scopes_func получает именованные аргументы view и возвращает
+    (области, посты в них, объект страницы) или None, если объекта
+    нет - тогда view вызывается как обычно и отдаёт 404. Объект view
+    берёт через looked_up, не читая его повторно.
+    """
+    def state(request, kwargs):
+        if not hasattr(request, '_conditional_state'):
+            request._conditional_state = scopes_func(**kwargs)
+        return request._conditional_state
+
+    def etag(request, *args, **kwargs):
+        return _etag(request, state(request, kwargs))
+
+    def last_modified(request, *args, **kwargs):
+        return _last_modified(state(request, kwargs))
+
+    def decorator(view):
+        view = condition(etag_func=etag, last_modified_func=last_modified)(
+            view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            _patch_headers(request, response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,86 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарно через F()-выражения из сигналов
+posts.signals. Функции recount_* пересчитывают их пачкой по таблицам
+и возвращают число исправленных строк.
+"""
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Q
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment
+from .models import Follow
+from .models import Group
+from .models import Post
+from .models import User
+from .models import UserCounters
+
+
+def _add(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def bump_user(user_id, field, delta):
+    updated = _add(UserCounters.objects.filter(user_id=user_id), field, delta)
+    # Строки может не быть у пользователей, созданных в обход сигналов.
+    # При уменьшении её не создаём: пользователь может удаляться каскадом.
+    if not updated and delta > 0 and not UserCounters.objects.filter(
+            user_id=user_id).exists():
+        recount_users(User.objects.filter(id=user_id))
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        _add(Group.objects.filter(id=group_id), 'posts_count', delta)
+
+
+def bump_post(post_id, delta):
+    _add(Post.objects.filter(id=post_id), 'comments_count', delta)
+
+
+def _count(model, field, outer='pk'):
+    """Подзапрос COUNT(*) по внешнему ключу field, 0 вместо NULL."""
+    counted = model.objects.filter(**{field: OuterRef(outer)}).order_by()
+    counted = counted.values(field).annotate(total=Count('pk'))
+    return Coalesce(Subquery(counted.values('total')), 0)
+
+
+def _repair(queryset, **expressions):
+    drift = Q()
+    for field, expression in expressions.items():
+        queryset = queryset.annotate(**{f'actual_{field}': expression})
+        drift |= ~Q(**{field: F(f'actual_{field}')})
+    drifted = list(queryset.filter(drift).values_list('pk', flat=True))
+    if drifted:
+        queryset.model.objects.filter(pk__in=drifted).update(**expressions)
+    return len(drifted)
+
+
+def recount_users(users=None):
+    users = User.objects.all() if users is None else users
+    missing = users.filter(counters__isnull=True).values_list('id', flat=True)
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=user_id) for user_id in missing],
+        ignore_conflicts=True,
+    )
+    counters = UserCounters.objects.filter(user__in=users)
+    return _repair(
+        counters,
+        posts_count=_count(Post, 'author', 'user_id'),
+        followers_count=_count(Follow, 'author', 'user_id'),
+        following_count=_count(Follow, 'user', 'user_id'),
+    )
+
+
+def recount_groups():
+    return _repair(Group.objects.all(), posts_count=_count(Post, 'group'))
+
+
+def recount_posts():
+    return _repair(
+        Post.objects.all(), comments_count=_count(Comment, 'post'))
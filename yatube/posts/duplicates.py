@@ -0,0 +1,272 @@
+"""Почти одинаковые посты и комментарии (спам копиями текста).
+
+У каждого сохранённого поста и комментария есть Fingerprint - подпись
+MinHash из PERMUTATIONS чисел по парам соседних слов текста. Доля
+совпавших чисел двух подписей - оценка сходства Жаккара их текстов.
+Подпись разбита на BANDS полос, хеш каждой полосы лежит в индексе
+FingerprintBand: тексты с сходством от DUPLICATE_SIMILARITY почти
+наверняка совпадают хотя бы в одной полосе, поэтому кандидаты ищутся
+одним запросом по индексу, а не сравнением со всеми текстами.
+
+При сохранении формы (check) текст сравнивается с текстами того же
+автора и, если аккаунт новый, с текстами других новых аккаунтов за
+последние DUPLICATE_WINDOW секунд. При DUPLICATE_ACTION = 'reject'
+копия отклоняется, при 'flag' сохраняется, а её отпечаток ссылается
+на оригинал (duplicate_of). Тексты короче DUPLICATE_MIN_WORDS слов не
+проверяются: короткие ответы часто совпадают и у людей.
+
+Команда find_duplicates строит недостающие отпечатки и собирает
+похожие тексты всего корпуса в группы.
+"""
+import hashlib
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Comment
+from .models import Fingerprint
+from .models import FingerprintBand
+from .models import Post
+from .search import words
+
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+SHINGLE = 2
+
+# Перестановки - хеши a * x + b по модулю 2**64 со старшими 32 битами;
+# seed фиксирован, иначе подписи разных процессов несравнимы.
+_random = np.random.RandomState(20240601)
+_A = _random.randint(
+    1, 2**62, size=PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+_A = _A * np.uint64(2) + np.uint64(1)
+_B = _random.randint(
+    0, 2**62, size=PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+
+
+def _hash(data, size=8):
+    return int.from_bytes(
+        hashlib.blake2b(data, digest_size=size).digest(), 'big')
+
+
+def shingles(text):
+    """Пары соседних слов; пусто, если текст слишком короткий."""
+    tokens = words(text)
+    if len(tokens) < settings.DUPLICATE_MIN_WORDS:
+        return set()
+    return {' '.join(tokens[start:start + SHINGLE])
+            for start in range(len(tokens) - SHINGLE + 1)}
+
+
+def signature(text):
+    """Подпись MinHash (PERMUTATIONS чисел uint32) или None."""
+    found = shingles(text)
+    if not found:
+        return None
+    hashes = np.fromiter(
+        (_hash(shingle.encode()) for shingle in found), np.uint64,
+        len(found))
+    permuted = _A[:, None] * hashes[None, :] + _B[:, None]
+    return (permuted >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+
+def bands(signature):
+    """Хеши полос подписи; номер полосы входит в хеш."""
+    values = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        value = _hash(bytes([band]) + rows.tobytes())
+        # BigIntegerField знаковое.
+        values.append(value - 2**64 if value >= 2**63 else value)
+    return values
+
+
+def _load(data):
+    return np.frombuffer(bytes(data), dtype=np.uint32)
+
+
+def similarity(first, second):
+    """Оценка сходства Жаккара по двум подписям."""
+    return float(np.mean(first == second))
+
+
+def _related(author):
+    """Чьи тексты сравнивать: свои, а новому аккаунту - и других новых."""
+    related = Q(author_id=author.pk)
+    new = timezone.now() - timedelta(
+        seconds=settings.DUPLICATE_NEW_ACCOUNT_AGE)
+    if author.date_joined >= new:
+        related |= Q(author__date_joined__gte=new)
+    return related
+
+
+def find(signature, author, exclude=None):
+    """id отпечатка самого похожего текста связанных авторов или None."""
+    since = timezone.now() - timedelta(seconds=settings.DUPLICATE_WINDOW)
+    candidates = Fingerprint.objects.filter(
+        _related(author), created__gte=since,
+        id__in=FingerprintBand.objects.filter(
+            value__in=bands(signature)).values('fingerprint_id'))
+    if exclude is not None:
+        candidates = candidates.exclude(exclude)
+    best, best_score = None, settings.DUPLICATE_SIMILARITY
+    for fingerprint_id, data in candidates.values_list(
+            'id', 'signature')[:settings.DUPLICATE_CANDIDATES]:
+        score = similarity(signature, _load(data))
+        if score >= best_score:
+            best, best_score = fingerprint_id, score
+    return best
+
+
+def _field(instance):
+    return 'post' if isinstance(instance, Post) else 'comment'
+
+
+def check(text, author, instance=None):
+    """ValidationError, если текст - копия недавнего текста.
+
+    instance - редактируемый пост, с собой он не сравнивается.
+    """
+    if settings.DUPLICATE_ACTION != 'reject' or author is None:
+        return
+    found = signature(text)
+    if found is None:
+        return
+    exclude = None
+    if instance is not None and instance.pk is not None:
+        exclude = Q(**{f'{_field(instance)}_id': instance.pk})
+    if find(found, author, exclude) is not None:
+        raise ValidationError(
+            'Почти такой же текст уже опубликован.', code='duplicate')
+
+
+def record(instance):
+    """Обновляет отпечаток сохранённого поста или комментария."""
+    field = _field(instance)
+    found = signature(instance.text)
+    fingerprints = Fingerprint.objects.filter(**{field: instance})
+    if found is None:
+        fingerprints.delete()
+        return None
+    original = find(found, instance.author, Q(**{field: instance}))
+    with transaction.atomic():
+        fingerprint = fingerprints.first()
+        if fingerprint is None:
+            fingerprint = Fingerprint(author_id=instance.author_id,
+                                      **{field: instance})
+        fingerprint.signature = found.tobytes()
+        fingerprint.duplicate_of_id = original
+        fingerprint.save()
+        fingerprint.bands.all().delete()
+        FingerprintBand.objects.bulk_create(
+            FingerprintBand(fingerprint=fingerprint, value=value)
+            for value in bands(found))
+    return fingerprint
+
+
+def backfill(batch=1000):
+    """Строит отпечатки текстов, у которых их нет; возвращает их число."""
+    added = 0
+    for model in (Post, Comment):
+        field = model._meta.model_name
+        texts = model.objects.filter(fingerprint__isnull=True).order_by(
+            'id').values_list('id', 'author_id', 'text')
+        after = 0
+        while True:
+            rows = list(texts.filter(id__gt=after)[:batch])
+            if not rows:
+                break
+            after = rows[-1][0]
+            added += _backfill_rows(field, rows)
+    return added
+
+
+def _backfill_rows(field, rows):
+    signatures = {}
+    for object_id, author_id, text in rows:
+        found = signature(text)
+        if found is not None:
+            signatures[object_id] = (author_id, found)
+    with transaction.atomic():
+        Fingerprint.objects.bulk_create(
+            Fingerprint(author_id=author_id, signature=found.tobytes(),
+                        **{f'{field}_id': object_id})
+            for object_id, (author_id, found) in signatures.items())
+        # SQLite не возвращает id из bulk_create.
+        ids = Fingerprint.objects.filter(
+            **{f'{field}_id__in': list(signatures)}).values_list(
+                f'{field}_id', 'id')
+        FingerprintBand.objects.bulk_create(
+            FingerprintBand(fingerprint_id=fingerprint_id, value=value)
+            for object_id, fingerprint_id in ids
+            for value in bands(signatures[object_id][1]))
+    return len(signatures)
+
+
+def clusters(batch=1000):
+    """Группы id отпечатков с похожими текстами, от больших к меньшим.
+
+    Сравниваются только отпечатки с общей полосой, авторы не важны.
+    """
+    shared = list(
+        FingerprintBand.objects.order_by().values('value')
+        .annotate(members=Count('id')).filter(members__gt=1)
+        .values_list('value', flat=True))
+    parents = {}
+
+    def root(node):
+        parents.setdefault(node, node)
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    for start in range(0, len(shared), batch):
+        buckets = {}
+        for value, fingerprint_id in FingerprintBand.objects.filter(
+                value__in=shared[start:start + batch]).values_list(
+                    'value', 'fingerprint_id'):
+            buckets.setdefault(value, []).append(fingerprint_id)
+        members = {member for bucket in buckets.values()
+                   for member in bucket}
+        signatures = {
+            fingerprint_id: _load(data)
+            for fingerprint_id, data in Fingerprint.objects.filter(
+                id__in=members).values_list('id', 'signature')}
+        for bucket in buckets.values():
+            _join(sorted(bucket), signatures, root, parents)
+    groups = {}
+    for node in list(parents):
+        groups.setdefault(root(node), []).append(node)
+    return sorted((sorted(group) for group in groups.values()
+                   if len(group) > 1),
+                  key=lambda group: (-len(group), group[0]))
+
+
+def _join(bucket, signatures, root, parents):
+    """Объединяет похожие отпечатки полосы.
+
+    Каждый сравнивается с представителями уже найденных в ней групп,
+    а не со всеми: в полосе спама могут быть тысячи копий.
+    """
+    representatives = []
+    for member in bucket:
+        for representative in representatives:
+            if (similarity(signatures[member], signatures[representative])
+                    >= settings.DUPLICATE_SIMILARITY):
+                parents[root(member)] = root(representative)
+                break
+        else:
+            representatives.append(member)
+
+
+def flag(groups):
+    """Отмечает в каждой группе все отпечатки копиями самого раннего."""
+    for first, *others in groups:
+        Fingerprint.objects.filter(id__in=others).update(duplicate_of=first)
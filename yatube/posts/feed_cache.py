@@ -0,0 +1,124 @@
+"""Кеш лент на счётчиках поколений.
+
+У каждой области (вся лента, группа, тег, автор, пост) есть номер версии
+в кеше. Сигналы Post и Comment увеличивают версии затронутых областей,
+а фрагменты и счётчики страниц кешируются вместе с текущими версиями
+(core.cache.fill): запись другой версии устарела и пересчитывается
+одним запросом. Срок жизни может быть длинным: свежесть держится
+на версиях.
+"""
+import time
+from datetime import datetime
+from datetime import timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import Signal
+
+from core.cache.fill import get_or_fill
+
+INDEX = 'index'
+
+# Отправляется после bump с аргументом scopes; к нему можно подключить
+# сброс прокси по Surrogate-Key.
+bumped = Signal()
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def tag_scope(tag_id):
+    return f'tag:{tag_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def followers_scope(author_id):
+    return f'followers:{author_id}'
+
+
+def post_scopes(post, *group_ids):
+    """Области, которые показывают пост: лента, автор, группы, сам пост."""
+    scopes = [INDEX, author_scope(post.author_id), post_scope(post.pk)]
+    scopes.extend(
+        group_scope(group_id)
+        for group_id in {post.group_id, *group_ids}
+        if group_id is not None)
+    return scopes
+
+
+def _key(scope):
+    return f'feed:version:{scope}'
+
+
+def _modified_key(scope):
+    return f'feed:modified:{scope}'
+
+
+def _initial():
+    # Если ключ версии вытеснят, счёт начнётся с нового большого числа,
+    # а не с единицы, и старые фрагменты не оживут.
+    return int(time.time() * 1000)
+
+
+def versions(*scopes):
+    """Текущие версии областей в том же порядке, что и scopes."""
+    keys = [_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    result = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial(), None)
+            found[key] = cache.get(key, _initial())
+        result.append(found[key])
+    return result
+
+
+def version_tag(*scopes):
+    """Области с их версиями одной строкой, для vary_on в {% cache %}."""
+    return '|'.join(
+        f'{scope}={version}'
+        for scope, version in zip(scopes, versions(*scopes)))
+
+
+def bump(*scopes):
+    for scope in set(scopes):
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.set(_key(scope), _initial(), None)
+    now = time.time()
+    cache.set_many({_modified_key(scope): now for scope in scopes}, None)
+    bumped.send(sender=None, scopes=sorted(set(scopes)))
+
+
+def last_modified(scopes, fallback):
+    """Время последнего изменения областей (aware datetime в UTC).
+
+    Время запоминает bump. Если его вытеснили, вызывается fallback:
+    он возвращает время из базы (обычно MAX(updated_at)) или None.
+    """
+    keys = [_modified_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        stored = fallback()
+        stored = stored.timestamp() if stored else time.time()
+        for key in keys:
+            if key not in found:
+                cache.add(key, stored, None)
+                found[key] = stored
+    return datetime.fromtimestamp(max(found.values()), timezone.utc)
+
+
+def cached_count(queryset, scope):
+    """COUNT(*) ленты области scope, закешированный до смены её версии."""
+    return get_or_fill(
+        f'feed:count:{scope}', queryset.count, settings.FEED_CACHE_TIMEOUT,
+        version=version_tag(scope))
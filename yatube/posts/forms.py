@@ -1,6 +1,9 @@
 from django import forms
+from django.conf import settings
 from .models import Post
 from .models import Comment
+from . import duplicates
+from . import uploads
 
 
 class PostForm(forms.ModelForm):
@@ -9,6 +12,27 @@ class PostForm(forms.ModelForm):
         fields = ('text', 'group', 'image', )
         labels = {'text': 'Текст поста', 'group': 'Группа', }
 
+    def __init__(self, *args, author=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.author = author
+        # Файл сверх лимита записан не целиком: Pillow его не показываем.
+        self.image_too_large = uploads.too_large(self.files.get('image'))
+        if self.image_too_large:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_text(self):
+        text = self.cleaned_data['text']
+        duplicates.check(text, self.author, self.instance)
+        return text
+
+    def clean_image(self):
+        if self.image_too_large:
+            raise forms.ValidationError(
+                'Файл больше %(limit)s МБ.', code='too_large',
+                params={'limit': settings.IMAGE_UPLOAD_MAX_BYTES // 2**20})
+        return uploads.normalize(self.cleaned_data['image'])
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -18,3 +42,16 @@ class CommentForm(forms.ModelForm):
         help_texts = {
             'text': 'Текст нового комментария',
         }
+
+    def __init__(self, *args, author=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.author = author
+
+    def clean_text(self):
+        text = self.cleaned_data['text']
+        duplicates.check(text, self.author)
+        return text
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Поиск', max_length=200)
@@ -0,0 +1,23 @@
+"""Дырки страниц постов, зависящие от пользователя (см. core.holes)."""
+from core.holes import hole
+
+from .forms import CommentForm
+from .models import Follow
+
+
+@hole('follow_button', 'includes/follow_button.html')
+def follow_button(request, username):
+    user = request.user
+    following = user.is_authenticated and Follow.objects.filter(
+        author__username=username, user=user).exists()
+    return {'username': username, 'following': following}
+
+
+@hole('comment_form', 'includes/comment_form.html')
+def comment_form(request, post_id):
+    return {'post_id': post_id, 'form': CommentForm()}
+
+
+@hole('edit_link', 'includes/edit_link.html')
+def edit_link(request, post_id, author_id):
+    return {'post_id': post_id, 'is_author': request.user.id == author_id}
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts import variants
+
+
+class Command(BaseCommand):
+    help = ('Режет адаптивные варианты картинок постов, у которых их '
+            'ещё нет. Прерванный запуск можно просто повторить')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Процессов в пуле; 0 - резать в этом процессе')
+        parser.add_argument(
+            '--batch', type=int, default=50,
+            help='Сколько постов брать за раз')
+        parser.add_argument(
+            '--after', type=int, default=0,
+            help='Начать с постов с id больше этого')
+
+    def handle(self, *args, **options):
+        pool = None
+        if options['workers']:
+            pool = thumbnails.make_pool(options['workers'])
+        after = options['after']
+        done = failed = 0
+        try:
+            while True:
+                batch = variants.missing(after, options['batch'])
+                if not batch:
+                    break
+                after = batch[-1][0]
+                for image, error in self.run(batch, pool):
+                    if error is None:
+                        done += 1
+                        continue
+                    failed += 1
+                    self.stderr.write(f'{image}: {error}')
+                self.stdout.write(f'Посты до id={after} разобраны')
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(f'Готово: {done}, с ошибкой: {failed}')
+
+    def run(self, batch, pool):
+        images = sorted({image for _, image in batch})
+        if pool is None:
+            return [(image, thumbnails._error(variants.generate, image))
+                    for image in images]
+        futures = [(image, pool.submit(variants.generate, image))
+                   for image in images]
+        return [(image, thumbnails._error(future.result))
+                for image, future in futures]
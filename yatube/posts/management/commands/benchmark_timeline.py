@@ -0,0 +1,120 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.test.utils import override_settings
+
+from posts import counters
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry, User
+
+PUSH_ONLY = 10 ** 9
+
+
+def timed(func, repeat):
+    """Медиана и 95-й перцентиль времени вызова func в миллисекундах."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает ленту подписок на join-запросе, чистую рассылку '
+        'и гибридную схему push/pull. Данные создаются во временной '
+        'транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=2000,
+                            help='Подписчиков у популярного автора')
+        parser.add_argument('--authors', type=int, default=50,
+                            help='Обычных авторов в подписках читателя')
+        parser.add_argument('--posts', type=int, default=20,
+                            help='Постов у каждого автора')
+        parser.add_argument('--writes', type=int, default=10,
+                            help='Новых постов популярного автора на замер')
+        parser.add_argument('--reads', type=int, default=50,
+                            help='Чтений первой страницы на замер')
+        parser.add_argument('--threshold', type=int, default=1000,
+                            help='TIMELINE_FANOUT_LIMIT гибридной схемы')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            reader, celebrity = self.seed(options)
+            rows = [('join', '-', '-') + self.read_join(reader, options)]
+            for title, limit in (('push', PUSH_ONLY),
+                                 ('hybrid', options['threshold'])):
+                with override_settings(TIMELINE_FANOUT_LIMIT=limit):
+                    timeline.forget_pulled_authors()
+                    timeline.rebuild(reader.id)
+                    writes = self.write(celebrity, options)
+                    reads = self.read_timeline(reader, options)
+                rows.append((title,) + writes + reads)
+            transaction.set_rollback(True)
+        self.report(rows)
+
+    def seed(self, options):
+        prefix = f'bench{int(time.time())}'
+        reader = User.objects.create(username=f'{prefix}_reader')
+        celebrity = User.objects.create(username=f'{prefix}_celebrity')
+        User.objects.bulk_create(
+            User(username=f'{prefix}_author_{number}')
+            for number in range(options['authors']))
+        User.objects.bulk_create(
+            User(username=f'{prefix}_follower_{number}')
+            for number in range(options['followers']))
+        authors = list(User.objects.filter(
+            username__startswith=f'{prefix}_author_'))
+        followers = list(User.objects.filter(
+            username__startswith=f'{prefix}_follower_'))
+        Follow.objects.bulk_create(
+            [Follow(user=reader, author=author)
+             for author in authors + [celebrity]]
+            + [Follow(user=follower, author=celebrity)
+               for follower in followers])
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {number}')
+            for author in authors + [celebrity]
+            for number in range(options['posts']))
+        # bulk_create не шлёт сигналов: без пересчёта у автора 0
+        # подписчиков и гибридная схема не отличается от рассылки.
+        counters.recount_users(
+            User.objects.filter(username__startswith=prefix))
+        return reader, celebrity
+
+    def write(self, celebrity, options):
+        before = TimelineEntry.objects.count()
+        started = time.perf_counter()
+        for number in range(options['writes']):
+            Post.objects.create(author=celebrity, text=f'Новый {number}')
+        spent = (time.perf_counter() - started) * 1000 / options['writes']
+        written = TimelineEntry.objects.count() - before
+        return written / options['writes'], round(spent, 2)
+
+    def read_join(self, reader, options):
+        def read():
+            post_list = Post.objects.filter(author__following__user=reader)
+            list(Paginator(post_list, 10).get_page(1))
+        return timed(read, options['reads'])
+
+    def read_timeline(self, reader, options):
+        def read():
+            post_list = timeline.home_timeline(reader)
+            list(Paginator(post_list, 10).get_page(1))
+        return timed(read, options['reads'])
+
+    def report(self, rows):
+        header = ('схема', 'записей/пост', 'мс/пост',
+                  'чтение p50, мс', 'чтение p95, мс')
+        self.stdout.write(' | '.join(header))
+        for row in rows:
+            self.stdout.write(' | '.join(
+                f'{value:.2f}' if isinstance(value, float) else str(value)
+                for value in row))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import related
+
+
+class Command(BaseCommand):
+    help = ('Находит похожие посты по TF-IDF текстов: новые посты, '
+            'а с --rebuild - все заново')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересчитать словарь и соседей всех постов')
+        parser.add_argument(
+            '--batch', type=int, default=1000,
+            help='Сколько постов векторизовать и сравнивать за раз')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            posts = related.rebuild(options['batch'])
+        else:
+            posts = related.update(options['batch'])
+        self.stdout.write(f'Обработано постов: {posts}')
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts import media
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки, на которые не ссылается ни один пост, '
+            'вместе с их миниатюрами и вариантами')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Сначала пересчитать ссылки по таблице постов')
+        parser.add_argument(
+            '--batch', type=int, default=100,
+            help='Сколько файлов удалять за одну транзакцию')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            files = media.recount()
+            self.stdout.write(f'Файлов с картинками постов: {files}')
+        removed = 0
+        while True:
+            names = media.collect(options['batch'])
+            for name in names:
+                self.stdout.write(f'Удалён {name}')
+            removed += len(names)
+            if len(names) < options['batch']:
+                break
+        self.stdout.write(f'Удалено файлов: {removed}')
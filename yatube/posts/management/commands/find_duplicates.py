@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts import duplicates
+from posts.models import Fingerprint
+
+
+class Command(BaseCommand):
+    help = ('Строит недостающие отпечатки текстов и собирает почти '
+            'одинаковые посты и комментарии в группы')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--flag', action='store_true',
+            help='Отметить тексты групп копиями самого раннего')
+        parser.add_argument(
+            '--batch', type=int, default=1000,
+            help='Сколько текстов или полос разбирать за один проход')
+
+    def handle(self, *args, **options):
+        added = duplicates.backfill(options['batch'])
+        self.stdout.write(f'Новых отпечатков: {added}')
+        groups = duplicates.clusters(options['batch'])
+        for group in groups:
+            members = Fingerprint.objects.filter(id__in=group).values_list(
+                'post_id', 'comment_id', 'author__username')
+            described = ', '.join(
+                (f'пост {post_id}' if post_id
+                 else f'комментарий {comment_id}') + f' ({username})'
+                for post_id, comment_id, username in members)
+            self.stdout.write(f'{len(group)}: {described}')
+        if options['flag']:
+            duplicates.flag(groups)
+        self.stdout.write(f'Групп копий: {len(groups)}')
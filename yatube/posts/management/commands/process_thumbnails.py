@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Нарезает миниатюры картинок из очереди в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Процессов в пуле; 0 - резать в этом процессе')
+        parser.add_argument(
+            '--batch', type=int, default=50,
+            help='Сколько заданий забирать за раз')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и выйти, а не ждать новых заданий')
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument(
+            '--enqueue-existing', action='store_true',
+            help='Сначала поставить в очередь картинки всех постов')
+
+    def handle(self, *args, **options):
+        if options['enqueue_existing']:
+            images = Post.objects.exclude(image='').values_list(
+                'image', flat=True).distinct()
+            for image in images.iterator():
+                thumbnails.enqueue(image)
+        pool = None
+        if options['workers']:
+            pool = thumbnails.make_pool(options['workers'])
+        done = failed = 0
+        try:
+            while True:
+                batch = thumbnails.process(options['batch'], pool)
+                done, failed = done + batch[0], failed + batch[1]
+                if sum(batch):
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(f'Готово: {done}, с ошибкой: {failed}')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов и комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch', type=int, default=1000,
+            help='Сколько постов индексировать за один запрос')
+
+    def handle(self, *args, **options):
+        posts = search.rebuild(options['batch'])
+        self.stdout.write(f'Проиндексировано постов: {posts}')
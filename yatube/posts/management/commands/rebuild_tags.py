@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import tags
+
+
+class Command(BaseCommand):
+    help = 'Заново разбирает теги и упоминания во всех постах'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch', type=int, default=1000,
+            help='Сколько постов разбирать за один проход')
+
+    def handle(self, *args, **options):
+        posts = tags.rebuild(options['batch'])
+        self.stdout.write(f'Разобрано постов: {posts}')
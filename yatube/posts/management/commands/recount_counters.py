@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            repaired = {
+                'пользователи': counters.recount_users(),
+                'группы': counters.recount_groups(),
+                'посты': counters.recount_posts(),
+            }
+        # Популярные авторы выбираются по followers_count.
+        timeline.forget_pulled_authors()
+        for name, count in repaired.items():
+            self.stdout.write(f'{name}: исправлено {count}')
@@ -0,0 +1,87 @@
+"""Счётчики ссылок на файлы картинок и сборка мусора.
+
+Одинаковые картинки лежат в одном файле (posts.storage), поэтому у
+одного файла может быть несколько постов, а миниатюры sorl и варианты
+(posts.variants), построенные по имени файла, у них общие. Сигналы
+Post увеличивают счётчик MediaFile, когда картинка появляется у поста,
+и уменьшают, когда её заменили или пост удалили.
+
+Файл без ссылок удаляет команда collect_media вместе с миниатюрами,
+вариантами и заданием очереди, но не раньше чем через MEDIA_GC_GRACE
+секунд: за это время ту же картинку могут загрузить снова.
+"""
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import F
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .models import ImageVariant
+from .models import MediaFile
+from .models import Post
+from .models import ThumbnailJob
+from .storage import name_digest
+
+
+def acquire(name):
+    """Добавляет ссылку на файл; True - файл появился впервые."""
+    media, created = MediaFile.objects.get_or_create(
+        name=name, defaults={'refcount': 1, 'digest': name_digest(name)})
+    if not created:
+        MediaFile.objects.filter(id=media.id).update(
+            refcount=F('refcount') + 1, updated=timezone.now())
+    return created
+
+
+def release(name):
+    MediaFile.objects.filter(name=name).update(
+        refcount=F('refcount') - 1, updated=timezone.now())
+
+
+def recount():
+    """Пересчитывает ссылки по таблице постов; возвращает число файлов."""
+    counts = dict(
+        Post.objects.exclude(image='').order_by().values_list('image')
+        .annotate(refs=Count('id')))
+    with transaction.atomic():
+        MediaFile.objects.exclude(name__in=counts).update(refcount=0)
+        for name, refs in counts.items():
+            MediaFile.objects.update_or_create(
+                name=name, defaults={
+                    'refcount': refs, 'digest': name_digest(name)})
+    return len(counts)
+
+
+def delete_files(name):
+    """Удаляет оригинал и всё, что из него построено."""
+    default.kvstore.delete(ImageFile(name, default_storage))
+    for variant in ImageVariant.objects.filter(image=name):
+        default_storage.delete(variant.name)
+    ImageVariant.objects.filter(image=name).delete()
+    ThumbnailJob.objects.filter(image=name).delete()
+    default_storage.delete(name)
+    directory = posixpath.dirname(name)
+    if (default_storage.addressed(name)
+            and default_storage.exists(directory)
+            and not any(default_storage.listdir(directory))):
+        default_storage.delete(directory)
+
+
+def collect(limit=100):
+    """Удаляет до limit файлов без ссылок; возвращает их имена."""
+    stale = timezone.now() - timedelta(seconds=settings.MEDIA_GC_GRACE)
+    with transaction.atomic():
+        names = list(
+            MediaFile.objects.select_for_update(skip_locked=True)
+            .filter(refcount__lte=0, updated__lt=stale)
+            .values_list('name', flat=True)[:limit])
+        for name in names:
+            delete_files(name)
+        MediaFile.objects.filter(name__in=names).delete()
+    return names
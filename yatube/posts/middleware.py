@@ -0,0 +1,142 @@
+"""Кеш целых страниц, общий для всех читателей.
+
+Страницы view с декоратором conditional (он ставит заголовок
+Surrogate-Key) сохраняются в кеше вместе с версиями своих областей
+feed_cache. Сигналы Post, Comment и Follow увеличивают версии
+затронутых областей, и при следующем запросе такая запись считается
+удалённой: сбрасываются ровно те страницы, в ключах которых есть
+изменившаяся область. Остальные отдаются без view и рендера шаблонов.
+
+За core.middleware.HoleMiddleware в кеше лежит оболочка с метками
+{% hole %}, одна на всех, включая вошедших пользователей: их части
+страницы дорисовываются после чтения из кеша. Без него кешируются
+только страницы анонимов. Устаревшую страницу пересчитывает один
+запрос, остальные тем временем получают прежнюю (см. core.cache.fill).
+Прежнюю же копию с заголовками Age и Warning получают все, пока
+разомкнут автомат защиты базы (core.resilience).
+
+С core.cache.shared страница кешируется, только если вместе с
+заголовками помещается в SLOT_SIZE; иначе запись не сохраняется
+(backend пишет предупреждение в лог) и страница рендерится заново.
+
+Тот же Surrogate-Key и Cache-Control с s-maxage получает прокси перед
+сайтом; чтобы сбрасывать и его, подключитесь к feed_cache.bumped.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.utils.cache import get_conditional_response
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_http_date_safe
+from django.utils.http import quote_etag
+
+from core import resilience
+from core.cache import fill
+
+from . import feed_cache
+from .conditional import make_etag
+
+
+def _key(request):
+    path = request.build_absolute_uri()
+    return 'page:' + hashlib.md5(path.encode()).hexdigest()
+
+
+def _shared(request):
+    # Анонимность проверяем по отсутствию сессии, не загружая её.
+    return (getattr(request, 'donut', False)
+            or settings.SESSION_COOKIE_NAME not in request.COOKIES)
+
+
+def _cacheable_request(request):
+    return request.method in ('GET', 'HEAD') and _shared(request)
+
+
+def _cacheable_response(request, response):
+    return (response.status_code == 200
+            and hasattr(request, 'surrogate_versions')
+            and not response.streaming
+            and not response.cookies
+            and (getattr(request, 'donut', False)
+                 or not request.user.is_authenticated))
+
+
+def _viewer(request):
+    """id читателя и вошёл ли он.
+
+    Сессия и пользователь читаются из базы. Пока она недоступна,
+    вошедший читатель получает прежнюю страницу, как аноним, но с
+    Cache-Control: private.
+    """
+    try:
+        return request.user.pk, request.user.is_authenticated
+    except DatabaseError:
+        return None, True
+
+
+def _personalize(request, response, scopes, versions):
+    """Заголовки общей страницы под текущего читателя."""
+    user_id, authenticated = _viewer(request)
+    response['ETag'] = quote_etag(make_etag(user_id, scopes, versions))
+    del response['Cache-Control']
+    if authenticated:
+        patch_cache_control(response, private=True, max_age=0)
+    else:
+        patch_cache_control(
+            response, public=True, max_age=0,
+            s_maxage=settings.PAGE_CACHE_PROXY_TIMEOUT)
+    return response
+
+
+def _serve(request, entry, stale=False):
+    scopes, versions, response, stored = entry
+    response = _personalize(request, response, scopes, versions)
+    if stale:
+        response['Age'] = str(int(max(0, time.time() - stored)))
+        response['Warning'] = '110 - "Response is Stale"'
+    return get_conditional_response(
+        request,
+        etag=response['ETag'],
+        last_modified=parse_http_date_safe(
+            response.get('Last-Modified', '')),
+        response=response)
+
+
+class PageCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _cacheable_request(request):
+            return self.get_response(request)
+        key = _key(request)
+        entry = cache.get(key)
+        if entry is None:
+            return self.render(request, key, entry)
+        scopes, versions = entry[:2]
+        if feed_cache.versions(*scopes) == versions:
+            return _serve(request, entry)
+        # Пока устаревшую страницу пересчитывает другой запрос или
+        # база недоступна, отдаём прежнюю (stale-while-revalidate).
+        if resilience.is_open() or not fill.acquire(key):
+            return _serve(request, entry, stale=True)
+        try:
+            return self.render(request, key, entry)
+        finally:
+            fill.release(key)
+
+    def render(self, request, key, entry):
+        response = self.get_response(request)
+        if response.status_code == 503 and entry is not None:
+            return _serve(request, entry, stale=True)
+        if _cacheable_response(request, response):
+            # Версии сняты до view: если пост изменится во время
+            # рендера, запись сразу окажется устаревшей, а не «свежей».
+            scopes, versions = request.surrogate_versions
+            cache.set(key, (scopes, versions, response, time.time()),
+                      settings.PAGE_CACHE_TIMEOUT + settings.PAGE_CACHE_STALE)
+            _personalize(request, response, scopes, versions)
+        return response
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-16 23:47
+
+from django.db import migrations, models
+
+
+def copy_pub_date(apps, schema_editor):
+    # Старые посты не редактировались с публикации.
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated_at=models.F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(copy_pub_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-17 00:13
+
+from django.db import migrations, models
+
+
+def count_refs(apps, schema_editor):
+    # Уже загруженные файлы лежат под прежними именами, считаем и их.
+    Post = apps.get_model('posts', 'Post')
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    refs = (Post.objects.exclude(image='').order_by().values_list('image')
+            .annotate(refs=models.Count('id')))
+    MediaFile.objects.bulk_create(
+        MediaFile(name=name, refcount=count) for name, count in refs)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_imagevariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('digest', models.CharField(blank=True, db_index=True, max_length=64, verbose_name='Хеш содержимого')),
+                ('refcount', models.IntegerField(db_index=True, default=0, verbose_name='Ссылок')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Изменено')),
+            ],
+            options={
+                'verbose_name': 'Файл картинки',
+                'verbose_name_plural': 'Файлы картинок',
+                'ordering': ('name',),
+            },
+        ),
+        migrations.RunPython(count_refs, migrations.RunPython.noop),
+    ]
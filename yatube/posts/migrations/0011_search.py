@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    # Схема индекса своя у каждой базы, поэтому SQL берётся из
+    # posts.search, а не из модели.
+    from posts import search
+    backend = search.backend(schema_editor.connection.vendor)
+    for sql in backend.create_sql:
+        schema_editor.execute(sql)
+    Post = apps.get_model('posts', 'Post')
+    ids = list(Post.objects.values_list('id', flat=True))
+    if ids:
+        with schema_editor.connection.cursor() as cursor:
+            backend.index(cursor, ids)
+
+
+def drop_index(apps, schema_editor):
+    from posts import search
+    for sql in search.backend(schema_editor.connection.vendor).drop_sql:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+def create_indexes(apps, schema_editor):
+    # Триграммные индексы есть только в PostgreSQL; для остальных баз
+    # posts.autocomplete держит индекс в памяти.
+    from posts import autocomplete
+    backend = autocomplete.backend(schema_editor.connection.vendor)
+    for sql in backend.create_sql:
+        schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    from posts import autocomplete
+    backend = autocomplete.backend(schema_editor.connection.vendor)
+    for sql in backend.drop_sql:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0011_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
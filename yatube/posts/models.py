@@ -5,21 +5,73 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
-class Group(models.Model):
+class CounterFieldsMixin:
+    """Не даёт обычному save() перезаписать денормализованные счётчики.
+
+    Счётчики меняются только через F()-выражения (posts.counters), а
+    экземпляр из формы или админки хранит значение на момент чтения.
+    Поэтому save() уже сохранённого объекта без update_fields пишет
+    все поля, кроме counter_fields.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not args and not self._state.adding
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class Group(CounterFieldsMixin, models.Model):
+    counter_fields = ('posts_count',)
+
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Постов в группе', default=0, editable=False)
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для карточек ленты: автор и группа одним запросом."""
+        return self.select_related('author', 'group')
+
+    def for_detail(self):
+        """Пост со счётчиками автора и комментариями с их авторами."""
+        return self.select_related(
+            'author__counters', 'group'
+        ).prefetch_related(comments_prefetch())
+
+
+def comments_prefetch():
+    """Комментарии поста по времени, с авторами."""
+    return models.Prefetch(
+        'comments',
+        queryset=Comment.objects.select_related('author').order_by('created'),
+    )
+
+
+class Post(CounterFieldsMixin, models.Model):
+    counter_fields = ('comments_count',)
+
     text = models.TextField('Текст поста',
                             help_text='Введите текст поста',)
     pub_date = models.DateTimeField('Дата публикации',
                                     auto_now_add=True,
                                     db_index=True,)
+    updated_at = models.DateTimeField('Дата изменения',
+                                      auto_now=True,
+                                      db_index=True,)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -40,11 +92,21 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True,
     )
+    image_placeholder = models.TextField(
+        'Заглушка картинки', blank=True, editable=False)
+    comments_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ("-pub_date",)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_pub_date'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -98,3 +160,304 @@ class Follow(models.Model):
 
     def __str__(self):
         return self.user.username
+
+
+class UserCounters(models.Model):
+    """Счётчики пользователя, чтобы не считать COUNT(*) на каждой странице.
+
+    Обновляются сигналами из posts.signals, расхождения чинит
+    команда recount_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков', default=0, db_index=True)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    """Пост во входящей ленте подписчика (fan-out on write)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='timeline_user_pub_date'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class ThumbnailJob(models.Model):
+    """Задание нарезать миниатюры картинки (очередь posts.thumbnails)."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'В работе'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    image = models.CharField('Картинка', max_length=255, unique=True)
+    status = models.CharField(
+        'Статус', max_length=10, choices=STATUSES, default=PENDING,
+        db_index=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    error = models.TextField('Ошибка', blank=True)
+    updated = models.DateTimeField('Изменено', auto_now=True)
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Нарезка миниатюр'
+        verbose_name_plural = 'Нарезка миниатюр'
+
+    def __str__(self):
+        return f'{self.image}: {self.status}'
+
+
+class ImageVariant(models.Model):
+    """Готовый вариант картинки поста: ширина и формат (posts.variants)."""
+    image = models.CharField('Картинка', max_length=255, db_index=True)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    format = models.CharField('Формат', max_length=10)
+    name = models.CharField('Файл', max_length=255)
+
+    class Meta:
+        ordering = ('image', 'width')
+        unique_together = ('image', 'width', 'format')
+        verbose_name = 'Вариант картинки'
+        verbose_name_plural = 'Варианты картинок'
+
+    def __str__(self):
+        return f'{self.image}: {self.width}w {self.format}'
+
+
+class MediaFile(models.Model):
+    """Число постов, которые ссылаются на файл картинки (posts.media)."""
+    name = models.CharField('Файл', max_length=255, unique=True)
+    digest = models.CharField(
+        'Хеш содержимого', max_length=64, blank=True, db_index=True)
+    refcount = models.IntegerField('Ссылок', default=0, db_index=True)
+    updated = models.DateTimeField('Изменено', auto_now=True)
+
+    class Meta:
+        ordering = ('name',)
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name}: {self.refcount}'
+
+
+class Tag(models.Model):
+    """Хештег из текстов постов, в нижнем регистре (posts.tags)."""
+    name = models.CharField('Тег', max_length=100, unique=True)
+
+    class Meta:
+        ordering = ('name',)
+        verbose_name = 'Тег'
+        verbose_name_plural = 'Теги'
+
+    def __str__(self):
+        return self.name
+
+
+class PostTag(models.Model):
+    """Пост в ленте тега; дата копируется из поста ради индекса."""
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='entries',
+        verbose_name='Тег'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tag_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Тег поста'
+        verbose_name_plural = 'Теги постов'
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'post'],
+                                    name='unique_post_tag')
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-pub_date'],
+                         name='post_tag_tag_pub_date'),
+        ]
+
+    def __str__(self):
+        return f'{self.tag_id}: {self.post_id}'
+
+
+class Mention(models.Model):
+    """Упоминание пользователя (@username) в тексте поста."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='Кого упомянули'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Упоминание'
+        verbose_name_plural = 'Упоминания'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_mention')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='mention_user_pub_date'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class RelatedPost(models.Model):
+    """Похожий пост по TF-IDF текстов (posts.related)."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='related_entries',
+        verbose_name='Пост'
+    )
+    related = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='related_to',
+        verbose_name='Похожий пост'
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'Похожий пост'
+        verbose_name_plural = 'Похожие посты'
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'related'],
+                                    name='unique_related_post')
+        ]
+        indexes = [
+            models.Index(fields=['post', '-score'],
+                         name='related_post_score'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.related_id}'
+
+
+class Fingerprint(models.Model):
+    """MinHash текста поста или комментария (posts.duplicates)."""
+    post = models.OneToOneField(
+        Post,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='fingerprint',
+        verbose_name='Пост'
+    )
+    comment = models.OneToOneField(
+        Comment,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='fingerprint',
+        verbose_name='Комментарий'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='fingerprints',
+        verbose_name='Автор'
+    )
+    signature = models.BinaryField('Подпись MinHash')
+    duplicate_of = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='duplicates',
+        verbose_name='Копия текста'
+    )
+    created = models.DateTimeField('Создан', auto_now_add=True,
+                                   db_index=True)
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Отпечаток текста'
+        verbose_name_plural = 'Отпечатки текстов'
+
+    def __str__(self):
+        if self.post_id is not None:
+            return f'post {self.post_id}'
+        return f'comment {self.comment_id}'
+
+
+class FingerprintBand(models.Model):
+    """Полоса LSH: хеш части подписи, по нему ищутся кандидаты."""
+    fingerprint = models.ForeignKey(
+        Fingerprint,
+        on_delete=models.CASCADE,
+        related_name='bands',
+        verbose_name='Отпечаток'
+    )
+    value = models.BigIntegerField('Хеш полосы', db_index=True)
+
+    class Meta:
+        verbose_name = 'Полоса отпечатка'
+        verbose_name_plural = 'Полосы отпечатков'
+
+    def __str__(self):
+        return f'{self.fingerprint_id}: {self.value}'
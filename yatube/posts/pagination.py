@@ -0,0 +1,224 @@
+import heapq
+import json
+from collections.abc import Sequence
+from itertools import islice
+from types import SimpleNamespace
+
+from django.db.models import Q
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode
+from django.utils.http import urlsafe_base64_encode
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class MergedFeed:
+    """Несколько отсортированных QuerySet как одна лента.
+
+    Поддерживает ровно то, чем пользуются Paginator и KeysetPaginator:
+    count(), срезы, filter() и order_by(). Срез [a:b] читает из каждого
+    источника не больше b записей и сливает их кучей (heapq.merge).
+    Все источники должны быть одной модели и без пересечений.
+    Источник со своим order_by читается в нём, остальные - в ordering;
+    сливаются они по атрибутам из ordering, поэтому ключ должен быть у
+    всех источников (например, аннотация entry_date).
+    """
+
+    ordered = True
+
+    def __init__(self, sources, ordering=('-pub_date', '-id')):
+        self.sources = list(sources)
+        self.ordering = tuple(ordering)
+        self.model = self.sources[0].model
+
+    def _clone(self, sources, ordering=None):
+        return MergedFeed(sources, ordering or self.ordering)
+
+    def filter(self, *args, **kwargs):
+        return self._clone(
+            source.filter(*args, **kwargs) for source in self.sources)
+
+    def exclude(self, *args, **kwargs):
+        return self._clone(
+            source.exclude(*args, **kwargs) for source in self.sources)
+
+    def order_by(self, *ordering):
+        return self._clone(
+            (source.order_by(*ordering) for source in self.sources),
+            ordering)
+
+    def count(self):
+        return sum(source.count() for source in self.sources)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return self._merge(self.sources)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step is not None or index.stop is None:
+                raise ValueError('MergedFeed supports only [start:stop].')
+            start = index.start or 0
+            sources = [
+                self._ordered(source)[:index.stop]
+                for source in self.sources]
+            return list(islice(self._merge(sources), start, index.stop))
+        return self[index:index + 1][0]
+
+    def _ordered(self, source):
+        if source.query.order_by:
+            return source
+        return source.order_by(*self.ordering)
+
+    def _merge(self, sources):
+        keys = [field.lstrip('-') for field in self.ordering]
+        descending = self.ordering[0].startswith('-')
+
+        def sort_key(obj):
+            return tuple(getattr(obj, key) for key in keys)
+
+        return heapq.merge(*sources, key=sort_key, reverse=descending)
+
+
+class KeysetPage(Sequence):
+    """Страница курсорной пагинации.
+
+    Повторяет интерфейс Page, которым пользуется includes/paginator.html,
+    но вместо номеров страниц отдаёт курсоры соседних страниц.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Keyset page of %d objects>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Пагинация по ключу (pub_date, id) вместо OFFSET/LIMIT.
+
+    Каждая страница читается одним запросом по индексу, без COUNT(*),
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    Ключи сортируются по убыванию, как Post.Meta.ordering.
+
+    lookups - имена тех же ключей для filter и order_by, если лента
+    сортирована по дате из связанной таблицы (аннотация вроде
+    entry_date=F('tag_entries__pub_date')). Значения курсора берутся
+    из этих атрибутов, а поля keys задают их тип.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 lookups=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = tuple(keys)
+        self.lookups = tuple(lookups or keys)
+
+    def encode_cursor(self, obj, backwards=False):
+        position = []
+        for key, lookup in zip(self.keys, self.lookups):
+            field = self._field(key)
+            value = SimpleNamespace(**{field.attname: getattr(obj, lookup)})
+            position.append(field.value_to_string(value))
+        payload = json.dumps([position, int(backwards)])
+        return urlsafe_base64_encode(force_bytes(payload))
+
+    def decode_cursor(self, cursor):
+        try:
+            position, backwards = json.loads(
+                urlsafe_base64_decode(cursor).decode())
+            if len(position) != len(self.keys):
+                raise ValueError
+            position = [
+                self._field(key).to_python(value)
+                for key, value in zip(self.keys, position)]
+        except Exception:
+            raise InvalidCursor(cursor)
+        return position, bool(backwards)
+
+    def page(self, cursor=None):
+        if not cursor:
+            return self._forward(None)
+        position, backwards = self.decode_cursor(cursor)
+        if backwards:
+            return self._backward(position)
+        return self._forward(position)
+
+    def get_page(self, cursor=None):
+        """Как Paginator.get_page: битый курсор ведёт на первую страницу."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    def _field(self, key):
+        if key == 'pk':
+            return self.object_list.model._meta.pk
+        return self.object_list.model._meta.get_field(key)
+
+    def _seek(self, position, backwards):
+        """Записи строго после (или до) позиции в порядке обхода."""
+        queryset = self.object_list
+        lookup = 'gt' if backwards else 'lt'
+        if position is not None:
+            condition = Q()
+            for index, key in enumerate(self.lookups):
+                equal = {k: v for k, v in zip(self.lookups[:index], position)}
+                equal['%s__%s' % (key, lookup)] = position[index]
+                condition |= Q(**equal)
+            queryset = queryset.filter(condition)
+        prefix = '' if backwards else '-'
+        return queryset.order_by(*(prefix + key for key in self.lookups))
+
+    def _fetch(self, position, backwards):
+        objects = list(
+            self._seek(position, backwards)[:self.per_page + 1])
+        return objects[:self.per_page], len(objects) > self.per_page
+
+    def _forward(self, position):
+        objects, has_more = self._fetch(position, backwards=False)
+        next_cursor = previous_cursor = None
+        if objects and has_more:
+            next_cursor = self.encode_cursor(objects[-1])
+        if objects and position is not None:
+            previous_cursor = self.encode_cursor(objects[0], backwards=True)
+        return KeysetPage(objects, self, next_cursor, previous_cursor)
+
+    def _backward(self, position):
+        objects, has_more = self._fetch(position, backwards=True)
+        objects.reverse()
+        if len(objects) < self.per_page:
+            # Сдвинулись к самому началу ленты: отдаём первую страницу
+            # целиком, чтобы она не оказалась короче остальных.
+            return self._forward(None)
+        next_cursor = previous_cursor = None
+        if objects:
+            next_cursor = self.encode_cursor(objects[-1])
+        if objects and has_more:
+            previous_cursor = self.encode_cursor(objects[0], backwards=True)
+        return KeysetPage(objects, self, next_cursor, previous_cursor)
@@ -0,0 +1,270 @@
+"""Похожие посты по TF-IDF текстов.
+
+Команда build_related считает векторы текстов вне запросов и кладёт
+RELATED_POSTS ближайших соседей каждого поста в таблицу RelatedPost;
+страница поста читает их одним запросом по индексу (post, score).
+
+Слова берутся как в поиске (search.words), вес слова в посте -
+(1 + log tf) * idf, строки нормированы, поэтому сходство - скалярное
+произведение строк. Матрица разреженная (scipy.sparse), тексты
+читаются и умножаются пачками по batch постов, плотной матрицы N x N
+в памяти нет. Из-за частых слов произведение пачки на индекс почти
+плотное, поэтому оно считается кусками по CHUNK постов индекса, а от
+каждого куска остаются только лучшие соседи строки.
+
+Словарь с частотами слов и матрица лежат в RELATED_INDEX_DIR. Обычный
+запуск берёт только посты новее проиндексированных: считает их векторы
+по сохранённым частотам, находит им соседей и добавляет их в списки
+старых постов, если они ближе худшего соседа; слова удалённых постов
+вычитаются из частот. Правки текстов и сдвиг idf в векторах старых
+постов учитывает полный пересчёт (--rebuild). Он заменяет списки
+соседей пачками, пост за постом, и страницы постов во время пересчёта
+показывают прежние списки.
+"""
+import json
+import os
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from . import feed_cache
+from .models import Post
+from .models import RelatedPost
+from .search import words
+
+VOCABULARY = 'vocabulary.json'
+MATRIX = 'matrix.npz'
+IDS = 'ids.npy'
+# Сколько постов индекса умножается на пачку за раз.
+CHUNK = 5000
+
+
+class Index:
+    """Словарь, документные частоты и нормированная матрица TF-IDF."""
+
+    def __init__(self, terms=(), df=(), documents=0, matrix=None, ids=None):
+        self.columns = {term: column for column, term in enumerate(terms)}
+        self.terms = list(terms)
+        self.df = list(df)
+        self.documents = documents
+        self.matrix = matrix if matrix is not None else sparse.csr_matrix(
+            (0, len(self.terms)), dtype=np.float32)
+        self.ids = ids if ids is not None else np.empty(0, dtype=np.int64)
+
+    @classmethod
+    def load(cls, directory=None):
+        """Сохранённый индекс или пустой, если его ещё не строили."""
+        directory = directory or settings.RELATED_INDEX_DIR
+        try:
+            with open(os.path.join(directory, VOCABULARY)) as file:
+                vocabulary = json.load(file)
+            matrix = sparse.load_npz(os.path.join(directory, MATRIX))
+            ids = np.load(os.path.join(directory, IDS))
+        except FileNotFoundError:
+            return cls()
+        return cls(vocabulary['terms'], vocabulary['df'],
+                   vocabulary['documents'], matrix.tocsr(), ids)
+
+    def save(self, directory=None):
+        directory = directory or settings.RELATED_INDEX_DIR
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, VOCABULARY), 'w') as file:
+            json.dump({'terms': self.terms, 'df': self.df,
+                       'documents': self.documents}, file)
+        sparse.save_npz(os.path.join(directory, MATRIX), self.matrix)
+        np.save(os.path.join(directory, IDS), self.ids)
+
+    def count(self, texts):
+        """Учитывает тексты в частотах слов; возвращает их Counter."""
+        counts = [Counter(words(text)) for text in texts]
+        for terms in counts:
+            for term in terms:
+                column = self.columns.get(term)
+                if column is None:
+                    column = self.columns[term] = len(self.terms)
+                    self.terms.append(term)
+                    self.df.append(0)
+                self.df[column] += 1
+        self.documents += len(counts)
+        return counts
+
+    def idf(self):
+        df = np.asarray(self.df, dtype=np.float32)
+        return np.log((1 + self.documents) / (1 + df)) + 1
+
+    def weigh(self, counts, idf):
+        """Нормированные строки TF-IDF для Counter слов."""
+        indptr, indices, data = [0], [], []
+        for terms in counts:
+            for term, count in terms.items():
+                indices.append(self.columns[term])
+                data.append(1 + np.log(count))
+            indptr.append(len(indices))
+        rows = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), indices, indptr),
+            shape=(len(counts), len(self.terms)))
+        rows = rows.multiply(idf[:len(self.terms)]).tocsr()
+        norms = np.sqrt(np.asarray(rows.multiply(rows).sum(axis=1))).ravel()
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms).dot(rows).astype(np.float32).tocsr()
+
+    def append(self, rows, ids):
+        """Дописывает строки; у старых появляются столбцы новых слов."""
+        blocks = list(rows) if isinstance(rows, list) else [rows]
+        self.matrix.resize((self.matrix.shape[0], len(self.terms)))
+        self.matrix = sparse.vstack([self.matrix, *blocks], format='csr')
+        self.ids = np.concatenate([self.ids, np.asarray(ids, np.int64)])
+
+    def keep(self, alive):
+        """Оставляет строки только существующих постов.
+
+        Слова убранных строк вычитаются из документных частот.
+        """
+        mask = np.isin(self.ids, np.fromiter(alive, np.int64, len(alive)))
+        removed = self.matrix[~mask]
+        if removed.shape[0]:
+            # В строке каждое слово - один ненулевой столбец.
+            counts = np.bincount(removed.indices, minlength=len(self.df))
+            self.df = (np.asarray(self.df, np.int64) - counts).tolist()
+            self.documents -= removed.shape[0]
+        self.matrix = self.matrix[mask]
+        self.ids = self.ids[mask]
+
+
+def _posts(after=0, batch=1000):
+    """Пачки [(id, текст)] постов с id > after по возрастанию id."""
+    posts = Post.objects.order_by('id').values_list('id', 'text')
+    while True:
+        rows = list(posts.filter(id__gt=after)[:batch])
+        if not rows:
+            return
+        yield rows
+        after = rows[-1][0]
+
+
+def _best_per_row(rows, columns, scores, limit):
+    """Не больше limit элементов каждой строки с наибольшими scores."""
+    order = np.lexsort((-scores, rows))
+    rows, columns, scores = rows[order], columns[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < limit
+    return rows[keep], columns[keep], scores[keep]
+
+
+def neighbours(rows, row_ids, index, limit=None, chunk=CHUNK):
+    """{id поста: {id соседа: сходство}} для строк rows по всему индексу.
+
+    Индекс умножается кусками по chunk постов; после каждого куска у
+    строки остаются limit лучших соседей, так что в памяти не больше
+    произведения пачки на один кусок.
+    """
+    limit = limit or settings.RELATED_POSTS
+    row_ids = np.asarray(row_ids, np.int64)
+    best_rows = best_ids = np.empty(0, np.int64)
+    best_scores = np.empty(0, np.float32)
+    for start in range(0, index.matrix.shape[0], chunk):
+        similarities = rows.dot(index.matrix[start:start + chunk].T).tocoo()
+        ids = index.ids[start + similarities.col]
+        keep = ((ids != row_ids[similarities.row])
+                & (similarities.data >= settings.RELATED_MIN_SCORE))
+        best_rows, best_ids, best_scores = _best_per_row(
+            np.concatenate([best_rows, similarities.row[keep]]),
+            np.concatenate([best_ids, ids[keep]]),
+            np.concatenate([best_scores, similarities.data[keep]]),
+            limit)
+    found = {int(post_id): {} for post_id in row_ids}
+    for row, related_id, score in zip(best_rows, best_ids, best_scores):
+        found[int(row_ids[row])][int(related_id)] = float(score)
+    return found
+
+
+def _top(related, limit=None):
+    limit = limit or settings.RELATED_POSTS
+    return dict(sorted(related.items(), key=lambda item: -item[1])[:limit])
+
+
+def store(found):
+    """Заменяет списки соседей постов found и сбрасывает их кеш."""
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=list(found)).delete()
+        RelatedPost.objects.bulk_create(
+            [RelatedPost(post_id=post_id, related_id=related_id, score=score)
+             for post_id, related in found.items()
+             for related_id, score in related.items()],
+            batch_size=1000)
+    feed_cache.bump(*map(feed_cache.post_scope, found))
+
+
+def rebuild(batch=1000, directory=None):
+    """Строит индекс заново по всем постам; возвращает их число."""
+    index = Index()
+    for rows in _posts(batch=batch):
+        index.count(text for _, text in rows)
+    idf = index.idf()
+    blocks, ids = [], []
+    for rows in _posts(batch=batch):
+        counts = [Counter(words(text)) for _, text in rows]
+        blocks.append(index.weigh(counts, idf))
+        ids.extend(id_ for id_, _ in rows)
+    # Одно склеивание в конце, а не копия матрицы на каждую пачку.
+    index.append(blocks, ids)
+    # Без общего удаления: store заменяет списки пачки, и до неё
+    # страницы показывают прежние.
+    for start in range(0, len(index.ids), batch):
+        store(neighbours(index.matrix[start:start + batch],
+                         index.ids[start:start + batch], index))
+    index.save(directory)
+    return len(index.ids)
+
+
+def update(batch=1000, directory=None):
+    """Добавляет в индекс новые посты; возвращает их число."""
+    index = Index.load(directory)
+    if not index.documents:
+        return rebuild(batch, directory)
+    index.keep(set(Post.objects.values_list('id', flat=True)))
+    after = int(index.ids.max()) if len(index.ids) else 0
+    added = 0
+    for rows in _posts(after, batch):
+        ids = [id_ for id_, _ in rows]
+        counts = index.count(text for _, text in rows)
+        index.append(index.weigh(counts, index.idf()), ids)
+        found = neighbours(index.matrix[-len(ids):], ids, index)
+        store({**_closer(found, set(ids)), **found})
+        added += len(ids)
+    index.save(directory)
+    return added
+
+
+def _closer(found, new_ids):
+    """Старые посты, которым новые посты ближе их худшего соседа."""
+    candidates = {}
+    for post_id, related in found.items():
+        for related_id, score in related.items():
+            if related_id not in new_ids:
+                candidates.setdefault(related_id, {})[post_id] = score
+    if not candidates:
+        return {}
+    current = {}
+    for post_id, related_id, score in RelatedPost.objects.filter(
+            post_id__in=list(candidates)).values_list(
+                'post_id', 'related_id', 'score'):
+        current.setdefault(post_id, {})[related_id] = score
+    changed = {}
+    for post_id, closer in candidates.items():
+        related = current.get(post_id, {})
+        top = _top({**related, **closer})
+        if top != related:
+            changed[post_id] = top
+    return changed
+
+
+def for_post(post_id, limit=None):
+    """Похожие посты одним запросом по индексу (post, score)."""
+    limit = limit or settings.RELATED_POSTS
+    return list(
+        Post.objects.filter(related_to__post_id=post_id)
+        .order_by('-related_to__score')[:limit])
@@ -0,0 +1,283 @@
+"""Полнотекстовый поиск по постам и комментариям к ним.
+
+Индекс - таблица posts_search, по строке на пост: текст поста и
+тексты комментариев к нему. Сигналы Post пересобирают строку поста.
+Новый комментарий дописывается к строке (index_comment), не собирая
+заново все комментарии ветки; правка и удаление комментария, которые
+случаются редко, пересобирают строку поста. Команда rebuild_search
+пересобирает весь индекс.
+
+* PostgreSQL: столбец tsvector с GIN-индексом и конфигурацией
+  SEARCH_CONFIG ('russian' - стемминг под LANGUAGE_CODE), текст поста
+  весит больше комментариев (setweight A и B), ранг - ts_rank_cd.
+* SQLite: виртуальная таблица FTS5 (колонки text и comments), ранг -
+  bm25 с теми же весами. Стемминга нет, слова запроса ищутся как
+  префиксы.
+
+Выдача упорядочена по рангу и листается курсором по (ранг, id поста),
+как ленты в KeysetPaginator, без OFFSET и COUNT(*).
+"""
+import json
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode
+from django.utils.http import urlsafe_base64_encode
+
+from .models import Comment
+from .models import Post
+from .pagination import InvalidCursor
+from .pagination import KeysetPage
+
+TABLE = 'posts_search'
+POST_WEIGHT = 2.0
+COMMENT_WEIGHT = 1.0
+
+
+class PostgresBackend:
+    create_sql = [
+        f'CREATE TABLE {TABLE} ('
+        f' post_id integer PRIMARY KEY'
+        f'  REFERENCES {Post._meta.db_table} (id)'
+        f'  ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,'
+        f' document tsvector NOT NULL)',
+        f'CREATE INDEX {TABLE}_document ON {TABLE} USING gin (document)',
+    ]
+    drop_sql = [f'DROP TABLE {TABLE}']
+
+    def index(self, cursor, post_ids):
+        cursor.execute(
+            f'INSERT INTO {TABLE} (post_id, document)'
+            f' SELECT p.id,'
+            f'  setweight(to_tsvector(%s::regconfig, p.text), \'A\')'
+            f'  || setweight(to_tsvector(%s::regconfig, coalesce('
+            f'   (SELECT string_agg(c.text, \' \')'
+            f'    FROM {Comment._meta.db_table} c'
+            f'    WHERE c.post_id = p.id), \'\')), \'B\')'
+            f' FROM {Post._meta.db_table} p WHERE p.id = ANY(%s)'
+            f' ON CONFLICT (post_id) DO UPDATE'
+            f' SET document = EXCLUDED.document',
+            [settings.SEARCH_CONFIG, settings.SEARCH_CONFIG,
+             list(post_ids)])
+
+    def append_comment(self, cursor, post_id, text):
+        cursor.execute(
+            f'UPDATE {TABLE} SET document = document'
+            f' || setweight(to_tsvector(%s::regconfig, %s), \'B\')'
+            f' WHERE post_id = %s',
+            [settings.SEARCH_CONFIG, text, post_id])
+        return cursor.rowcount
+
+    def remove(self, cursor, post_ids):
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE post_id = ANY(%s)', [list(post_ids)])
+
+    def ranked_sql(self):
+        # Веса по порядку D, C, B, A: комментарии (B) вдвое легче поста.
+        # ts_rank_cd возвращает real, а ранг из курсора приходит как
+        # double precision: без приведения равные ранги не совпадут.
+        return (
+            f'SELECT s.post_id,'
+            f' ts_rank_cd(\'{{0, 0, {COMMENT_WEIGHT / POST_WEIGHT}, 1}}\','
+            f' s.document, q)::float8 AS score'
+            f' FROM {TABLE} s, plainto_tsquery(%s::regconfig, %s) q'
+            f' WHERE s.document @@ q',
+            [settings.SEARCH_CONFIG])
+
+    def match(self, query):
+        return query
+
+
+class SqliteBackend:
+    create_sql = [
+        f'CREATE VIRTUAL TABLE {TABLE} USING fts5('
+        f'text, comments, tokenize="unicode61 remove_diacritics 2")',
+    ]
+    drop_sql = [f'DROP TABLE {TABLE}']
+
+    def index(self, cursor, post_ids):
+        self.remove(cursor, post_ids)
+        marks = ', '.join(['%s'] * len(post_ids))
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text, comments)'
+            f' SELECT p.id, p.text, coalesce('
+            f'  (SELECT group_concat(c.text, \' \')'
+            f'   FROM {Comment._meta.db_table} c'
+            f'   WHERE c.post_id = p.id), \'\')'
+            f' FROM {Post._meta.db_table} p WHERE p.id IN ({marks})',
+            list(post_ids))
+
+    def append_comment(self, cursor, post_id, text):
+        cursor.execute(
+            f'UPDATE {TABLE} SET comments = comments || \' \' || %s'
+            f' WHERE rowid = %s',
+            [text, post_id])
+        return cursor.rowcount
+
+    def remove(self, cursor, post_ids):
+        marks = ', '.join(['%s'] * len(post_ids))
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid IN ({marks})', list(post_ids))
+
+    def ranked_sql(self):
+        # bm25 тем меньше, чем документ лучше.
+        return (
+            f'SELECT rowid AS post_id,'
+            f' -bm25({TABLE}, {POST_WEIGHT}, {COMMENT_WEIGHT}) AS score'
+            f' FROM {TABLE} WHERE {TABLE} MATCH %s',
+            [])
+
+    def match(self, query):
+        return ' '.join(f'"{word}"*' for word in words(query))
+
+
+BACKENDS = {
+    'postgresql': PostgresBackend,
+    'sqlite': SqliteBackend,
+}
+
+
+def backend(vendor=None):
+    vendor = vendor or connection.vendor
+    if vendor not in BACKENDS:
+        raise ImproperlyConfigured(f'Поиск не умеет работать с {vendor}')
+    return BACKENDS[vendor]()
+
+
+def words(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def index_posts(post_ids):
+    post_ids = [post_id for post_id in post_ids if post_id is not None]
+    if post_ids:
+        with connection.cursor() as cursor:
+            backend().index(cursor, post_ids)
+
+
+def index_comment(comment):
+    """Дописывает новый комментарий к строке индекса его поста.
+
+    Если строки ещё нет (индекс не собран), пост индексируется целиком.
+    """
+    search = backend()
+    with connection.cursor() as cursor:
+        if not search.append_comment(cursor, comment.post_id, comment.text):
+            search.index(cursor, [comment.post_id])
+
+
+def remove_posts(post_ids):
+    if post_ids:
+        with connection.cursor() as cursor:
+            backend().remove(cursor, list(post_ids))
+
+
+def rebuild(batch=1000):
+    """Пересобирает весь индекс; возвращает число постов."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    ids = list(Post.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), batch):
+        index_posts(ids[start:start + batch])
+    return len(ids)
+
+
+def ranked(query, position=None, backwards=False, limit=10):
+    """[(id поста, ранг)] после position = (ранг, id) по убыванию ранга.
+
+    С backwards - перед position по возрастанию.
+    """
+    search = backend()
+    sql, params = search.ranked_sql()
+    params = params + [search.match(query)]
+    sql = f'SELECT post_id, score FROM ({sql}) ranked'
+    if position is not None:
+        sign = '>' if backwards else '<'
+        sql += (f' WHERE score {sign} %s'
+                f' OR (score = %s AND post_id {sign} %s)')
+        params += [position[0], position[0], position[1]]
+    order = 'ASC' if backwards else 'DESC'
+    sql += f' ORDER BY score {order}, post_id {order} LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(post_id, float(score)) for post_id, score in cursor]
+
+
+def post_ids(query, limit=1000):
+    """id лучших постов по запросу, для админки."""
+    if not words(query):
+        return []
+    return [post_id for post_id, _ in ranked(query, limit=limit)]
+
+
+class SearchPaginator:
+    """Курсорная пагинация выдачи поиска; страницы - KeysetPage."""
+
+    def __init__(self, query, per_page, queryset=None):
+        self.query = query
+        self.per_page = int(per_page)
+        self.queryset = queryset if queryset is not None else (
+            Post.objects.for_feed())
+
+    def encode_cursor(self, hit, backwards=False):
+        payload = json.dumps([hit[1], hit[0], int(backwards)])
+        return urlsafe_base64_encode(force_bytes(payload))
+
+    def decode_cursor(self, cursor):
+        try:
+            rank, post_id, backwards = json.loads(
+                urlsafe_base64_decode(cursor).decode())
+            position = (float(rank), int(post_id))
+        except Exception:
+            raise InvalidCursor(cursor)
+        return position, bool(backwards)
+
+    def get_page(self, cursor=None):
+        position, backwards = None, False
+        if cursor:
+            try:
+                position, backwards = self.decode_cursor(cursor)
+            except InvalidCursor:
+                pass
+        return self.page(position, backwards)
+
+    def page(self, position=None, backwards=False):
+        if not words(self.query):
+            return KeysetPage([], self)
+        if backwards:
+            return self._backward(position)
+        return self._forward(position)
+
+    def _fetch(self, position, backwards):
+        hits = ranked(self.query, position, backwards, self.per_page + 1)
+        return hits[:self.per_page], len(hits) > self.per_page
+
+    def _page(self, hits, next_cursor, previous_cursor):
+        posts = self.queryset.in_bulk([post_id for post_id, _ in hits])
+        objects = [posts[post_id] for post_id, _ in hits
+                   if post_id in posts]
+        return KeysetPage(objects, self, next_cursor, previous_cursor)
+
+    def _forward(self, position):
+        hits, has_more = self._fetch(position, backwards=False)
+        next_cursor = previous_cursor = None
+        if hits and has_more:
+            next_cursor = self.encode_cursor(hits[-1])
+        if hits and position is not None:
+            previous_cursor = self.encode_cursor(hits[0], backwards=True)
+        return self._page(hits, next_cursor, previous_cursor)
+
+    def _backward(self, position):
+        hits, has_more = self._fetch(position, backwards=True)
+        hits.reverse()
+        if len(hits) < self.per_page:
+            return self._forward(None)
+        next_cursor = self.encode_cursor(hits[-1])
+        previous_cursor = None
+        if has_more:
+            previous_cursor = self.encode_cursor(hits[0], backwards=True)
+        return self._page(hits, next_cursor, previous_cursor)
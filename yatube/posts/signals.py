@@ -0,0 +1,151 @@
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_init
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from . import autocomplete
+from . import counters
+from . import duplicates
+from . import feed_cache
+from . import media
+from . import search
+from . import tags
+from . import thumbnails
+from . import timeline
+from . import variants
+from .models import Comment
+from .models import Follow
+from .models import Group
+from .models import Post
+from .models import User
+from .models import UserCounters
+
+
+@receiver(post_save, sender=User)
+def create_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Вход обновляет только last_login: индекс не трогаем, иначе
+    # каждый вход заставит все воркеры перечитать его целиком.
+    if raw or (update_fields is not None
+               and not autocomplete.USER_FIELDS & set(update_fields)):
+        return
+    autocomplete.backend().changed(autocomplete.USER, instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    autocomplete.backend().removed(autocomplete.USER, instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        autocomplete.backend().changed(autocomplete.GROUP, instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    autocomplete.backend().removed(autocomplete.GROUP, instance.pk)
+
+
+@receiver(post_init, sender=Post)
+def remember_saved(sender, instance, **kwargs):
+    instance._saved_group_id = instance.group_id
+    instance._saved_image = instance.image.name
+    instance._saved_text = instance.text
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    old_group_id = instance._saved_group_id
+    if created:
+        timeline.fan_out(instance)
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.bump_group(instance.group_id, 1)
+    elif instance.group_id != old_group_id:
+        counters.bump_group(old_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+    if instance.image.name != instance._saved_image:
+        image_changed(instance)
+    if created or instance.text != instance._saved_text:
+        search.index_posts([instance.id])
+        tag_ids = tags.index_post(instance, created)
+        duplicates.record(instance)
+    else:
+        tag_ids = tags.post_tag_ids(instance.id)
+    feed_cache.bump(
+        *feed_cache.post_scopes(instance, old_group_id),
+        *map(feed_cache.tag_scope, tag_ids))
+    instance._saved_group_id = instance.group_id
+    instance._saved_image = instance.image.name
+    instance._saved_text = instance.text
+
+
+def image_changed(instance):
+    # Для уже известного файла миниатюры и варианты готовы.
+    if instance.image and media.acquire(instance.image.name):
+        thumbnails.enqueue(instance.image.name)
+    if instance.image:
+        variants.copy_described(instance)
+    if instance._saved_image:
+        media.release(instance._saved_image)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_tags(sender, instance, **kwargs):
+    # К post_delete связи с тегами уже удалены каскадом.
+    instance._saved_tag_ids = tags.post_tag_ids(instance.id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    if instance._saved_image:
+        media.release(instance._saved_image)
+    search.remove_posts([instance.id])
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump_group(instance._saved_group_id, -1)
+    feed_cache.bump(
+        *feed_cache.post_scopes(instance, instance._saved_group_id),
+        *map(feed_cache.tag_scope, getattr(instance, '_saved_tag_ids', ())))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_post(instance.post_id, 1)
+    duplicates.record(instance)
+    if created:
+        search.index_comment(instance)
+    else:
+        search.index_posts([instance.post_id])
+    feed_cache.bump(feed_cache.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+    search.index_posts([instance.post_id])
+    feed_cache.bump(feed_cache.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+        counters.bump_user(instance.user_id, 'following_count', 1)
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        feed_cache.bump(feed_cache.followers_scope(instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def clean_timeline(sender, instance, **kwargs):
+    timeline.remove(instance.user_id, instance.author_id)
+    counters.bump_user(instance.user_id, 'following_count', -1)
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    feed_cache.bump(feed_cache.followers_scope(instance.author_id))
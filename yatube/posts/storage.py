@@ -0,0 +1,62 @@
+"""Хранилище, которое раскладывает картинки постов по хешу содержимого.
+
+Файлы с путями из CONTENT_ADDRESSED_PREFIXES сохраняются как
+<каталог>/<sha256 содержимого>/<исходное имя>. Если картинка с таким
+же содержимым уже есть у какого-нибудь поста (MediaFile, posts.media)
+или лежит под тем же именем, новый файл не пишется: save возвращает
+имя существующего. Остальные пути (миниатюры sorl, варианты картинок)
+сохраняются как в FileSystemStorage.
+
+Хранилище подключается как DEFAULT_FILE_STORAGE: sorl строит ключи
+миниатюр по классу хранилища картинки, и у поля модели и у sorl он
+должен быть один и тот же.
+"""
+import hashlib
+import posixpath
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.text import get_valid_filename
+
+from .models import MediaFile
+
+DIGEST_LENGTH = 32
+
+
+def digest(content):
+    sha = hashlib.sha256()
+    for chunk in content.chunks():
+        sha.update(chunk)
+    content.seek(0)
+    return sha.hexdigest()[:DIGEST_LENGTH]
+
+
+def name_digest(name):
+    """Хеш содержимого из имени файла или '' для прежних имён."""
+    digest_ = posixpath.basename(posixpath.dirname(name))
+    return digest_ if len(digest_) == DIGEST_LENGTH else ''
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def addressed(self, name):
+        return name.startswith(tuple(settings.CONTENT_ADDRESSED_PREFIXES))
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not self.addressed(name):
+            return super().save(name, content, max_length)
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        content_digest = digest(content)
+        known = MediaFile.objects.filter(digest=content_digest).values_list(
+            'name', flat=True).first()
+        if known and self.exists(known):
+            return known
+        name = posixpath.join(
+            posixpath.dirname(name), content_digest,
+            get_valid_filename(posixpath.basename(name)))
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
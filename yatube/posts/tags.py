@@ -0,0 +1,116 @@
+"""Хештеги и упоминания в текстах постов.
+
+При сохранении поста из текста выбираются #теги и @username.
+Теги приводятся к нижнему регистру и лежат в Tag, связи с постами -
+в PostTag, упоминания существующих пользователей - в Mention. Дата
+поста копируется в обе таблицы, поэтому лента тега (/tag/<name>/) и
+входящие упоминания (/mentions/) читают один диапазон индекса
+(tag, pub_date) или (user, pub_date), а не ищут LIKE по текстам.
+"""
+import re
+
+from django.db.models import Q
+
+from .models import Mention
+from .models import Post
+from .models import PostTag
+from .models import Tag
+from .models import User
+
+TAG_RE = re.compile(r'(?<![\w#&])#(\w+)')
+# Символы имени - как у UnicodeUsernameValidator, точка в конце
+# считается концом предложения.
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.@+-]*[\w@+-])')
+
+
+def parse(text):
+    """(имена тегов, имена пользователей) из текста."""
+    max_length = Tag._meta.get_field('name').max_length
+    names = {name.lower() for name in TAG_RE.findall(text)
+             if len(name) <= max_length}
+    return names, set(MENTION_RE.findall(text))
+
+
+def tag_ids(names):
+    """{имя: id} тегов; недостающие теги создаются."""
+    if not names:
+        return {}
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in names], ignore_conflicts=True)
+    return dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def user_ids(usernames):
+    if not usernames:
+        return set()
+    return set(User.objects.filter(
+        username__in=usernames).values_list('id', flat=True))
+
+
+def _sync(model, field, post, created, ids):
+    """Приводит связи поста в model к ids; возвращает старые ids."""
+    old = set()
+    if not created:
+        links = model.objects.filter(post=post)
+        old = set(links.values_list(field, flat=True))
+        if old - ids:
+            links.exclude(**{f'{field}__in': ids}).delete()
+    if ids - old:
+        model.objects.bulk_create(
+            [model(post=post, pub_date=post.pub_date, **{field: id_})
+             for id_ in ids - old],
+            ignore_conflicts=True)
+    return old
+
+
+def index_post(post, created=False):
+    """Раскладывает теги и упоминания поста; id затронутых тегов.
+
+    created - пост новый, и старых связей у него нет.
+    """
+    names, usernames = parse(post.text)
+    tags = set(tag_ids(names).values())
+    old_tags = _sync(PostTag, 'tag_id', post, created, tags)
+    _sync(Mention, 'user_id', post, created, user_ids(usernames))
+    return old_tags | tags
+
+
+def post_tag_ids(post_id):
+    return set(PostTag.objects.filter(
+        post_id=post_id).values_list('tag_id', flat=True))
+
+
+def rebuild(batch=1000):
+    """Пересобирает теги и упоминания всех постов; возвращает их число."""
+    PostTag.objects.all().delete()
+    Mention.objects.all().delete()
+    posts = (Post.objects.filter(Q(text__contains='#')
+                                 | Q(text__contains='@'))
+             .order_by('id').values_list('id', 'text', 'pub_date'))
+    count = 0
+    after = 0
+    while True:
+        rows = list(posts.filter(id__gt=after)[:batch])
+        if not rows:
+            return count
+        after = rows[-1][0]
+        count += _index_rows(rows)
+
+
+def _index_rows(rows):
+    parsed = [(post_id, pub_date, *parse(text))
+              for post_id, text, pub_date in rows]
+    tags = tag_ids(set().union(*(names for _, _, names, _ in parsed)))
+    users = dict(User.objects.filter(
+        username__in=set().union(*(names for *_, names in parsed)),
+    ).values_list('username', 'id'))
+    PostTag.objects.bulk_create(
+        [PostTag(post_id=post_id, tag_id=tags[name], pub_date=pub_date)
+         for post_id, pub_date, names, _ in parsed for name in names],
+        ignore_conflicts=True)
+    Mention.objects.bulk_create(
+        [Mention(post_id=post_id, user_id=users[name], pub_date=pub_date)
+         for post_id, pub_date, _, names in parsed for name in names
+         if name in users],
+        ignore_conflicts=True)
+    return len(rows)
@@ -0,0 +1,23 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+from posts.tags import TAG_RE
+
+register = template.Library()
+
+
+@register.filter(needs_autoescape=True)
+def hashtags(text, autoescape=True):
+    """Текст поста, в котором #теги - ссылки на ленты тегов."""
+    escape = conditional_escape if autoescape else str
+    parts = []
+    position = 0
+    for match in TAG_RE.finditer(text):
+        url = reverse('posts:tag_list', args=[match.group(1).lower()])
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f'<a href="{escape(url)}">{escape(match.group())}</a>')
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return mark_safe(''.join(parts))
@@ -0,0 +1,27 @@
+from django import template
+
+from posts import variants as image_variants
+from posts.models import ImageVariant
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/picture.html', takes_context=True)
+def picture(context, post):
+    """<picture> с вариантами картинки поста или миниатюра sorl.
+
+    Пока картинка грузится, на её месте видна заглушка поста.
+    """
+    image = post.image
+    found = []
+    page = context.get('variants')
+    if image and page is not None:
+        found = page.get(image.name)
+    elif image:
+        found = ImageVariant.objects.filter(image=image.name)
+    return {
+        'image': image,
+        'placeholder': post.image_placeholder,
+        'thumbnails': context.get('thumbnails'),
+        **image_variants.sources(found),
+    }
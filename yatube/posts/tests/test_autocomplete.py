@@ -0,0 +1,133 @@
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import autocomplete
+from posts.models import Group, User
+
+AUTOCOMPLETE = reverse('posts:autocomplete')
+
+
+class PrefixIndexTests(TestCase):
+    def test_find_by_any_word_once_per_record(self):
+        index = autocomplete.PrefixIndex()
+        index.add(1, 'ivan', {'ivan', 'иван петров', 'иван', 'петров'})
+        index.add(2, 'petya', {'petya', 'пётр'})
+        self.assertEqual(index.find('иван', 10), ['ivan'])
+        self.assertEqual(index.find('пе', 10), ['ivan'])
+        self.assertEqual(index.find('p', 10), ['petya'])
+        index.add(1, 'ivan', {'ivan'})
+        self.assertEqual(index.find('пе', 10), [])
+        index.remove(2)
+        self.assertEqual(index.entries, [('ivan', 1)])
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой')
+        cls.other = User.objects.create_user(username='fyodor')
+        cls.group = Group.objects.create(
+            title='Русская классика', slug='classics', description='-')
+
+    def setUp(self):
+        autocomplete.reset()
+        self.client = Client()
+
+    def test_users_by_username_and_full_name(self):
+        self.assertEqual(
+            autocomplete.users('LE'), [('leo', 'Лев Толстой')])
+        self.assertEqual(
+            autocomplete.users('толс'), [('leo', 'Лев Толстой')])
+        self.assertEqual(autocomplete.users('fy'), [('fyodor', '')])
+
+    def test_groups_by_title_words_and_slug(self):
+        found = [('classics', 'Русская классика')]
+        self.assertEqual(autocomplete.groups('клас'), found)
+        self.assertEqual(autocomplete.groups('class'), found)
+        self.assertEqual(autocomplete.groups('проза'), [])
+
+    def test_signals_update_index_without_reload(self):
+        autocomplete.users('le')
+        with CaptureQueriesContext(connection) as queries:
+            user = User.objects.create_user(username='lermontov')
+            group = Group.objects.get(id=self.group.id)
+            group.title = 'Серебряный век'
+            group.save()
+            saved = len(queries)
+            self.assertEqual(
+                [username for username, _ in autocomplete.users('le')],
+                ['leo', 'lermontov'])
+            self.assertEqual(autocomplete.groups('клас'), [])
+            self.assertEqual(autocomplete.groups('сер'),
+                             [('classics', 'Серебряный век')])
+        self.assertEqual(len(queries), saved)
+        user.delete()
+        self.assertEqual(autocomplete.users('ler'), [])
+
+    def test_other_process_applies_changes_from_log(self):
+        worker = autocomplete.MemoryBackend()
+        worker.users('le', 10)
+        user = User.objects.create_user(username='lermontov')
+        Group.objects.filter(id=self.group.id).delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                [username for username, _ in worker.users('le', 10)],
+                ['leo', 'lermontov'])
+            self.assertEqual(worker.groups('клас', 10), [])
+        self.assertEqual(len(queries), 0)
+        user.delete()
+        self.assertEqual(worker.users('ler', 10), [])
+
+    def test_trimmed_log_reloads_index(self):
+        worker = autocomplete.MemoryBackend()
+        worker.users('le', 10)
+        User.objects.create_user(username='lermontov')
+        version = cache.get(autocomplete.MemoryBackend.version_key)
+        cache.delete(autocomplete.MemoryBackend.change_key % version)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(worker.users('le', 10)), 2)
+        self.assertEqual(len(queries), 2)
+
+    def test_view_returns_links(self):
+        autocomplete.users('лев')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(AUTOCOMPLETE, {'q': 'лев'})
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.json(), {
+            'users': [{
+                'username': 'leo', 'name': 'Лев Толстой',
+                'url': reverse('posts:profile', args=['leo'])}],
+            'groups': [],
+        })
+
+    def test_short_query_returns_nothing(self):
+        response = self.client.get(AUTOCOMPLETE, {'q': 'l'})
+        self.assertEqual(response.json(), {'users': [], 'groups': []})
+
+    def test_admin_searches_all_users(self):
+        blocked = User.objects.create_user(
+            username='blocked', email='blocked@example.com', is_active=False)
+        request = RequestFactory().get('/')
+        for model, term, expected in (
+                (User, 'Толстой', [self.author]),
+                (User, 'blocked@example', [blocked]),
+                (Group, 'русская', [self.group])):
+            queryset, _ = site._registry[model].get_search_results(
+                request, model.objects.all(), term)
+            self.assertEqual(list(queryset), expected)
+
+    def test_login_does_not_touch_index(self):
+        autocomplete.users('le')
+        version = cache.get(autocomplete.MemoryBackend.version_key)
+        self.client.force_login(self.author)
+        self.assertEqual(
+            cache.get(autocomplete.MemoryBackend.version_key), version)
+        user = User.objects.get(id=self.author.id)
+        user.first_name = 'Лёва'
+        user.save(update_fields=['first_name'])
+        self.assertEqual(autocomplete.users('лёва'), [('leo', 'Лёва Толстой')])
@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+
+    def revalidate(self, url, response, client=None):
+        return (client or self.client).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_page_returns_304(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('Last-Modified', response)
+                self.assertIn('max-age=0', response['Cache-Control'])
+                self.assertEqual(
+                    self.revalidate(url, response).status_code, 304)
+
+    def test_304_skips_feed_queries(self):
+        url = self.urls[0]
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.revalidate(url, response).status_code, 304)
+
+    def test_edit_changes_validators(self):
+        responses = [self.client.get(url) for url in self.urls]
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        for url, response in zip(self.urls, responses):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(url, response).status_code, 200)
+
+    def test_edit_moves_updated_at(self):
+        before = self.post.updated_at
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.updated_at, before)
+
+    def test_if_modified_since(self):
+        url = self.urls[0]
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        ).status_code, 304)
+
+    def test_comment_and_follow_change_validators(self):
+        detail, profile = self.urls[3], self.urls[2]
+        reader = Client()
+        reader.force_login(self.reader)
+        detail_response = reader.get(detail)
+        profile_response = reader.get(profile)
+        Comment.objects.create(post=self.post, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.revalidate(detail, detail_response, reader).status_code, 200)
+        self.assertEqual(
+            self.revalidate(profile, profile_response, reader).status_code,
+            200)
+
+    def test_validators_differ_per_user(self):
+        url = self.urls[0]
+        response = self.client.get(url)
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertEqual(
+            self.revalidate(url, response, reader).status_code, 200)
+
+    def test_missing_objects_still_404(self):
+        self.assertEqual(self.client.get(reverse(
+            'posts:group_list', kwargs={'slug': 'missing'})).status_code, 404)
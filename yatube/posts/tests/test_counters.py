@@ -0,0 +1,115 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.other_group = Group.objects.create(
+            title='Другая', slug='other', description='Описание')
+
+    def setUp(self):
+        cache.clear()
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_posts_and_groups_are_counted(self):
+        """Создание, перенос и удаление поста меняют счётчики."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group)
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comments_and_follows_are_counted(self):
+        """Комментарии и подписки меняют счётчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_recount_repairs_drift(self):
+        """recount_counters чинит разошедшиеся счётчики."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Пост', group=self.group)
+            for _ in range(3))
+        UserCounters.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('recount_counters', stdout=out)
+        self.group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 3)
+        self.assertEqual(self.counters(self.reader).posts_count, 0)
+        self.assertEqual(self.group.posts_count, 3)
+        self.assertIn('группы: исправлено 1', out.getvalue())
+
+    def test_plain_save_keeps_counters(self):
+        """save() экземпляра со старыми счётчиками их не перезаписывает."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group)
+        group = Group.objects.get(pk=self.group.pk)
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        Post.objects.create(author=self.author, text='Ещё', group=self.group)
+        post.text = 'Исправленный пост'
+        post.save()
+        group.description = 'Новое описание'
+        group.save()
+        post.refresh_from_db()
+        group.refresh_from_db()
+        self.assertEqual(post.text, 'Исправленный пост')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(group.description, 'Новое описание')
+        self.assertEqual(group.posts_count, 2)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_recount_forgets_pulled_authors(self):
+        """После пересчёта список популярных авторов читается заново."""
+        self.assertEqual(timeline.pulled_authors(), set())
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)])
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(timeline.pulled_authors(), {self.author.id})
+
+    def test_pages_show_stored_counters(self):
+        """Профиль и пост показывают сохранённые счётчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        UserCounters.objects.filter(user=self.author).update(posts_count=42)
+        client = Client()
+        response = client.get(
+            reverse('posts:profile', kwargs={'username': self.author}))
+        self.assertContains(response, 'Всего постов: 42')
+        response = client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(response, '<span >42</span>', html=False)
@@ -0,0 +1,117 @@
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import resilience
+from core.resilience import FaultyDatabase
+from posts.models import Comment, Post, User
+
+
+class DegradedModeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Старый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.index = reverse('posts:index')
+
+    def open_breaker(self):
+        cache.set(resilience.OPEN_KEY, 1, 60)
+
+    def test_breaker_opens_after_failures(self):
+        with FaultyDatabase(fail=True).installed() as database:
+            for _ in range(5):
+                self.assertEqual(self.client.get(self.index).status_code, 503)
+            queries = database.queries
+            response = self.client.get(self.index)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(database.queries, queries)
+        self.assertIn('Retry-After', response)
+        self.assertTrue(resilience.is_open())
+
+    def test_stale_page_is_served_while_open(self):
+        self.client.get(self.index)
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.open_breaker()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.index)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Stale', response['Warning'])
+        self.assertIn('Age', response)
+        self.assertNotContains(response, 'Новый пост')
+
+    def test_failed_render_falls_back_to_stale_page(self):
+        self.client.get(self.index)
+        Post.objects.create(author=self.author, text='Новый пост')
+        with FaultyDatabase(fail=True).installed():
+            response = self.client.get(self.index)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Старый пост')
+        self.assertIn('Warning', response)
+
+    def test_stale_page_for_logged_in_reader(self):
+        reader = Client()
+        reader.force_login(self.author)
+        reader.get(self.index)
+        Post.objects.create(author=self.author, text='Новый пост')
+        with FaultyDatabase(fail=True).installed():
+            for _ in range(6):
+                response = reader.get(self.index)
+                self.assertEqual(response.status_code, 200)
+        self.assertTrue(resilience.is_open())
+        self.assertIn('Stale', response['Warning'])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotContains(response, 'Новый пост')
+
+    def test_writes_fail_fast_while_open(self):
+        client = Client()
+        client.force_login(self.author)
+        self.open_breaker()
+        response = client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Комментарий'})
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Comment.objects.exists())
+
+    @override_settings(DB_TIME_BUDGETS={'posts:index': 0.01})
+    def test_slow_view_exceeds_budget(self):
+        with FaultyDatabase(delay=0.02).installed():
+            response = self.client.get(self.index)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(cache.get(resilience.FAILURES_KEY), 1)
+
+    def test_success_keeps_failure_window(self):
+        resilience.record_failure()
+        self.client.get(self.index)
+        self.assertEqual(cache.get(resilience.FAILURES_KEY), 1)
+        self.assertEqual(resilience.state(), resilience.CLOSED)
+
+    def test_success_after_cooldown_closes_breaker(self):
+        for _ in range(5):
+            resilience.record_failure()
+        self.assertEqual(resilience.state(), resilience.OPEN)
+        cache.delete(resilience.OPEN_KEY)
+        self.assertEqual(resilience.state(), resilience.HALF_OPEN)
+        self.assertEqual(self.client.get(self.index).status_code, 200)
+        self.assertEqual(resilience.state(), resilience.CLOSED)
+        self.assertIsNone(cache.get(resilience.FAILURES_KEY))
+
+    def test_failure_after_cooldown_opens_breaker(self):
+        for _ in range(5):
+            resilience.record_failure()
+        cache.delete(resilience.OPEN_KEY)
+        with FaultyDatabase(fail=True).installed():
+            self.client.get(self.index)
+        self.assertEqual(resilience.state(), resilience.OPEN)
+
+    def test_data_errors_do_not_trip_breaker(self):
+        with FaultyDatabase(fail=True, error=IntegrityError).installed():
+            with self.assertRaises(IntegrityError):
+                self.client.get(reverse(
+                    'posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertIsNone(cache.get(resilience.FAILURES_KEY))
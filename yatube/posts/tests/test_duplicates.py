@@ -0,0 +1,103 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import duplicates
+from posts.models import Comment, Fingerprint, Post, User
+
+SPAM = ('Только сегодня скидки на лучшие часы в нашем магазине, '
+        'переходите по ссылке и заказывайте со скидкой до девяноста '
+        'процентов')
+VARIANT = SPAM.replace('лучшие', 'отличные')
+OTHER = ('Сегодня в парке прошёл городской субботник, собрали много '
+         'мусора и посадили двадцать новых деревьев у пруда')
+
+
+class SignatureTests(TestCase):
+    def test_near_copies_share_a_band(self):
+        spam = duplicates.signature(SPAM)
+        variant = duplicates.signature(VARIANT)
+        other = duplicates.signature(OTHER)
+        self.assertGreaterEqual(duplicates.similarity(spam, variant), 0.6)
+        self.assertLess(duplicates.similarity(spam, other), 0.2)
+        self.assertTrue(
+            set(duplicates.bands(spam)) & set(duplicates.bands(variant)))
+        self.assertIsNone(duplicates.signature('Коротко и ясно'))
+
+
+class DuplicateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        old = timezone.now() - timedelta(days=365)
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.bot = User.objects.create_user(username='bot')
+        cls.veteran = User.objects.create_user(
+            username='veteran', date_joined=old)
+        cls.post = Post.objects.create(author=cls.spammer, text=SPAM)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.spammer)
+
+    def test_save_records_fingerprint_and_original(self):
+        self.assertIsNone(self.post.fingerprint.duplicate_of)
+        copy = Post.objects.create(author=self.bot, text=VARIANT)
+        self.assertEqual(copy.fingerprint.duplicate_of,
+                         self.post.fingerprint)
+        self.assertEqual(copy.fingerprint.bands.count(), duplicates.BANDS)
+
+    def test_form_rejects_copies_of_own_and_new_accounts(self):
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': VARIANT})
+        self.assertFormError(
+            response, 'form', 'text',
+            'Почти такой же текст уже опубликован.')
+        self.client.force_login(self.bot)
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            {'text': VARIANT})
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_old_accounts_are_not_compared_with_others(self):
+        self.client.force_login(self.veteran)
+        self.client.post(reverse('posts:post_create'), {'text': VARIANT})
+        self.assertEqual(Post.objects.filter(author=self.veteran).count(), 1)
+
+    def test_edit_is_not_a_copy_of_itself(self):
+        response = self.client.post(
+            reverse('posts:post_edit', args=[self.post.id]),
+            {'text': VARIANT})
+        self.assertRedirects(
+            response, reverse('posts:post_detail', args=[self.post.id]))
+        self.assertEqual(Fingerprint.objects.count(), 1)
+
+    @override_settings(DUPLICATE_ACTION='flag')
+    def test_flag_mode_saves_copy(self):
+        self.client.post(reverse('posts:post_create'), {'text': VARIANT})
+        copy = Post.objects.exclude(id=self.post.id).get()
+        self.assertEqual(copy.fingerprint.duplicate_of_id,
+                         self.post.fingerprint.id)
+
+    def test_command_backfills_and_clusters_corpus(self):
+        Post.objects.bulk_create([
+            Post(author=self.veteran, text=VARIANT),
+            Post(author=self.veteran, text=SPAM + ' срочно'),
+            Post(author=self.veteran, text=OTHER),
+        ])
+        out = StringIO()
+        call_command('find_duplicates', '--flag', stdout=out)
+        self.assertIn('Новых отпечатков: 3', out.getvalue())
+        self.assertIn('Групп копий: 1', out.getvalue())
+        groups = duplicates.clusters()
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(len(groups[0]), 3)
+        self.assertEqual(
+            Fingerprint.objects.filter(
+                duplicate_of_id=groups[0][0]).count(), 2)
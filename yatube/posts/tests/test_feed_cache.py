@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import feed_cache
+from posts.models import Comment, Group, Post, User
+
+
+class FeedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.other_group = Group.objects.create(
+            title='Другая', slug='other', description='Описание')
+        for number in range(12):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост №{number}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_pages_are_cached_separately(self):
+        """Вторая страница не отдаёт закешированную первую."""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index') + '?page=2')
+        self.assertContains(response, 'Пост №1<')
+        self.assertNotContains(response, 'Пост №11<')
+
+    def test_repeated_anonymous_feed_skips_database(self):
+        """Повторный показ ленты обходится без SQL."""
+        self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('posts:index'))
+
+    def test_new_post_invalidates_feeds(self):
+        """Новый пост сразу виден в ленте, группе и профиле."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        ]
+        for url in urls:
+            self.client.get(url)
+        Post.objects.create(
+            author=self.author, group=self.group, text='Свежий пост')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_moved_post_invalidates_both_groups(self):
+        """Перенос поста меняет версии старой и новой группы."""
+        post = Post.objects.filter(group=self.group).first()
+        before = feed_cache.versions(
+            feed_cache.group_scope(self.group.id),
+            feed_cache.group_scope(self.other_group.id))
+        post.group = self.other_group
+        post.save()
+        after = feed_cache.versions(
+            feed_cache.group_scope(self.group.id),
+            feed_cache.group_scope(self.other_group.id))
+        self.assertNotEqual(before[0], after[0])
+        self.assertNotEqual(before[1], after[1])
+
+    def test_comment_bumps_post_version(self):
+        """Комментарий меняет версию своего поста."""
+        post = Post.objects.first()
+        scope = feed_cache.post_scope(post.id)
+        before = feed_cache.versions(scope)
+        Comment.objects.create(post=post, author=self.author, text='Ок')
+        self.assertNotEqual(feed_cache.versions(scope), before)
@@ -0,0 +1,97 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import ImageVariant, MediaFile, Post, ThumbnailJob, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+OTHER_GIF = SMALL_GIF[:-3] + b'\x02\x00\x3b'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_GC_GRACE=0)
+class MediaDedupTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def create_post(self, text, name='small.gif', content=SMALL_GIF):
+        self.client.post(reverse('posts:post_create'), {
+            'text': text,
+            'image': SimpleUploadedFile(
+                name, content, content_type='image/gif'),
+        })
+        return Post.objects.get(text=text)
+
+    def test_same_content_is_stored_once(self):
+        first = self.create_post('Первый')
+        second = self.create_post('Второй', name='copy.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertIn('small.gif', first.image.name)
+        self.assertEqual(MediaFile.objects.get().refcount, 2)
+        self.assertEqual(ThumbnailJob.objects.count(), 1)
+
+    def test_other_paths_keep_their_names(self):
+        name = default_storage.save('variants/a.txt', ContentFile(b'a'))
+        self.assertEqual(name, 'variants/a.txt')
+        default_storage.delete(name)
+
+    def test_replaced_image_is_collected_with_derived_files(self):
+        post = self.create_post('Пост', content=OTHER_GIF)
+        old = post.image.name
+        thumbnails.process(10)
+        derived = list(
+            ImageVariant.objects.values_list('name', flat=True))
+        self.assertTrue(derived)
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}), {
+                'text': 'Пост',
+                'image': SimpleUploadedFile(
+                    'new.gif', SMALL_GIF, content_type='image/gif'),
+            })
+        self.assertEqual(MediaFile.objects.get(name=old).refcount, 0)
+        out = StringIO()
+        call_command('collect_media', stdout=out)
+        self.assertIn('Удалено файлов: 1', out.getvalue())
+        self.assertFalse(default_storage.exists(old))
+        for name in derived:
+            self.assertFalse(default_storage.exists(name))
+        self.assertFalse(ImageVariant.objects.filter(image=old).exists())
+        post.refresh_from_db()
+        self.assertTrue(default_storage.exists(post.image.name))
+
+    def test_shared_file_survives_until_last_post_is_deleted(self):
+        first = self.create_post('Первый')
+        self.create_post('Второй')
+        first.delete()
+        call_command('collect_media', stdout=StringIO())
+        self.assertTrue(default_storage.exists(first.image.name))
+        Post.objects.all().delete()
+        call_command('collect_media', stdout=StringIO())
+        self.assertFalse(default_storage.exists(first.image.name))
+        self.assertFalse(MediaFile.objects.exists())
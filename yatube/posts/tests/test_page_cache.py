@@ -0,0 +1,116 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.cache import fill
+from posts import feed_cache
+from posts.middleware import _key
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.group_url = reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug})
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id})
+        self.other_url = reverse(
+            'posts:profile', kwargs={'username': self.other})
+
+    def test_repeated_page_skips_view(self):
+        first = self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.detail_url)
+        self.assertEqual(first.content, second.content)
+
+    def test_headers(self):
+        response = self.client.get(self.detail_url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage=60', response['Cache-Control'])
+        self.assertEqual(
+            set(response['Surrogate-Key'].split()),
+            {feed_cache.post_scope(self.post.id),
+             feed_cache.author_scope(self.author.id)})
+        self.assertNotIn('csrftoken', response.cookies)
+
+    def test_logged_in_pages_are_not_shared(self):
+        self.client.get(self.detail_url)
+        self.client.force_login(self.author)
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Редактировать')
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_signals_purge_only_affected_pages(self):
+        for url in (self.group_url, self.detail_url, self.other_url):
+            self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.other, text='Ок')
+        with self.assertNumQueries(0):
+            self.client.get(self.group_url)
+            self.client.get(self.other_url)
+        self.assertContains(self.client.get(self.detail_url), 'Ок')
+        Follow.objects.create(user=self.author, author=self.other)
+        with self.assertNumQueries(0):
+            self.client.get(self.group_url)
+        self.assertNotEqual(
+            self.client.get(self.other_url).status_code, 304)
+        with self.assertNumQueries(0):
+            self.client.get(self.other_url)
+
+    def test_bump_is_broadcast(self):
+        received = []
+
+        def receiver(scopes, **kwargs):
+            received.extend(scopes)
+        feed_cache.bumped.connect(receiver)
+        self.addCleanup(feed_cache.bumped.disconnect, receiver)
+        Comment.objects.create(post=self.post, author=self.other, text='Ок')
+        self.assertEqual(received, [feed_cache.post_scope(self.post.id)])
+
+    def test_shell_is_shared_between_users(self):
+        """Общая оболочка, но свои шапка, кнопки и форма."""
+        author, other = Client(), Client()
+        author.force_login(self.author)
+        other.force_login(self.other)
+        self.assertContains(author.get(self.detail_url), 'Редактировать')
+        # Сессия, пользователь и больше ничего: view не вызывается.
+        with self.assertNumQueries(2):
+            response = other.get(self.detail_url)
+        self.assertNotContains(response, 'Редактировать')
+        self.assertContains(response, 'Пользователь: other')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, '<!--hole:')
+
+    def test_follow_button_is_filled_per_user(self):
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': self.author})
+        self.client.get(profile_url)
+        reader = Client()
+        reader.force_login(self.other)
+        self.assertContains(reader.get(profile_url), 'Подписаться')
+        Follow.objects.create(user=self.other, author=self.author)
+        self.assertContains(reader.get(profile_url), 'Отписаться')
+        self.assertContains(
+            self.client.get(profile_url), 'Войдите что бы подписаться')
+
+    def test_stale_page_is_served_while_another_request_renders(self):
+        response = self.client.get(self.detail_url)
+        Comment.objects.create(post=self.post, author=self.other, text='Ок')
+        key = _key(response.wsgi_request)
+        self.assertTrue(fill.acquire(key))
+        self.addCleanup(fill.release, key)
+        with self.assertNumQueries(0):
+            self.assertNotContains(self.client.get(self.detail_url), 'Ок')
+        fill.release(key)
+        self.assertContains(self.client.get(self.detail_url), 'Ок')
@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Post, User
+from posts.pagination import KeysetPaginator
+
+
+KEYSET_EVERYWHERE = {
+    'index': 'keyset',
+    'group_list': 'keyset',
+    'profile': 'keyset',
+    'follow_index': 'keyset',
+}
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='keyset')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=cls.user)
+            for number in range(25)
+        )
+        # Половина постов с одинаковой датой: порядок держится на id.
+        moment = timezone.now() - timedelta(days=1)
+        posts = Post.objects.order_by('id')
+        Post.objects.filter(
+            id__in=[post.id for post in posts[:12]]).update(pub_date=moment)
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True))
+
+    def walk(self, paginator):
+        seen = []
+        page = paginator.get_page()
+        while True:
+            seen.extend(post.id for post in page)
+            if not page.has_next():
+                return seen, page
+            page = paginator.get_page(page.next_cursor)
+
+    def test_forward_walk_covers_feed_once(self):
+        """Проход по курсорам вперёд отдаёт каждый пост ровно один раз."""
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        seen, last_page = self.walk(paginator)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(last_page), 5)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор назад возвращает предыдущую страницу целиком."""
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+        back = paginator.get_page(third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        self.assertTrue(back.has_previous())
+        back = paginator.get_page(back.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_bad_cursor_gives_first_page(self):
+        """Испорченный курсор ведёт на первую страницу."""
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        page = paginator.get_page('not-a-cursor')
+        self.assertEqual([post.id for post in page], self.expected[:10])
+        self.assertFalse(page.has_previous())
+
+    @override_settings(POSTS_PAGINATION=KEYSET_EVERYWHERE)
+    def test_views_use_keyset_mode_from_settings(self):
+        """Ленты переключаются на курсоры через settings."""
+        cache.clear()
+        client = Client()
+        response = client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.is_keyset)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+        response = client.get(
+            reverse('posts:profile', kwargs={'username': self.user}),
+            {'cursor': page_obj.next_cursor})
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            self.expected[10:20])
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class FeedQueriesTests(TestCase):
+    """Число запросов страницы не зависит от числа постов на ней."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = cls.add_posts(1)[0]
+
+    @classmethod
+    def add_posts(cls, count):
+        posts = []
+        for number in range(count):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            commenter = User.objects.create_user(
+                username=f'commenter_{post.id}')
+            Comment.objects.create(
+                post=post, author=commenter, text='Комментарий')
+            posts.append(post)
+        return posts
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_query_count_is_flat(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+        small = [self.count_queries(url) for url in urls]
+        self.add_posts(9)
+        for number in range(5):
+            Comment.objects.create(
+                post=self.post, author=User.objects.create_user(
+                    username=f'extra_{number}'), text='Ещё')
+        for url, expected in zip(urls, small):
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), expected)
@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import related
+from posts.models import Post, RelatedPost, User
+
+INDEX_DIR = tempfile.mkdtemp()
+
+
+@override_settings(RELATED_INDEX_DIR=INDEX_DIR, RELATED_POSTS=2,
+                   RELATED_MIN_SCORE=0.1)
+class RelatedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        texts = (
+            'Варим малиновое варенье из лесной малины',
+            'Малиновое варенье без косточек',
+            'Клубничное варенье на зиму',
+            'Ремонт велосипеда своими руками',
+            'Как смазать цепь велосипеда',
+        )
+        cls.jam, cls.seedless, cls.strawberry, cls.bike, cls.chain = [
+            Post.objects.create(author=cls.author, text=text)
+            for text in texts]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(INDEX_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        shutil.rmtree(INDEX_DIR, ignore_errors=True)
+        self.client = Client()
+
+    def neighbours(self, post):
+        return list(RelatedPost.objects.filter(post=post).values_list(
+            'related_id', flat=True))
+
+    def test_rebuild_stores_top_k(self):
+        self.assertEqual(related.rebuild(batch=2), 5)
+        self.assertEqual(self.neighbours(self.jam)[0], self.seedless.id)
+        self.assertEqual(self.neighbours(self.bike), [self.chain.id])
+        for post in (self.jam, self.seedless, self.strawberry):
+            self.assertLessEqual(len(self.neighbours(post)), 2)
+            self.assertNotIn(post.id, self.neighbours(post))
+
+    def test_chunks_keep_running_top_k(self):
+        related.rebuild(batch=5)
+        index = related.Index.load(INDEX_DIR)
+        whole = related.neighbours(index.matrix, index.ids, index)
+        by_one = related.neighbours(index.matrix, index.ids, index, chunk=1)
+        self.assertEqual(by_one, whole)
+        self.assertEqual(len(whole[self.jam.id]), 2)
+
+    def test_update_adds_new_posts_only(self):
+        call_command('build_related', stdout=StringIO())
+        post = Post.objects.create(
+            author=self.author, text='Велосипед: цепь и ремонт')
+        self.assertEqual(related.update(), 1)
+        self.assertEqual(
+            set(self.neighbours(post)), {self.bike.id, self.chain.id})
+        self.assertIn(post.id, self.neighbours(self.bike))
+        self.assertEqual(related.update(), 0)
+
+    def test_update_skips_deleted_posts(self):
+        related.rebuild()
+        Post.objects.filter(id=self.seedless.id).delete()
+        post = Post.objects.create(
+            author=self.author, text='Варенье из малины')
+        related.update()
+        self.assertNotIn(self.seedless.id, self.neighbours(post))
+        self.assertIn(self.jam.id, self.neighbours(post))
+        index = related.Index.load()
+        self.assertEqual(index.documents, 5)
+        self.assertEqual(index.df[index.columns['косточек']], 0)
+        self.assertEqual(index.df[index.columns['малины']], 2)
+
+    def test_rebuild_replaces_lists_post_by_post(self):
+        related.rebuild()
+        with CaptureQueriesContext(connection) as queries:
+            related.rebuild(batch=2)
+        deletes = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('DELETE')]
+        self.assertTrue(deletes)
+        self.assertTrue(all(' WHERE ' in sql for sql in deletes))
+        self.assertEqual(self.neighbours(self.bike), [self.chain.id])
+
+    def test_detail_shows_related_in_one_query(self):
+        related.rebuild()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                related.for_post(self.jam.id)[0], self.seedless)
+        self.assertEqual(len(queries), 1)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.jam.id]))
+        self.assertContains(response, 'Ещё по теме')
+        self.assertEqual(response.context['related'][0], self.seedless)
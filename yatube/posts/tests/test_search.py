@@ -0,0 +1,122 @@
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post, User
+
+SEARCH = reverse('posts:search')
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.in_text = Post.objects.create(
+            author=cls.author, text='Варим малиновое варенье')
+        cls.in_comment = Post.objects.create(
+            author=cls.author, text='Что делать с урожаем?')
+        Comment.objects.create(
+            post=cls.in_comment, author=cls.author, text='Варенье, конечно')
+        cls.other = Post.objects.create(
+            author=cls.author, text='Совсем про другое')
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, query):
+        return [post_id for post_id, _ in search.ranked(query, limit=100)]
+
+    def test_post_text_outranks_comments(self):
+        self.assertEqual(
+            self.found('варенье'), [self.in_text.id, self.in_comment.id])
+
+    def test_index_follows_edits_and_deletes(self):
+        other = Post.objects.get(id=self.other.id)
+        other.text = 'Тоже про варенье'
+        other.save()
+        self.assertIn(self.other.id, self.found('варенье'))
+        Comment.objects.filter(post=self.in_comment).delete()
+        self.assertNotIn(self.in_comment.id, self.found('варенье'))
+        Post.objects.filter(id=self.in_text.id).delete()
+        self.assertEqual(self.found('варенье'), [self.other.id])
+
+    def test_new_comment_is_appended_without_aggregation(self):
+        with CaptureQueriesContext(connection) as queries:
+            Comment.objects.create(
+                post=self.other, author=self.author, text='Про варенье')
+        self.assertIn(self.other.id, self.found('варенье'))
+        self.assertIn(self.in_comment.id, self.found('конечно'))
+        self.assertFalse(any(
+            Comment._meta.db_table in query['sql']
+            and search.TABLE in query['sql']
+            for query in queries.captured_queries))
+
+    def test_comment_edit_rebuilds_post_row(self):
+        comment = Comment.objects.get(post=self.in_comment)
+        comment.text = 'Компот'
+        comment.save()
+        self.assertEqual(self.found('варенье'), [self.in_text.id])
+        self.assertEqual(self.found('компот'), [self.in_comment.id])
+
+    def test_view_shows_ranked_results(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(SEARCH, {'q': 'варенье'})
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.in_text, self.in_comment])
+        self.assertNotContains(response, self.other.text)
+        self.assertLessEqual(len(queries), 2)
+
+    def test_empty_query_shows_only_form(self):
+        response = self.client.get(SEARCH)
+        self.assertIsNone(response.context.get('page_obj'))
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_cursor_pagination_keeps_query(self):
+        first = self.client.get(SEARCH, {'q': 'варенье'})
+        page = first.context['page_obj']
+        self.assertEqual(list(page), [self.in_text])
+        self.assertContains(first, 'q=%D0%B2%D0%B0%D1%80%D0%B5%D0%BD%D1%8C'
+                                   '%D0%B5&cursor=')
+        second = self.client.get(
+            SEARCH, {'q': 'варенье', 'cursor': page.next_cursor})
+        page = second.context['page_obj']
+        self.assertEqual(list(page), [self.in_comment])
+        self.assertFalse(page.has_next())
+        back = self.client.get(
+            SEARCH, {'q': 'варенье', 'cursor': page.previous_cursor})
+        self.assertEqual(list(back.context['page_obj']), [self.in_text])
+
+    def test_tied_ranks_are_paged_once(self):
+        tied = {
+            Post.objects.create(author=self.author, text='Клубничный джем').id
+            for _ in range(5)}
+        paginator = search.SearchPaginator('джем', 2)
+        page, found = paginator.get_page(), []
+        while True:
+            found.extend(post.id for post in page)
+            if not page.has_next():
+                break
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual(len(found), len(tied))
+        self.assertEqual(set(found), tied)
+
+    def test_postgres_rank_is_double_precision(self):
+        sql, _ = search.PostgresBackend().ranked_sql()
+        self.assertIn(')::float8 AS score', sql)
+
+    def test_admin_search_uses_index(self):
+        request = RequestFactory().get('/')
+        queryset, _ = site._registry[Post].get_search_results(
+            request, Post.objects.all(), 'варенье')
+        self.assertEqual(
+            set(queryset), {self.in_text, self.in_comment})
+
+    def test_rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        self.assertEqual(search.rebuild(), 3)
+        self.assertEqual(len(self.found('варенье')), 2)
@@ -0,0 +1,120 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import feed_cache, tags
+from posts.models import Mention, Post, PostTag, Tag, User
+
+
+class ParseTests(TestCase):
+    def test_tags_and_mentions(self):
+        self.assertEqual(
+            tags.parse('#Django и #питон, спросите @leo.tolstoy. '
+                       'Не тег: a#b, &#39; и почта me@example.com'),
+            ({'django', 'питон'}, {'leo.tolstoy'}))
+
+
+class TagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Про #Django для @reader и @nobody')
+        cls.other = Post.objects.create(
+            author=cls.author, text='Снова #django')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_save_indexes_tags_and_mentions(self):
+        django = Tag.objects.get(name='django')
+        self.assertEqual(
+            set(django.entries.values_list('post_id', flat=True)),
+            {self.post.id, self.other.id})
+        self.assertEqual(
+            list(Mention.objects.values_list('user_id', 'post_id')),
+            [(self.reader.id, self.post.id)])
+        entry = PostTag.objects.get(post=self.post)
+        self.assertEqual(entry.pub_date, self.post.pub_date)
+
+    def test_edit_resyncs_links(self):
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Теперь про #python'
+        post.save()
+        self.assertEqual(
+            list(PostTag.objects.filter(post=post).values_list(
+                'tag__name', flat=True)), ['python'])
+        self.assertFalse(Mention.objects.exists())
+
+    def test_tag_feed_reads_post_tags_by_date(self):
+        response = self.client.get(
+            reverse('posts:tag_list', args=['DJANGO']))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.other, self.post])
+        self.assertContains(
+            response, f'href="{reverse("posts:tag_list", args=["django"])}"')
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:tag_list', args=['нет'])).status_code, 404)
+
+    def test_tag_feed_is_refreshed_on_edit(self):
+        url = reverse('posts:tag_list', args=['django'])
+        self.client.get(url)
+        post = Post.objects.get(id=self.other.id)
+        post.text = 'Без тегов'
+        post.save()
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Без тегов')
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+
+    def test_delete_bumps_tag_scope(self):
+        tag = Tag.objects.get(name='django')
+        version = feed_cache.versions(feed_cache.tag_scope(tag.id))
+        Post.objects.filter(id=self.other.id).delete()
+        self.assertNotEqual(
+            feed_cache.versions(feed_cache.tag_scope(tag.id)), version)
+
+    def test_mentions_inbox(self):
+        self.client.force_login(self.reader)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:mentions'))
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+        self.assertFalse(any(
+            'LIKE' in query['sql'] for query in queries.captured_queries))
+
+    @override_settings(POSTS_PER_PAGE=1, POSTS_PAGINATION={
+        'tag_list': 'keyset', 'mentions': 'keyset'})
+    def test_keyset_pages_follow_link_table(self):
+        later = Post.objects.create(
+            author=self.author, text='Ещё раз для @reader')
+        self.client.force_login(self.reader)
+        for url, expected in (
+                (reverse('posts:tag_list', args=['django']),
+                 [self.other, self.post]),
+                (reverse('posts:mentions'), [later, self.post])):
+            with self.subTest(url=url):
+                first = self.client.get(url).context['page_obj']
+                with CaptureQueriesContext(connection) as queries:
+                    second = self.client.get(
+                        url, {'cursor': first.next_cursor}
+                    ).context['page_obj']
+                self.assertEqual(list(first) + list(second), expected)
+                self.assertFalse(second.has_next())
+                # Автор, группа и одно соединение с таблицей связей.
+                self.assertTrue(any(
+                    query['sql'].count('JOIN') == 3
+                    for query in queries.captured_queries))
+                self.assertFalse(any(
+                    query['sql'].count('JOIN') > 3
+                    for query in queries.captured_queries))
+
+    def test_rebuild(self):
+        PostTag.objects.all().delete()
+        Mention.objects.all().delete()
+        self.assertEqual(tags.rebuild(batch=1), 2)
+        self.assertEqual(PostTag.objects.count(), 2)
+        self.assertEqual(Mention.objects.count(), 1)
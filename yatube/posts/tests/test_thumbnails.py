@@ -0,0 +1,109 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from sorl.thumbnail import get_thumbnail
+
+from posts import thumbnails
+from posts.models import ImageVariant, Post, ThumbnailJob, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def create_post(self, text='С картинкой'):
+        self.client.post(reverse('posts:post_create'), {
+            'text': text,
+            'image': SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'),
+        })
+        return Post.objects.get(text=text)
+
+    def test_upload_enqueues_job(self):
+        post = self.create_post()
+        job = ThumbnailJob.objects.get()
+        self.assertEqual(job.image, post.image.name)
+        self.assertEqual(job.status, ThumbnailJob.PENDING)
+        post.text = 'Без новой картинки'
+        post.save()
+        self.assertEqual(ThumbnailJob.objects.count(), 1)
+
+    def test_page_uses_pregenerated_thumbnail(self):
+        post = self.create_post()
+        self.assertEqual(thumbnails.process(10), (1, 0))
+        self.assertEqual(
+            ThumbnailJob.objects.get().status, ThumbnailJob.DONE)
+        with mock.patch(
+            'sorl.thumbnail.base.ThumbnailBackend._create_thumbnail',
+            side_effect=AssertionError('миниатюра режется в запросе'),
+        ):
+            response = self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(response, '<img')
+
+    @override_settings(THUMBNAIL_MAX_ATTEMPTS=2)
+    def test_failed_job_is_retried_then_given_up(self):
+        thumbnails.enqueue('posts/missing.gif')
+        self.assertEqual(thumbnails.process(10), (0, 1))
+        job = ThumbnailJob.objects.get()
+        self.assertEqual(job.status, ThumbnailJob.PENDING)
+        self.assertTrue(job.error)
+        thumbnails.process(10)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ThumbnailJob.FAILED)
+        self.assertEqual(thumbnails.process(10), (0, 0))
+
+    def test_feed_reads_thumbnails_in_one_query(self):
+        posts = [self.create_post(f'Пост {i}') for i in range(3)]
+        thumbnails.process(10)
+        # Без адаптивных вариантов карточки берут миниатюры sorl.
+        ImageVariant.objects.all().delete()
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        kvstore = [query for query in queries.captured_queries
+                   if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(len(kvstore), 1)
+        for post in posts:
+            geometry, options = settings.THUMBNAIL_PRESETS[0]
+            self.assertContains(
+                response, get_thumbnail(post.image, geometry, **options).url)
+
+    def test_missing_thumbnail_falls_back_to_sorl(self):
+        post = self.create_post()
+        page = thumbnails.PageThumbnails([post])
+        geometry, options = settings.THUMBNAIL_PRESETS[0]
+        self.assertIsNone(page.get(post.image, geometry, options))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<img')
@@ -0,0 +1,170 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry, User
+from posts.pagination import KeysetPaginator, MergedFeed
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Пост до подписки')
+
+    def setUp(self):
+        cache.clear()
+
+    def feed(self):
+        return list(timeline.home_timeline(self.reader))
+
+    def test_follow_backfills_and_post_fans_out(self):
+        """Подписка заполняет ленту, новый пост сразу попадает в неё."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed(), [self.old_post])
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_feed_reads_timeline_index_order(self):
+        """Лента сортируется по дате записи ленты, а не по Post.pub_date."""
+        sql = str(timeline.home_timeline(self.reader).query)
+        order = sql.split('ORDER BY')[1]
+        self.assertIn('"entry_date"', order)
+        self.assertNotIn(f'{Post._meta.db_table}"."pub_date', order)
+
+    @override_settings(POSTS_PER_PAGE=2,
+                       POSTS_PAGINATION={'follow_index': 'keyset'})
+    def test_keyset_pages_by_timeline_entry_date(self):
+        """Курсор ленты подписок берёт дату записи ленты, а не поста."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [self.old_post] + [
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            for number in range(3)
+        ]
+        # Записи ленты в обратном порядке относительно дат постов.
+        latest = posts[-1].pub_date
+        for number, post in enumerate(posts):
+            TimelineEntry.objects.filter(user=self.reader, post=post).update(
+                pub_date=latest - timedelta(minutes=number))
+        self.client.force_login(self.reader)
+        url = reverse('posts:follow_index')
+        first = self.client.get(url).context['page_obj']
+        second = self.client.get(
+            url, {'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual(list(first) + list(second), posts)
+        self.assertFalse(second.has_next())
+        back = self.client.get(
+            url, {'cursor': second.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back), posts[:2])
+
+    def test_unfollow_removes_author_posts(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_LENGTH=3)
+    def test_timeline_is_capped(self):
+        """Лента хранит не больше TIMELINE_LENGTH записей."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            for number in range(4)
+        ]
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3)
+        self.assertEqual(self.feed()[0], posts[-1])
+
+    def test_rebuild_command_restores_timeline(self):
+        """rebuild_timelines собирает ленту заново по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.feed(), [self.old_post])
+
+
+@override_settings(TIMELINE_FANOUT_LIMIT=1)
+class HybridTimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other_reader = User.objects.create_user(username='other')
+        cls.author = User.objects.create_user(username='author')
+        cls.celebrity = User.objects.create_user(username='celebrity')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.celebrity)
+        Follow.objects.create(user=cls.other_reader, author=cls.celebrity)
+
+    def setUp(self):
+        cache.clear()
+        self.posts = [
+            Post.objects.create(
+                author=(self.author, self.celebrity)[number % 2],
+                text=f'Пост {number}')
+            for number in range(7)
+        ]
+        self.posts.reverse()
+
+    def test_popular_author_is_not_fanned_out(self):
+        """Посты популярного автора не раскладываются по лентам."""
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__author=self.celebrity).exists())
+
+    def test_feed_merges_inbox_and_pulled_posts(self):
+        """Лента сливает входящие и прочитанные при открытии посты."""
+        feed = timeline.home_timeline(self.reader)
+        self.assertIsInstance(feed, MergedFeed)
+        self.assertEqual(feed.count(), 7)
+        self.assertEqual(list(feed[2:5]), self.posts[2:5])
+        page = Paginator(feed, 3).get_page(3)
+        self.assertEqual(list(page), self.posts[6:])
+
+    def test_keyset_pages_over_merged_feed(self):
+        """Курсорная пагинация работает поверх слитой ленты."""
+        paginator = KeysetPaginator(
+            timeline.home_timeline(self.reader), 3,
+            lookups=timeline.FEED_KEYS)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(list(first) + list(second), self.posts[:6])
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual(list(back), self.posts[:3])
+
+    def test_keyset_merges_by_timeline_entry_date(self):
+        """Слитая лента листается по дате записи, а не по дате поста."""
+        inbox = [post for post in self.posts if post.author == self.author]
+        # Входящие получили записи позже всех постов популярного автора.
+        later = max(post.pub_date for post in self.posts)
+        for number, post in enumerate(reversed(inbox), start=1):
+            TimelineEntry.objects.filter(user=self.reader, post=post).update(
+                pub_date=later + timedelta(minutes=number))
+        pulled = [post for post in self.posts if post not in inbox]
+        paginator = KeysetPaginator(
+            timeline.home_timeline(self.reader), 3,
+            lookups=timeline.FEED_KEYS)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+        self.assertEqual(
+            list(first) + list(second) + list(third), inbox + pulled)
+        self.assertFalse(third.has_next())
+
+    def test_benchmark_hybrid_skips_fan_out(self):
+        """В замере гибридная схема не рассылает посты популярного автора."""
+        out = StringIO()
+        call_command('benchmark_timeline', followers=5, authors=2, posts=1,
+                     writes=1, reads=1, threshold=3, stdout=out)
+        rows = dict(line.split(' | ', 2)[:2]
+                    for line in out.getvalue().splitlines()[1:])
+        self.assertEqual(rows['push'], '6.00')
+        self.assertEqual(rows['hybrid'], '0.00')
@@ -0,0 +1,94 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+def photo(width, height, orientation=None):
+    exif = Image.Exif()
+    exif[0x010F] = 'Камера'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'teal').save(
+        buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(
+        'photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_UPLOAD_MAX_SIDE=400)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def upload(self, image):
+        return self.client.post(
+            reverse('posts:post_create'), {'text': 'Фото', 'image': image})
+
+    def stored(self):
+        post = Post.objects.get(text='Фото')
+        with post.image.open() as file:
+            image = Image.open(file)
+            image.load()
+        return post, image
+
+    def test_large_photo_is_downscaled_without_metadata(self):
+        self.upload(photo(1800, 900))
+        _, image = self.stored()
+        self.assertEqual(image.size, (400, 200))
+        self.assertNotIn('exif', image.info)
+
+    def test_orientation_is_applied_before_stripping(self):
+        # 6 - повернуть на 90°: ширина и высота меняются местами.
+        self.upload(photo(300, 100, orientation=6))
+        _, image = self.stored()
+        self.assertEqual(image.size, (100, 300))
+        self.assertNotIn('exif', image.info)
+
+    def test_clean_image_is_stored_unchanged(self):
+        self.upload(SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif'))
+        post, _ = self.stored()
+        with post.image.open() as file:
+            self.assertEqual(file.read(), SMALL_GIF)
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=100)
+    def test_too_large_file_is_rejected(self):
+        response = self.upload(photo(300, 300))
+        self.assertEqual(
+            response.context['form'].errors['image'][0].count('МБ'), 1)
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=10000)
+    def test_too_many_pixels_is_rejected(self):
+        response = self.upload(photo(200, 100))
+        self.assertIn('мегапикселей',
+                      response.context['form'].errors['image'][0])
+        self.assertFalse(Post.objects.exists())
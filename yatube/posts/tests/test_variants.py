@@ -0,0 +1,121 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from posts import variants
+from posts.models import ImageVariant, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def jpeg(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'teal').save(buffer, 'JPEG')
+    return SimpleUploadedFile(
+        'photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    IMAGE_VARIANT_FORMATS=('webp', 'jpeg'))
+class ImageVariantTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def create_post(self, width=2000, height=1000):
+        return Post.objects.create(
+            author=self.author, text='Фото', image=jpeg(width, height))
+
+    def test_generate_writes_widths_and_formats(self):
+        post = self.create_post()
+        self.assertEqual(variants.generate(post.image.name), 6)
+        for variant in ImageVariant.objects.filter(image=post.image.name):
+            with default_storage.open(variant.name) as file:
+                image = Image.open(file)
+                self.assertEqual(image.format, variant.format.upper())
+                self.assertEqual(
+                    image.size, (variant.width, variant.height))
+        self.assertEqual(
+            sorted({variant.width for variant in ImageVariant.objects.all()}),
+            [480, 960, 1440])
+
+    def test_small_image_is_not_upscaled(self):
+        post = self.create_post(300, 200)
+        variants.generate(post.image.name)
+        self.assertEqual(
+            set(ImageVariant.objects.values_list('width', flat=True)), {300})
+
+    def test_feed_renders_picture_with_srcset(self):
+        for post in (self.create_post(), self.create_post()):
+            variants.generate(post.image.name)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(len([
+            query for query in queries.captured_queries
+            if 'posts_imagevariant' in query['sql']]), 1)
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(
+            response, variants.variant_name(post.image.name, 480, 'jpeg'))
+
+    def test_feed_without_variants_falls_back_to_thumbnail(self):
+        self.create_post()
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, '<picture>')
+        self.assertContains(response, '<img class="card-img')
+
+    def test_backfill_skips_done_images(self):
+        done = self.create_post()
+        variants.generate(done.image.name)
+        self.create_post(1000, 500)
+        out = StringIO()
+        call_command('backfill_variants', workers=0, stdout=out)
+        self.assertIn('Готово: 1, с ошибкой: 0', out.getvalue())
+        self.assertFalse(variants.missing())
+        call_command('backfill_variants', workers=0, stdout=out)
+        self.assertIn('Готово: 0, с ошибкой: 0', out.getvalue())
+
+    def test_generate_describes_posts_with_the_image(self):
+        post = self.create_post(1200, 600)
+        self.client.get(reverse('posts:index'))
+        variants.generate(post.image.name)
+        post.refresh_from_db()
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,'))
+        self.assertLess(len(post.image_placeholder), 1000)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.image_placeholder)
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_same_image_reuses_description(self):
+        first = self.create_post()
+        variants.generate(first.image.name)
+        second = self.create_post()
+        second.refresh_from_db()
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(second.image_placeholder, Post.objects.get(
+            id=first.id).image_placeholder)
+        self.assertTrue(second.image_placeholder)
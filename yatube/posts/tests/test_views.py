@@ -47,6 +47,7 @@ class PostViewsTests(TestCase):
         cls.post_id = cls.post.id
 
     def setUp(self):
+        cache.clear()
         # Создаем неавторизованный клиент
         self.guest_client = Client()
         # Создаем авторизованый клиент
@@ -0,0 +1,206 @@
+"""Миниатюры картинок постов, нарезанные заранее.
+
+Когда пост сохраняется с новой картинкой, сигнал ставит её в очередь -
+таблицу ThumbnailJob, которая переживает перезапуски. Команда
+process_thumbnails забирает задания пачками и режет все размеры из
+settings.THUMBNAIL_PRESETS и адаптивные варианты (posts.variants)
+в пуле из THUMBNAIL_WORKERS процессов.
+sorl запоминает готовые миниатюры в своём kvstore, поэтому тег
+{% thumbnail %} с теми же размером и опциями находит готовый файл
+и не режет картинку в запросе.
+
+Упавшее задание возвращается в очередь, пока не кончатся
+THUMBNAIL_MAX_ATTEMPTS попыток. Задание, взятое процессом, который
+умер, снова выдаётся через THUMBNAIL_JOB_TIMEOUT секунд.
+
+PageThumbnails читает из kvstore sorl сведения о миниатюрах всех
+постов страницы одним get_many (и одним запросом к базе на промахи)
+вместо отдельного запроса на каждый {% thumbnail %}; шаблоны берут их
+тегом {% thumbnail %} из библиотеки batch_thumbnail (core).
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.db import transaction
+from django.db.models import F
+from django.db.models import Q
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import variants
+from .models import ThumbnailJob
+
+
+def enqueue(image_name):
+    """Ставит картинку в очередь; повторная постановка сбрасывает попытки."""
+    ThumbnailJob.objects.update_or_create(
+        image=image_name,
+        defaults={'status': ThumbnailJob.PENDING, 'attempts': 0,
+                  'error': ''})
+
+
+def generate(image_name):
+    """Режет все размеры и варианты картинки. Выполняется в процессе пула."""
+    for geometry, options in settings.THUMBNAIL_PRESETS:
+        # Ошибки чтения sorl пишет в лог и отдаёт ненарезанную миниатюру.
+        if not get_thumbnail(image_name, geometry, **options).exists():
+            raise IOError(f'Не удалось нарезать {image_name} {geometry}')
+    variants.generate(image_name)
+    return image_name
+
+
+def claim(limit):
+    """Забирает до limit заданий и помечает их взятыми."""
+    stale = timezone.now() - timedelta(seconds=settings.THUMBNAIL_JOB_TIMEOUT)
+    with transaction.atomic():
+        jobs = list(
+            ThumbnailJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=ThumbnailJob.PENDING)
+                    | Q(status=ThumbnailJob.RUNNING, updated__lt=stale))
+            .values_list('id', 'image')[:limit])
+        ThumbnailJob.objects.filter(id__in=[job[0] for job in jobs]).update(
+            status=ThumbnailJob.RUNNING, attempts=F('attempts') + 1,
+            updated=timezone.now())
+    return jobs
+
+
+def finish(job_id, error=None):
+    if error is None:
+        ThumbnailJob.objects.filter(id=job_id).update(
+            status=ThumbnailJob.DONE, error='', updated=timezone.now())
+        return
+    ThumbnailJob.objects.filter(
+        id=job_id, attempts__gte=settings.THUMBNAIL_MAX_ATTEMPTS,
+    ).update(status=ThumbnailJob.FAILED, error=error)
+    ThumbnailJob.objects.filter(
+        id=job_id, status=ThumbnailJob.RUNNING,
+    ).update(status=ThumbnailJob.PENDING, error=error)
+
+
+def _init_worker():
+    django.setup()
+
+
+def make_pool(workers):
+    # Дочерние процессы открывают свои соединения с базой.
+    connections.close_all()
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(
+            'fork' if 'fork' in multiprocessing.get_all_start_methods()
+            else 'spawn'),
+        initializer=_init_worker)
+
+
+def process(limit, pool=None):
+    """Одна пачка заданий. Без pool режет в текущем процессе.
+
+    Возвращает (готово, с ошибкой).
+    """
+    jobs = claim(limit)
+    if pool is None:
+        results = [(job_id, _error(generate, image))
+                   for job_id, image in jobs]
+    else:
+        futures = [(job_id, pool.submit(generate, image))
+                   for job_id, image in jobs]
+        results = [(job_id, _error(future.result))
+                   for job_id, future in futures]
+    for job_id, error in results:
+        finish(job_id, error)
+    failed = sum(error is not None for _, error in results)
+    return len(results) - failed, failed
+
+
+def _error(func, *args):
+    """Текст ошибки func(*args) или None, если всё прошло."""
+    try:
+        func(*args)
+    except Exception as error:
+        return repr(error)
+    return None
+
+
+def options_key(options):
+    return tuple(sorted(options.items()))
+
+
+def thumbnail_name(image, geometry, options):
+    """Имя файла миниатюры так же, как его считает бэкенд sorl."""
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def _get_many_raw(keys):
+    kvstore = default.kvstore
+    if not isinstance(kvstore, KVStore):
+        found = {key: kvstore._get_raw(key) for key in keys}
+        return {key: value for key, value in found.items() if value}
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        kvstore.cache.set_many(stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(stored)
+    # Промахи sorl кеширует особым значением EMPTY_VALUE.
+    return {key: value for key, value in found.items()
+            if isinstance(value, str)}
+
+
+def prefetch(images):
+    """Готовые миниатюры THUMBNAIL_PRESETS для картинок images.
+
+    Ключ словаря - (имя картинки, геометрия, options_key(опции)).
+    """
+    wanted = {}
+    for image in images:
+        if not image:
+            continue
+        for geometry, options in settings.THUMBNAIL_PRESETS:
+            thumbnail = ImageFile(
+                thumbnail_name(image, geometry, options), default.storage)
+            wanted[add_prefix(thumbnail.key)] = (
+                image.name, geometry, options_key(options))
+    return {
+        wanted[key]: deserialize_image_file(value)
+        for key, value in _get_many_raw(list(wanted)).items()}
+
+
+class PageThumbnails:
+    """Миниатюры постов страницы; читаются при первом обращении.
+
+    Пока фрагмент ленты берётся из кеша, в kvstore никто не ходит.
+    """
+
+    def __init__(self, posts):
+        self.posts = posts
+        self._found = None
+
+    def get(self, image, geometry, options):
+        if self._found is None:
+            self._found = prefetch(post.image for post in self.posts)
+        return self._found.get(
+            (image.name, geometry, options_key(options)))
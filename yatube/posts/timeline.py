@@ -0,0 +1,151 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост сразу раскладывается во входящие ленты подписчиков автора,
+поэтому страница /follow/ читает один диапазон индекса
+(user, pub_date) вместо соединения Follow и Post.
+Каждая лента обрезается до settings.TIMELINE_LENGTH записей.
+
+Авторы, у которых подписчиков больше settings.TIMELINE_FANOUT_LIMIT,
+в ленты не раскладываются: их посты читаются при открытии ленты
+и сливаются со входящей лентой (гибридная схема push/pull).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Subquery
+
+from .models import Follow
+from .models import Post
+from .models import TimelineEntry
+from .models import UserCounters
+from .pagination import MergedFeed
+
+PULLED_AUTHORS_TIMEOUT = 5 * 60
+# Ключи ленты: дата записи ленты (у постов популярных авторов - дата
+# поста) и id. Их же курсор передаёт в KeysetPaginator(lookups=...).
+FEED_KEYS = ('entry_date', 'id')
+ORDERING = tuple('-' + key for key in FEED_KEYS)
+
+
+def _pulled_key():
+    return f'timeline:pulled:{settings.TIMELINE_FANOUT_LIMIT}'
+
+
+def forget_pulled_authors():
+    """Сбрасывает кеш pulled_authors, например после пересчёта счётчиков."""
+    cache.delete(_pulled_key())
+
+
+def pulled_authors():
+    """id авторов, чьи посты читаются при открытии ленты, а не рассылаются.
+
+    Список общий для записи и чтения и кешируется, чтобы автор,
+    перешедший порог, одновременно пропал из рассылки и появился в чтении.
+    """
+    key = _pulled_key()
+    author_ids = cache.get(key)
+    if author_ids is None:
+        limit = settings.TIMELINE_FANOUT_LIMIT
+        author_ids = frozenset(
+            UserCounters.objects.filter(
+                followers_count__gt=limit).values_list('user_id', flat=True)
+        )
+        cache.set(key, author_ids, PULLED_AUTHORS_TIMEOUT)
+    return author_ids
+
+
+def home_timeline(user):
+    """Лента подписок user: входящая лента плюс посты популярных авторов.
+
+    Если user не подписан на популярных авторов, возвращается обычный
+    QuerySet по входящей ленте. Иначе - MergedFeed, который сливает
+    входящую ленту с лентами популярных авторов k-путевым слиянием.
+    """
+    pulled = pulled_authors()
+    # Сортировка по дате записи ленты: страница - диапазон индекса
+    # (user, pub_date), а не сортировка соединения по Post.pub_date.
+    # Дата - аннотация entry_date, чтобы курсор KeysetPaginator
+    # (lookups=FEED_KEYS) фильтровал по тому же соединению.
+    inbox = Post.objects.for_feed().filter(
+        timeline_entries__user=user).annotate(
+            entry_date=F('timeline_entries__pub_date')).order_by(
+                *ORDERING)
+    if not pulled:
+        return inbox
+    followed = Follow.objects.filter(
+        user=user, author_id__in=pulled).values_list('author_id', flat=True)
+    followed = sorted(followed)
+    if not followed:
+        return inbox
+    # Посты, разосланные до перехода автора через порог, берём из его
+    # собственной ленты, чтобы они не повторялись.
+    sources = [inbox.exclude(author_id__in=followed)]
+    sources.extend(
+        Post.objects.for_feed().filter(author_id=author_id).annotate(
+            entry_date=F('pub_date')).order_by(*ORDERING)
+        for author_id in followed)
+    return MergedFeed(sources, ORDERING)
+
+
+def trim(user_ids):
+    """Оставляет в лентах только TIMELINE_LENGTH самых свежих записей."""
+    length = settings.TIMELINE_LENGTH
+    oldest_kept = TimelineEntry.objects.filter(
+        user_id=OuterRef('user_id')
+    ).order_by('-pub_date').values('pub_date')[length - 1:length]
+    TimelineEntry.objects.filter(
+        user_id__in=user_ids,
+        pub_date__lt=Subquery(oldest_kept),
+    ).delete()
+
+
+def fan_out(post):
+    """Кладёт новый пост во входящие ленты всех подписчиков автора."""
+    if post.author_id in pulled_authors():
+        return 0
+    follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id).values_list(
+            'user_id', flat=True))
+    if not follower_ids:
+        return 0
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in follower_ids],
+        ignore_conflicts=True,
+    )
+    trim(follower_ids)
+    return len(follower_ids)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние посты автора."""
+    if author_id in pulled_authors():
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date')[:settings.TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts],
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def remove(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося читателя."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    """Собирает ленту читателя заново по его подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    author_ids = Follow.objects.filter(user_id=user_id).exclude(
+        author_id__in=pulled_authors()).values_list('author_id', flat=True)
+    posts = Post.objects.filter(author_id__in=author_ids).values_list(
+        'id', 'pub_date')[:settings.TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts
+    )
@@ -0,0 +1,119 @@
+"""Загрузка картинок постов с ограниченной памятью.
+
+LimitedUploadHandler пишет каждый файл кусками во временный файл на
+диске (в памяти не держится ни один загружаемый файл) и перестаёт
+писать, как только файл превысил IMAGE_UPLOAD_MAX_BYTES.
+
+normalize (его вызывает PostForm) проверяет картинку по заголовку, не
+декодируя её: формат из IMAGE_UPLOAD_FORMATS и число пикселей не
+больше IMAGE_UPLOAD_MAX_PIXELS. Картинку больше IMAGE_UPLOAD_MAX_SIDE
+по длинной стороне он уменьшает: JPEG сразу декодируется в масштабе до
+1/8 (Image.draft), остальное сжимается целым шагом Image.reduce и
+только потом фильтром. EXIF, XMP и комментарии при этом выбрасываются,
+ориентация из EXIF применяется к пикселям. Картинка, которую менять не
+нужно, сохраняется как есть, без перекодирования.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+from PIL import ImageOps
+
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не дальше лимита.
+
+    Размер файла считается полностью, и форма отклонит его (too_large).
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.IMAGE_UPLOAD_MAX_BYTES:
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+
+def _oversized(image):
+    return max(image.size) > settings.IMAGE_UPLOAD_MAX_SIDE
+
+
+def _needs_rewrite(image):
+    if getattr(image, 'is_animated', False):
+        # Перекодирование потеряло бы кадры; большие анимации отклонены.
+        return False
+    return _oversized(image) or any(
+        key in image.info for key in METADATA_KEYS)
+
+
+def _shrink(image):
+    """Уменьшает картинку до IMAGE_UPLOAD_MAX_SIDE, начиная с дешёвого."""
+    limit = settings.IMAGE_UPLOAD_MAX_SIDE
+    ratio = limit / max(image.size)
+    if ratio < 1:
+        image.draft(image.mode, (int(image.width * ratio),
+                                 int(image.height * ratio)))
+    image = ImageOps.exif_transpose(image)
+    factor = max(image.size) // limit
+    if factor >= 2:
+        image = image.reduce(factor)
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    return image
+
+
+def _rewrite(image, file):
+    format_ = image.format
+    icc_profile = image.info.get('icc_profile')
+    image = _shrink(image)
+    if format_ == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    result = TemporaryUploadedFile(
+        file.name, getattr(file, 'content_type', None), 0, None)
+    params = {'quality': settings.IMAGE_UPLOAD_QUALITY}
+    if icc_profile:
+        params['icc_profile'] = icc_profile
+    image.save(result, format_, **params)
+    result.size = result.tell()
+    result.seek(0)
+    return result
+
+
+def too_large(file):
+    return file is not None and file.size > settings.IMAGE_UPLOAD_MAX_BYTES
+
+
+def check(image):
+    """Проверки по заголовку картинки; ValidationError, если не прошла."""
+    if image.format not in settings.IMAGE_UPLOAD_FORMATS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается.', code='format',
+            params={'format': image.format})
+    if image.width * image.height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': settings.IMAGE_UPLOAD_MAX_PIXELS // 10**6})
+    if getattr(image, 'is_animated', False) and _oversized(image):
+        raise ValidationError(
+            'Анимация больше %(limit)s пикселей по стороне.',
+            code='animation',
+            params={'limit': settings.IMAGE_UPLOAD_MAX_SIDE})
+
+
+def normalize(file):
+    """Проверенная и при необходимости уменьшенная загруженная картинка.
+
+    Уже сохранённые файлы (при редактировании поста) не трогает.
+    """
+    if not isinstance(file, UploadedFile):
+        return file
+    file.seek(0)
+    # Image.open читает только заголовок, пиксели не декодируются.
+    with Image.open(file) as image:
+        check(image)
+        if not _needs_rewrite(image):
+            file.seek(0)
+            return file
+        return _rewrite(image, file)
@@ -0,0 +1,221 @@
+"""Адаптивные варианты картинок постов.
+
+Из Post.image один раз получаются картинки нескольких ширин
+(IMAGE_VARIANT_WIDTHS) в пропорциях карточки в каждом формате из
+IMAGE_VARIANT_FORMATS; записи о них лежат в таблице ImageVariant.
+Оригинал декодируется один раз: JPEG сразу читается уменьшенным
+(Image.draft), а каждая следующая ширина получается из предыдущей,
+большей, а не из оригинала.
+
+За тот же проход у всех постов с этой картинкой записывается
+заглушка - JPEG шириной IMAGE_PLACEHOLDER_WIDTH пикселей в data: URI,
+которую карточка показывает до загрузки. Размеры <img> берутся из
+варианта: карточка обрезает картинку, размер оригинала ей не нужен.
+Кеш лент и страниц этих постов сбрасывается, иначе они до истечения
+срока показывали бы разметку без вариантов и заглушки.
+
+Новые картинки режет очередь миниатюр (posts.thumbnails), картинки,
+загруженные раньше, - команда backfill_variants. Тег {% picture %}
+рисует по вариантам <picture> с srcset, а пока их нет - прежнюю
+миниатюру sorl. Варианты всех постов страницы PageVariants читает
+одним запросом.
+"""
+import base64
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from PIL import Image
+
+from . import feed_cache
+from .models import ImageVariant
+from .models import Post
+from .models import PostTag
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
+
+def formats():
+    """Форматы из настроек, которые установленный Pillow умеет писать."""
+    Image.init()
+    return [format_ for format_ in settings.IMAGE_VARIANT_FORMATS
+            if format_.upper() in Image.SAVE]
+
+
+def _box(width, height):
+    """Рамка по центру картинки с пропорциями карточки."""
+    aspect_width, aspect_height = settings.IMAGE_VARIANT_ASPECT
+    crop_width = min(width, height * aspect_width // aspect_height) or 1
+    crop_height = min(height, width * aspect_height // aspect_width) or 1
+    left = (width - crop_width) // 2
+    top = (height - crop_height) // 2
+    return left, top, left + crop_width, top + crop_height
+
+
+def widths(source_width):
+    """Ширины вариантов; картинки не растягиваются."""
+    return [width for width in settings.IMAGE_VARIANT_WIDTHS
+            if width <= source_width] or [source_width]
+
+
+def variant_name(image_name, width, format_):
+    stem = os.path.splitext(image_name)[0]
+    return f'variants/{stem}/{width}.{format_}'
+
+
+def _open(image_name):
+    """Обрезанная до пропорций карточки картинка и ширины вариантов."""
+    with default_storage.open(image_name) as file:
+        image = Image.open(file)
+        left, top, right, bottom = _box(*image.size)
+        targets = widths(right - left)
+        # JPEG декодируется сразу в масштабе до 1/8, не меньше нужного.
+        scale = (right - left) / max(targets)
+        image.draft('RGB', (int(image.width / scale),
+                            int(image.height / scale)))
+        image = image.convert('RGB')
+    return image.crop(_box(*image.size)), targets
+
+
+def _save(image, name, format_):
+    buffer = BytesIO()
+    image.save(buffer, format_.upper(),
+               quality=settings.IMAGE_VARIANT_QUALITY)
+    # Иначе хранилище сохранит новый файл под другим именем.
+    default_storage.delete(name)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def placeholder(image):
+    """Крошечная копия картинки в data: URI."""
+    image = image.copy()
+    width = settings.IMAGE_PLACEHOLDER_WIDTH
+    image.thumbnail((width, width))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=settings.IMAGE_PLACEHOLDER_QUALITY,
+               optimize=True)
+    return 'data:image/jpeg;base64,' + base64.b64encode(
+        buffer.getvalue()).decode()
+
+
+def generate(image_name):
+    """Режет все варианты картинки и записывает их в ImageVariant.
+
+    Заодно записывает заглушку в посты с этой картинкой.
+    """
+    image, targets = _open(image_name)
+    aspect_width, aspect_height = settings.IMAGE_VARIANT_ASPECT
+    variants = []
+    for width in sorted(targets, reverse=True):
+        height = max(1, round(width * aspect_height / aspect_width))
+        image = image.resize((width, height), Image.LANCZOS)
+        for format_ in formats():
+            variants.append(ImageVariant(
+                image=image_name, width=width, height=height,
+                format=format_, name=_save(
+                    image, variant_name(image_name, width, format_),
+                    format_)))
+    posts = Post.objects.filter(image=image_name)
+    with transaction.atomic():
+        ImageVariant.objects.filter(image=image_name).delete()
+        ImageVariant.objects.bulk_create(variants)
+        posts.update(image_placeholder=placeholder(image))
+    _bump(posts)
+    return len(variants)
+
+
+def _bump(posts):
+    """Сбрасывает кеш областей, где показаны посты."""
+    scopes = [scope for post in posts
+              for scope in feed_cache.post_scopes(post)]
+    tag_ids = PostTag.objects.filter(post__in=posts).values_list(
+        'tag_id', flat=True).distinct()
+    scopes.extend(map(feed_cache.tag_scope, tag_ids))
+    if scopes:
+        feed_cache.bump(*scopes)
+
+
+def copy_described(post):
+    """Заглушка новой картинки поста из поста с тем же файлом.
+
+    Если таких нет, она очищается до прохода generate.
+    """
+    found = Post.objects.filter(image=post.image.name).exclude(
+        id=post.id).exclude(image_placeholder='').values_list(
+            'image_placeholder', flat=True).first()
+    post.image_placeholder = found or ''
+    Post.objects.filter(id=post.id).update(
+        image_placeholder=post.image_placeholder)
+
+
+def missing(after=0, limit=100):
+    """Посты без вариантов или заглушки: [(id, картинка)] по id > after."""
+    return list(
+        Post.objects.exclude(image='').filter(id__gt=after)
+        .filter(~Q(image__in=ImageVariant.objects.values('image'))
+                | Q(image_placeholder=''))
+        .order_by('id').values_list('id', 'image')[:limit])
+
+
+def lookup(image_names):
+    """{картинка: [ImageVariant]} для картинок одним запросом."""
+    names = {name for name in image_names if name}
+    found = {}
+    if not names:
+        return found
+    for variant in ImageVariant.objects.filter(image__in=names):
+        found.setdefault(variant.image, []).append(variant)
+    return found
+
+
+def sources(variants):
+    """Данные для <picture>: источники по форматам и запасной <img>."""
+    by_format = {}
+    for variant in sorted(variants, key=lambda variant: variant.width):
+        by_format.setdefault(variant.format, []).append(variant)
+    order = [format_ for format_ in settings.IMAGE_VARIANT_FORMATS
+             if format_ in by_format]
+    if not order:
+        return {}
+    *modern, fallback = order
+    fallbacks = by_format[fallback]
+    img = [variant for variant in fallbacks
+           if variant.width <= settings.IMAGE_VARIANT_ASPECT[0]]
+    img = (img or fallbacks)[-1]
+    return {
+        'sources': [(MIME_TYPES[format_], _srcset(by_format[format_]))
+                    for format_ in modern],
+        'fallback': {
+            'src': default_storage.url(img.name),
+            'srcset': _srcset(fallbacks),
+            'width': img.width,
+            'height': img.height,
+        },
+        'sizes': settings.IMAGE_VARIANT_SIZES,
+    }
+
+
+def _srcset(variants):
+    return ', '.join(f'{default_storage.url(variant.name)} {variant.width}w'
+                     for variant in variants)
+
+
+class PageVariants:
+    """Варианты картинок постов страницы; читаются при первом обращении."""
+
+    def __init__(self, posts):
+        self.posts = posts
+        self._found = None
+
+    def get(self, image_name):
+        if self._found is None:
+            self._found = lookup(post.image.name for post in self.posts)
+        return self._found.get(image_name, [])
@@ -1,73 +1,167 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import F
+from django.db.models import prefetch_related_objects
+from django.http import JsonResponse
 from django.shortcuts import render
 from django.shortcuts import get_object_or_404
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
+from django.urls import reverse
 
 from .models import Post
 from .models import Group
+from .models import Tag
 from .models import User
-from .models import Comment
 from .models import Follow
+from .models import UserCounters
+from .models import comments_prefetch
 from .forms import PostForm
 from .forms import CommentForm
+from .forms import SearchForm
+from . import autocomplete as lookup
+from . import feed_cache
+from . import related
+from . import search as post_search
+from .conditional import conditional
+from .conditional import group_scopes
+from .conditional import index_scopes
+from .conditional import looked_up
+from .conditional import post_scopes
+from .conditional import profile_scopes
+from .conditional import tag_scopes
+from .pagination import KeysetPaginator
+from .thumbnails import PageThumbnails
+from .timeline import FEED_KEYS
+from .timeline import home_timeline
+from .variants import PageVariants
+
 
+def paginator(request, post_list, mode=None, count=None, lookups=None):
+    """Страница ленты: по номеру (?page=) или по курсору (?cursor=).
 
-def paginator(request, post_list):
-    paginator = Paginator(post_list, 10)
+    Режим берётся из settings.POSTS_PAGINATION по имени url,
+    по умолчанию - обычная пагинация со смещением. Если число записей
+    уже известно из счётчиков, его передают в count вместо COUNT(*).
+    lookups - ключи курсора в таблице, по которой сортирована лента
+    (см. KeysetPaginator).
+    """
+    if mode is None:
+        url_name = getattr(request.resolver_match, 'url_name', None)
+        mode = settings.POSTS_PAGINATION.get(url_name, 'offset')
+    if mode == 'keyset':
+        paginator = KeysetPaginator(
+            post_list, settings.POSTS_PER_PAGE, lookups=lookups)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
+    if count is not None:
+        paginator.count = count
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
+@conditional(index_scopes)
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.for_feed()
+    count = feed_cache.cached_count(post_list, feed_cache.INDEX)
+    page_obj = paginator(request, post_list, count=count)
     context = {
-        'page_obj': paginator(request, post_list), }
+        'page_obj': page_obj,
+        'thumbnails': PageThumbnails(page_obj),
+        'variants': PageVariants(page_obj),
+        'feed_version': feed_cache.version_tag(feed_cache.INDEX),
+        'feed_timeout': settings.FEED_CACHE_TIMEOUT, }
     return render(request, 'posts/index.html', context)
 
 
+@conditional(group_scopes)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.prefetch_related('group').filter(group=group)
+    group = looked_up(request, Group, slug=slug)
+    post_list = Post.objects.for_feed().filter(group=group)
+    page_obj = paginator(request, post_list, count=group.posts_count)
     context = {
         'group': group,
-        'page_obj': paginator(request, post_list),
+        'page_obj': page_obj,
+        'thumbnails': PageThumbnails(page_obj),
+        'variants': PageVariants(page_obj),
+        'feed_version': feed_cache.version_tag(
+            feed_cache.group_scope(group.id)),
+        'feed_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional(tag_scopes)
+def tag_posts(request, name):
+    tag = looked_up(request, Tag, name=name.lower())
+    # Порядок по дате из PostTag: страница - диапазон индекса
+    # (tag, pub_date), без сортировки всех постов тега. Дата берётся
+    # через annotate: условие курсора в отдельном filter() добавило бы
+    # второе соединение с PostTag.
+    post_list = Post.objects.for_feed().filter(tag_entries__tag=tag)
+    scope = feed_cache.tag_scope(tag.id)
+    count = feed_cache.cached_count(post_list, scope)
+    post_list = post_list.annotate(
+        entry_date=F('tag_entries__pub_date')).order_by('-entry_date', '-id')
+    page_obj = paginator(request, post_list, count=count,
+                         lookups=('entry_date', 'id'))
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+        'thumbnails': PageThumbnails(page_obj),
+        'variants': PageVariants(page_obj),
+        'feed_version': feed_cache.version_tag(scope),
+        'feed_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+    return render(request, 'posts/tag_list.html', context)
+
+
+@conditional(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following = request.user.is_authenticated and Follow.objects.filter(
-        author=author, user=request.user).exists()
-    # Ничего не ломается, доп проверка в шаблоне)))
+    author = looked_up(
+        request, User.objects.select_related('counters'), username=username)
     user = request.user
-    post_list = author.posts.all()
+    post_list = author.posts.for_feed()
+    try:
+        posts_count = author.counters.posts_count
+    except UserCounters.DoesNotExist:
+        posts_count = None
+    page_obj = paginator(request, post_list, count=posts_count)
     context = {
         'user': user,
-        'following': following,
         "author": author,
-        "page_obj": paginator(request, post_list),
+        "page_obj": page_obj,
+        'thumbnails': PageThumbnails(page_obj),
+        'variants': PageVariants(page_obj),
+        'feed_version': feed_cache.version_tag(
+            feed_cache.author_scope(author.id)),
+        'feed_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@conditional(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = looked_up(request, Post.objects.for_detail(), id=post_id)
+    prefetch_related_objects([post], comments_prefetch())
     form = CommentForm()
-    comment = Comment.objects.select_related('post').filter(post=post)
+    comment = post.comments.all()
     context = {
         'post': post,
         'comment': comment,
-        'form': form, }
+        'form': form,
+        'related': related.for_post(post.id), }
     return render(request, 'posts/post_detail.html', context)
 
 
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
-                    files=request.FILES or None)
+                    files=request.FILES or None,
+                    author=request.user)
     if form.is_valid():
         create_post = form.save(commit=False)
         create_post.author = request.user
@@ -88,7 +182,8 @@ def post_edit(request, post_id):
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
-        instance=post)
+        instance=post,
+        author=request.user)
     if form.is_valid():
         form.save()
         return redirect('posts:post_detail', post_id)
@@ -104,7 +199,7 @@ def post_edit(request, post_id):
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    form = CommentForm(request.POST or None)
+    form = CommentForm(request.POST or None, author=request.user)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
@@ -115,12 +210,29 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = home_timeline(request.user)
+    page_obj = paginator(request, post_list, lookups=FEED_KEYS)
     context = {
-        'page_obj': paginator(request, post_list), }
+        'page_obj': page_obj,
+        'thumbnails': PageThumbnails(page_obj),
+        'variants': PageVariants(page_obj), }
     return render(request, 'posts/follow.html', context)
 
 
+@login_required
+def mentions(request):
+    """Посты, в которых упомянули текущего пользователя."""
+    post_list = Post.objects.for_feed().filter(
+        mentions__user=request.user).annotate(
+            entry_date=F('mentions__pub_date')).order_by('-entry_date', '-id')
+    page_obj = paginator(request, post_list, lookups=('entry_date', 'id'))
+    context = {
+        'page_obj': page_obj,
+        'thumbnails': PageThumbnails(page_obj),
+        'variants': PageVariants(page_obj), }
+    return render(request, 'posts/mentions.html', context)
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
@@ -136,3 +248,40 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(author=author, user=request.user).delete()
     return redirect('posts:profile', username=username)
+
+
+def search(request):
+    """Поиск по постам и комментариям, лучшие совпадения первыми."""
+    form = SearchForm(request.GET or None)
+    context = {'form': form}
+    if form.is_valid():
+        query = form.cleaned_data['q']
+        page_obj = post_search.SearchPaginator(
+            query, settings.POSTS_PER_PAGE).get_page(
+                request.GET.get('cursor'))
+        context.update({
+            'page_obj': page_obj,
+            'page_query': urlencode({'q': query}),
+            'thumbnails': PageThumbnails(page_obj),
+            'variants': PageVariants(page_obj),
+        })
+    return render(request, 'posts/search.html', context)
+
+
+def autocomplete(request):
+    """Подсказки авторов и групп по началу имени, для поля ввода."""
+    query = request.GET.get('q', '').strip()
+    users = groups = []
+    if len(query) >= settings.AUTOCOMPLETE_MIN_LENGTH:
+        users = lookup.users(query, settings.AUTOCOMPLETE_LIMIT)
+        groups = lookup.groups(query, settings.AUTOCOMPLETE_LIMIT)
+    return JsonResponse({
+        'users': [
+            {'username': username, 'name': name,
+             'url': reverse('posts:profile', args=[username])}
+            for username, name in users],
+        'groups': [
+            {'slug': slug, 'title': title,
+             'url': reverse('posts:group_list', args=[slug])}
+            for slug, title in groups],
+    })
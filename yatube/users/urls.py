@@ -54,7 +54,7 @@ urlpatterns = [
         name='password_reset/done/'
     ),
     path(
-        'auth/reset/<uid64>/<token>/',
+        'auth/reset/<uidb64>/<token>/',
         PasswordResetConfirmView.as_view(
             template_name='users/password_reset_confirm.html'),
         name='reset/<uid64>/<token>/'
@@ -62,6 +62,9 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.HoleMiddleware',
+    'posts.middleware.PageCacheMiddleware',
+    'core.middleware.DatabaseBreakerMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -96,6 +99,10 @@ DATABASES = {
         'PORT': os.getenv('DB_PORT')
     }
 }
+# Зависший запрос веб-воркера обрывается, а не держит его. Ставится
+# только соединениям, открытым при обработке запросов, а миграции и
+# пакетные команды работают без ограничения (см. core.resilience).
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 5000))
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -141,12 +148,139 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Картинки постов лежат по хешу содержимого, одинаковые - в одном файле
+# (posts.storage). Ссылки на них считает posts.media.
+DEFAULT_FILE_STORAGE = 'posts.storage.ContentAddressedStorage'
+CONTENT_ADDRESSED_PREFIXES = ('posts/',)
+# Сколько секунд файл без ссылок ждёт сборщика (команда collect_media).
+MEDIA_GC_GRACE = 60 * 60
+
+# На сервере с несколькими воркерами gunicorn задайте
+# CACHE_BACKEND=core.cache.shared.SharedMemoryCache и
+# CACHE_LOCATION=/dev/shm/yatube-cache: кеш станет общим для процессов.
+# Его файл занимает CACHE_MAX_ENTRIES * CACHE_SLOT_SIZE байт (по
+# умолчанию 64 МБ), а страницы больше CACHE_SLOT_SIZE в нём не
+# кешируются - см. core.cache.shared.
+# Перед общим кешем можно поставить core.cache.tiered.TieredCache
+# с LOCATION='shared' - см. пример в его модуле.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 1024)),
+            'SLOT_SIZE': int(os.getenv('CACHE_SLOT_SIZE', 64 * 1024)),
+        },
     }
 }
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+POSTS_PER_PAGE = 10
+
+# Режим пагинации лент по имени url: 'offset' (?page=) или 'keyset'
+# (?cursor=). Курсорный режим не считает COUNT(*) и не сканирует OFFSET.
+POSTS_PAGINATION = {
+    'index': 'offset',
+    'group_list': 'offset',
+    'tag_list': 'offset',
+    'profile': 'offset',
+    'follow_index': 'offset',
+    'mentions': 'offset',
+}
+
+# Сколько последних постов хранится во входящей ленте подписок.
+TIMELINE_LENGTH = 1000
+
+# Посты авторов с большим числом подписчиков не рассылаются по лентам,
+# а читаются при открытии ленты подписок.
+TIMELINE_FANOUT_LIMIT = 10000
+
+# Фрагменты лент живут долго: их свежесть держится на версиях
+# в posts.feed_cache, а не на сроке хранения.
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Кеш страниц: свежесть держится на версиях feed_cache,
+# прокси без сброса по Surrogate-Key держит страницу не дольше минуты.
+PAGE_CACHE_TIMEOUT = 60 * 60
+PAGE_CACHE_PROXY_TIMEOUT = 60
+# Сколько ещё хранить страницу после срока: её отдают, пока база лежит.
+PAGE_CACHE_STALE = 60 * 60 * 24
+
+# Заполнение кеша без давки (core.cache.fill): сколько отдавать
+# устаревшее значение после срока и сколько держать блокировку пересчёта.
+CACHE_STALE_TIMEOUT = 60
+CACHE_FILL_LOCK_TIMEOUT = 10
+
+# Бюджеты времени SQL на view в секундах и автомат защиты базы
+# (core.resilience).
+DB_TIME_BUDGET = 2
+DB_TIME_BUDGETS = {
+    'posts:index': 1,
+    'posts:group_list': 1,
+    'posts:profile': 1,
+    'posts:post_detail': 1,
+}
+DB_BREAKER_THRESHOLD = 5
+DB_BREAKER_WINDOW = 60
+DB_BREAKER_COOLDOWN = 30
+
+# Размеры миниатюр, которые posts.thumbnails режет заранее. Должны
+# совпадать с {% thumbnail %} в шаблонах: геометрия и опции.
+THUMBNAIL_PRESETS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_MAX_ATTEMPTS = 3
+THUMBNAIL_JOB_TIMEOUT = 60 * 10
+
+# Адаптивные варианты картинок постов (posts.variants): ширины в
+# пикселях, пропорции карточки и форматы в порядке предпочтения.
+# Последний формат - запасной для <img>; AVIF пропускается, если
+# Pillow не умеет его писать.
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+IMAGE_VARIANT_ASPECT = (960, 339)
+IMAGE_VARIANT_FORMATS = ('avif', 'webp', 'jpeg')
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_SIZES = '(min-width: 768px) 720px, 100vw'
+# Заглушка карточки, пока грузится картинка: JPEG такой ширины.
+IMAGE_PLACEHOLDER_WIDTH = 16
+IMAGE_PLACEHOLDER_QUALITY = 40
+
+# Загрузка картинок (posts.uploads): файлы пишутся на диск кусками,
+# картинки проверяются по заголовку и уменьшаются до IMAGE_UPLOAD_MAX_SIDE.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.LimitedUploadHandler']
+IMAGE_UPLOAD_MAX_BYTES = 20 * 2**20
+IMAGE_UPLOAD_MAX_PIXELS = 50 * 10**6
+IMAGE_UPLOAD_MAX_SIDE = 2560
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_UPLOAD_QUALITY = 85
+
+# Полнотекстовый поиск (posts.search): конфигурация PostgreSQL под
+# LANGUAGE_CODE и сколько постов админка берёт из индекса.
+SEARCH_CONFIG = 'russian'
+SEARCH_ADMIN_LIMIT = 1000
+
+# Автодополнение авторов и групп (posts.autocomplete): с какой длины
+# запроса подсказывать и сколько подсказок каждого вида отдавать.
+AUTOCOMPLETE_MIN_LENGTH = 2
+AUTOCOMPLETE_LIMIT = 10
+
+# Похожие посты (posts.related): сколько соседей хранить у поста, не
+# ниже какого косинусного сходства и где лежит индекс TF-IDF.
+RELATED_POSTS = 5
+RELATED_MIN_SCORE = 0.1
+RELATED_INDEX_DIR = os.path.join(BASE_DIR, 'related')
+
+# Почти одинаковые тексты (posts.duplicates): 'reject' - форма
+# отклоняет копию, 'flag' - сохраняет и отмечает. Сходство Жаккара по
+# парам слов, окно и возраст нового аккаунта - в секундах.
+DUPLICATE_ACTION = 'reject'
+DUPLICATE_SIMILARITY = 0.6
+DUPLICATE_MIN_WORDS = 10
+DUPLICATE_WINDOW = 7 * 24 * 60 * 60
+DUPLICATE_NEW_ACCOUNT_AGE = 3 * 24 * 60 * 60
+DUPLICATE_CANDIDATES = 50